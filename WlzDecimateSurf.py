@@ -32,8 +32,9 @@
 # Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
 # Boston, MA  02110-1301, USA.
 # \brief        Decimates, smooths and flips normals for surfaces.
-#               This script makes use of Woolz binaries, PyWoolz
-#               and MeshLab.
+#               This script makes use of PyMeshLab and, for surface
+#               formats which are not read or written directly, Woolz
+#               binaries.
 ##
 
 from __future__ import print_function
@@ -42,33 +43,58 @@ import sys
 import argparse
 import subprocess
 import tempfile
-import ctypes
 import glob
-import Wlz
-
-libc = ctypes.CDLL("libc.so.6")
-
-libc.fopen.restype = ctypes.POINTER(Wlz.FILE)
+import WlzSurface as wsf
+import WlzMeshIO as mio
+import WlzSurfaceCache as wsc
 
 ma_bin_dir        = '/opt/MouseAtlas/bin'
 WlzExtFFConvert   = ma_bin_dir + '/WlzExtFFConvert'
-MeshLabServer     = '/opt/vis/bin/meshlabserver'
 
 def ParseArgs():
   parser = argparse.ArgumentParser(description= \
   'Decimates, smooths and flips normals for surfaces.')
+  parser.add_argument('-c', '--cache', \
+      type=str, default=None, \
+      help='Directory of a cache of surface files, keyed by the content ' +
+           'of the input file and the parameters which affect the ' +
+           'output. Surfaces found in the cache are copied from it ' +
+           'rather than being made again.')
+  parser.add_argument('-C', '--cachesize', \
+      type=int, default=1024, \
+      help='Maximum size of the cache (Mb), beyond which the least ' +
+           'recently used surfaces are removed.')
   parser.add_argument('-f', '--flip', \
       action='store_true', default=False, \
       help='Flip face normals')
   parser.add_argument('-o', '--outfile', \
       type=str, required=True,\
       help='Output surface file.')
+  parser.add_argument('-l', '--lod', \
+      type=str, default=None, \
+      help='Comma separated face counts for levels of detail (eg ' +
+           '200000,50000,20000,5000), each made from the previous ' +
+           'finer level and written to the output file name with ' +
+           '_lod<k> inserted before the extension, k = 0 being the ' +
+           'finest level. Overrides the maximum number of faces.')
   parser.add_argument('-m', '--maxface', \
       type=int, default=20000, \
       help='Maximum number of faces in the surface triangulation.')
+  parser.add_argument('-r', '--report', \
+      type=str, default=None, \
+      help='Write a JSON report of the wall time, CPU time and peak ' +
+           'memory of each stage (conversion, read, flip, decimation ' +
+           'and write) with the numbers of vertices and faces and the ' +
+           'sizes of the files written, to the given file (- for the ' +
+           'standard output, when all other output goes to the ' +
+           'standard error).')
   parser.add_argument('-s', '--smooth', \
       action='store_true', default=False, \
       help='Use Taubin smoothing.')
+  parser.add_argument('-S', '--smoother', \
+      type=str, choices=wsf.smoothers, default='meshlab', \
+      help='Taubin smoothing by MeshLab or natively using a sparse ' +
+           'Laplacian with uniform or cotangent weights.')
   parser.add_argument('-t', '--tmpdir', \
       type=str, default='/tmp', \
       help='Temporary directory for working files.')
@@ -76,123 +102,120 @@ def ParseArgs():
       action='store_true', default=False, \
       help='Verbose output (mainly useful for debugging).')
   parser.add_argument('infile',
-      help='Input Woolz domain.')
+      help='Input surface file.')
   args = parser.parse_args()
   return(args)
 
 
-def ReadWoolzFile(filename):
-  obj = None
-  errNum = Wlz.enum__WlzErrorNum(Wlz.WLZ_ERR_FILE_OPEN)
-  fp = libc.fopen(filename, 'rb')
-  if(bool(fp)):
-    obj = Wlz.WlzReadObj(fp, ctypes.byref(errNum))
-    libc.fclose(fp)
-  return(obj)
-
-
-def WriteWoolzObject(filename, obj):
-  errNum = Wlz.enum__WlzErrorNum(Wlz.WLZ_ERR_FILE_OPEN)
-  fp = libc.fopen(filename, 'wb')
-  if(bool(fp)):
-    errNum = Wlz.WlzWriteObj(fp, obj)
-    libc.fclose(fp)
-  return(errNum)
-
-
-def StartMeshLabFilter(flt):
-  flt.append('<!DOCTYPE FilterScript>')
-  flt.append('<FilterScript>')
-  flt.append('<filter name="Merge Close Vertices">')
-  flt.append('<Param type="RichAbsPerc" value="0.1" min="0" ' + \
-             'name="Threshold" max="16"/>')
-  flt.append('</filter>')
-
-
-def EndMeshLabFilter(flt):
-  flt.append('</FilterScript>')
-
-
-def AppendMeshLabFilter(flt, target_face_count, taubin_steps):
-  if(target_face_count > 0):
-    flt.append('<filter name="Quadric Edge Collapse Decimation">')
-    flt.append('<Param type = "RichInt"   value = "' + \
-               str(target_face_count) + '" ' + \
-               'name = "TargetFaceNum"/>')
-    flt.append('<Param type = "RichFloat" value = "0"     ' + \
-               'name = "TargetPerc"/>')
-    flt.append('<Param type = "RichFloat" value = "0.3"   ' + \
-               'name = "QualityThr"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "PreserveBoundary"/>')
-    flt.append('<Param type = "RichFloat" value = "1"     ' + \
-               'name = "BoundaryWeight"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "PreserveNormal"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "PreserveTopology"/>')
-    flt.append('<Param type = "RichBool"  value = "true"  ' + \
-               'name = "OptimalPlacement"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "PlanarQuadric"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "QualityWeight"/>')
-    flt.append('<Param type = "RichBool"  value = "true"  ' + \
-               'name = "AutoClean"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "Selected"/>')
-    flt.append('</filter>')
-  if(taubin_steps > 0):
-    flt.append('<filter name="Taubin Smooth">')
-    flt.append('<Param type = "RichFloat" value = "0.5"   ' + \
-               'name = "lambda"/>')
-    flt.append('<Param type = "RichFloat" value = "-0.53" ' + \
-               'name = "mu"/>')
-    flt.append('<Param type = "RichInt"   value = "' + \
-               str(taubin_steps) + '"    ' + \
-               'name = "stepSmoothNum"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "Selected"/>')
-    flt.append('</filter>')
-
-
-def WriteMeshLabFilter(filename, flt):
-  with open(filename, "w") as ff:
-    for fr in flt:
-      print(fr, file=ff)
-  ff.close()
+# Writes the stage report if one was requested.
+def WriteReport(report, outfiles):
+  if(bool(args.report)):
+    try:
+      report.write(args.report, prog='WlzDecimateSurf', infile=args.infile,
+                   outfiles=outfiles)
+    except IOError as e:
+      print(prog + ': Failed to write report (' + str(e) + ').')
 
 def CleanExit(stat):
-  for f in glob.glob(workfile + '[0-1].*'):
-    os.remove(f)
+  if(bool(workfile)):
+    for f in glob.glob(workfile + '[0-1].*'):
+      os.remove(f)
   exit(stat)
 
+# Writes the current mesh of the MeshSet, converting from STL for
+# formats which can not be written directly. The stages are recorded
+# with the given tags.
+def WriteSurface(filename, ms, **tags):
+  global workfile
+  outfile = filename
+  if(not mio.IsMeshFormat(outfile)):
+    if(not bool(workfile)):
+      workfile = tempfile.mktemp(dir=args.tmpdir, prefix='wd2vs')
+    outfile = workfile + '1.stl'
+  st = report.begin('write', **tags)
+  wsf.WriteMeshSet(outfile, ms)
+  report.end(st)
+  report.setFile(st, outfile)
+  if(outfile != filename):
+    cmdline = [WlzExtFFConvert, '-o' + filename, outfile]
+    if(args.verbose):
+      print(cmdline)
+    st = report.begin('conversion', **tags)
+    rtn = subprocess.call(cmdline)
+    report.end(st)
+    if(bool(rtn)):
+      print(prog + ': WlzExtFFConvert failed to convert working stl file format.')
+      CleanExit(1)
+    report.setFile(st, filename)
+
 if __name__ == '__main__':
   args = ParseArgs()
   prog = sys.argv[0];
-  errNum = Wlz.enum__WlzErrorNum(Wlz.WLZ_ERR_NONE)
+  report = wsf.StageReport(bool(args.report))
+  if(args.report == '-'):
+    report.reserveStdout()
+
+  if(bool(args.lod)):
+    try:
+      args.lod = wsf.ParseLOD(args.lod)
+    except ValueError as e:
+      print(prog + ': ' + str(e))
+      exit(1)
 
   if(args.verbose):
     print('Args = ' + str(args))
 
-  workfile = tempfile.mktemp(dir=args.tmpdir, prefix='wd2vs')
+  # Copy the output from the cache if the same input has already been
+  # decimated with the same parameters.
+  cache = None
+  if(bool(args.cache)):
+    cache = wsc.SurfaceCache(args.cache, args.cachesize << 20)
+    try:
+      key = cache.key(args.infile,
+          {'prog': 'WlzDecimateSurf',
+           'outfile': os.path.basename(args.outfile),
+           'flip': args.flip, 'lod': args.lod, 'maxface': args.maxface,
+           'smooth': args.smooth, 'smoother': args.smoother})
+    except (IOError, OSError) as e:
+      print(prog + ': Failed to read input file (' + str(e) + ').')
+      exit(1)
+    st = report.begin('cache')
+    outfiles = cache.fetch(key, args.outfile)
+    report.end(st)
+    if(outfiles is not None):
+      if(args.verbose):
+        print('Copied surface from cache.')
+      WriteReport(report, outfiles)
+      exit(0)
 
-  # Convert the input file to a Woolz contour object, read it in and then
-  # find the number of faces in the model.
-  cmdline = [WlzExtFFConvert, '-o' + workfile + '0.wlz', \
-             args.infile]
-  if(args.verbose):
-    print(cmdline)
-  rtn = subprocess.call(cmdline)
-  if(bool(rtn)):
-    print(prog + ': WlzExtFFConvert failed to convert input file to wlz.')
-    CleanExit(1)
-  obj = Wlz.WlzAssignObject(ReadWoolzFile(workfile + '0.wlz'), None)
-  if(not bool(obj)):
-    print(prog + ': Failed to read Woolz file.')
+  # Surfaces in formats which can not be read directly are converted
+  # to STL.
+  workfile = None
+  infile = args.infile
+  if(not mio.IsMeshFormat(infile)):
+    workfile = tempfile.mktemp(dir=args.tmpdir, prefix='wd2vs')
+    infile = workfile + '0.stl'
+    cmdline = [WlzExtFFConvert, '-o' + infile, args.infile]
+    if(args.verbose):
+      print(cmdline)
+    st = report.begin('conversion')
+    rtn = subprocess.call(cmdline)
+    report.end(st)
+    if(bool(rtn)):
+      print(prog + ': WlzExtFFConvert failed to convert input file to stl.')
+      CleanExit(1)
+    report.setFile(st, infile)
+
+  # Read the surface and find the number of faces.
+  st = report.begin('read')
+  try:
+    verts, faces = mio.ReadMesh(infile)
+  except (mio.MeshIOError, IOError, ValueError) as e:
+    print(prog + ': Failed to read surface file (' + str(e) + ').')
     CleanExit(1)
-  model = obj.contents.domain.ctr.contents.model
-  n_faces = model.contents.res.face.numElm
+  report.end(st)
+  report.setMesh(st, verts.shape[0], faces.shape[0])
+  n_faces = faces.shape[0]
   if(args.verbose):
     print('Initial number of faces = ' + str(n_faces))
   if(n_faces < 4):
@@ -203,73 +226,44 @@ if __name__ == '__main__':
   if(args.flip):
     if(args.verbose):
       print('Flipping face orientation.')
-    errNum = Wlz.WlzGMFilterFlipOrient(model);
-    if(bool(errNum)):
-      print(prog + ': Failed to flip face orientation (' +
-            Wlz.WlzStringFromErrorNum(errNum, None) + ').')
-      CleanExit(1)
+    st = report.begin('flip')
+    faces = mio.FlipFaces(faces)
+    report.end(st)
 
-  # Write the Woolz object file using the stl file format.
-  if(args.verbose):
-    print('Writing working Woolz file.')
-  if(bool(WriteWoolzObject(workfile + '0.wlz', obj))):
-    print(prog + ': Failed to write working Woolz file.')
-    CleanExit(1)
-  Wlz.WlzFreeObj(obj)
-  cmdline = [WlzExtFFConvert, '-o' + workfile + '0.stl', \
-             workfile + '0.wlz']
-  if(args.verbose):
-    print(cmdline)
-  rtn = subprocess.call(cmdline)
-  if(bool(rtn)):
-    print(prog + ': WlzExtFFConvert failed to convert working wlz file to stl.')
-    CleanExit(1)
-
-  # Create meshlab filter script to reduce the number of faces and smooth
-  # the surface
-  if(args.verbose):
-    print('Creating MeshLab filter file.')
-  flt = []
-  if(args.smooth):
-    taubin_steps = 10
+  # Reduce the number of faces and smooth the surface, writing each
+  # level of detail as it is made.
+  taubin = [10, 4] if args.smooth else [0, 0]
+  if(bool(args.lod)):
+    outfiles = [wsf.LODOutFile(args.outfile, k)
+                for k in range(0, len(args.lod))]
+    st = [report.begin('decimation', level=0)]
+    def writeLevel(k, n, ms):
+      m = ms.current_mesh()
+      report.end(st[0])
+      report.setMesh(st[0], m.vertex_number(), m.face_number())
+      WriteSurface(outfiles[k], ms, level=k)
+      if(k + 1 < len(args.lod)):
+        st[0] = report.begin('decimation', level=k + 1)
+    ms = wsf.MakeMeshSet(verts, faces, args.verbose)
+    wsf.SimplifyMeshLOD(ms, args.lod, writeLevel, taubin[0], taubin[1],
+                        verbose=args.verbose, smoother=args.smoother)
   else:
-    taubin_steps = 0
-  StartMeshLabFilter(flt)
-  if(n_faces > args.maxface):
-    face_count = n_faces
-    while(face_count > args.maxface):
-      if(face_count > args.maxface * 4):
-        face_count = face_count / 4
-      else:
-        face_count = args.maxface
-      AppendMeshLabFilter(flt, face_count, taubin_steps)
-      if(args.smooth):
-        taubin_steps = 4
-  else:
-    AppendMeshLabFilter(flt, 0, taubin_steps)
-  EndMeshLabFilter(flt)
-  WriteMeshLabFilter(workfile + '0.mlx', flt)
-  
-  # Execute the MeshLab filter
-  cmdline = [MeshLabServer,
-             '-i ' + workfile + '0.stl', \
-             '-o ' + workfile + '1.stl', \
-             '-s ' + workfile + '0.mlx']
-  if(args.verbose):
-    print(cmdline)
-  rtn = subprocess.call(cmdline)
-  if(bool(rtn)):
-    print(prog + ':meshlabserver failed to run filter script.')
-    CleanExit(1)
+    outfiles = [args.outfile]
+    st = report.begin('decimation')
+    ms = wsf.MakeMeshSet(verts, faces, args.verbose)
+    wsf.SimplifyMesh(ms, args.maxface, taubin[0], taubin[1],
+                     verbose=args.verbose, smoother=args.smoother)
+    report.end(st)
+    m = ms.current_mesh()
+    report.setMesh(st, m.vertex_number(), m.face_number())
+    WriteSurface(args.outfile, ms)
 
-  # Convert the STL file to required output format
-  cmdline = [WlzExtFFConvert, '-o' + args.outfile, \
-             workfile + '1.stl']
-  if(args.verbose):
-    print(cmdline)
-  rtn = subprocess.call(cmdline)
-  if(bool(rtn)):
-    print(prog + ': WlzExtFFConvert failed to convert working stl file format.')
-    CleanExit(1)
+  if(cache is not None):
+    try:
+      cache.store(key, args.outfile, outfiles)
+    except (IOError, OSError) as e:
+      print(prog + ': Failed to cache surface (' + str(e) + ').')
+
+  WriteReport(report, outfiles)
 
   CleanExit(0)
@@ -33,45 +33,118 @@
 # Boston, MA  02110-1301, USA.
 # \brief        Extracts a smoothed and decimated surface from a 3D
 #               Woolz spatial domain object.
-#               This script makes use of many Woolz binaries, PyWoolz
-#               and MeshLab.
+#               The surface is extracted, simplified and smoothed in
+#               memory using PyWoolz, scikit-image and PyMeshLab.
 ##
 
 from __future__ import print_function
 import os
 import sys
 import argparse
-import subprocess
-import tempfile
-import ctypes
 import glob
-import pymeshlab
+import hashlib
+import multiprocessing
+import ctypes
+import numpy as np
+from scipy import ndimage
+from skimage import measure
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import Wlz
+import WlzSection as ws
+import WlzSurface as wsf
+import WlzMeshIO as mio
+import WlzSurfaceCache as wsc
 
 libc = ctypes.CDLL("libc.so.6")
 
 libc.fopen.restype = ctypes.POINTER(Wlz.FILE)
 
-ma_bin_dir        = '/opt/MouseAtlas/bin'
-MAVTKDomainToSurf = ma_bin_dir + '/MAVTKDomainToSurf'
-WlzExtFFConvert   = ma_bin_dir + '/WlzExtFFConvert'
-MeshLabServer     = '/opt/vis/bin/meshlabserver'
+prog = 'WlzDomainToVTKSurf'
+args = None
 
 def ParseArgs():
   parser = argparse.ArgumentParser(description= \
-  'Creates a VTK (legacy format) surface file from the given Woolz domain.')
+  'Creates a VTK (legacy format) surface file from the given Woolz ' +
+  'domain, or a surface file for each label of a Woolz index object.')
+  parser.add_argument('-b', '--binary', \
+      action='store_true', default=False, \
+      help='Write a binary rather than an ASCII legacy VTK file.')
+  parser.add_argument('-B', '--block', \
+      type=int, default=256, \
+      help='Domains larger than this many voxels along any side are ' +
+           'rasterised and their surfaces extracted in blocks of this ' +
+           'size, in parallel unless part of a batch.')
+  parser.add_argument('-c', '--cache', \
+      type=str, default=None, \
+      help='Directory of a cache of surface files, keyed by the content ' +
+           'of each input file and the parameters which affect its ' +
+           'surfaces. Surfaces found in the cache are copied from it ' +
+           'rather than being made again.')
+  parser.add_argument('-C', '--cachesize', \
+      type=int, default=1024, \
+      help='Maximum size of the cache (Mb), beyond which the least ' +
+           'recently used surfaces are removed.')
   parser.add_argument('-f', '--flip', \
       action='store_true', default=False, \
       help='Flip face normals')
+  parser.add_argument('-n', '--nosimplify', \
+      action='store_true', default=False, \
+      help='Neither decimate nor smooth the surfaces.')
   parser.add_argument('-o', '--outfile', \
       type=str, required=True,\
-      help='Output VTK surface file.')
+      help='Output VTK surface file, which is written as zlib ' +
+           'compressed XML polydata if the file extension is vtp (STL, ' +
+           'OBJ, OFF, PLY or binary glTF files are written if the file ' +
+           'extension is stl, obj, off, ply or glb).')
+  parser.add_argument('-i', '--index', \
+      action='store_true', default=False, \
+      help='The input is an index object (eg from ' +
+           'WlzMakeITKSnapSegImage.py) for which a surface is made for ' +
+           'each non-zero label, written to the output file name with ' +
+           'the label inserted before the extension (or substituted for ' +
+           'a printf style %%d in the name). Surfaces of adjacent labels ' +
+           'share their common boundaries unless they are simplified ' +
+           '(so use -n to keep these boundaries closed). ' +
+           'If the output file is a glb file without %%d the surfaces ' +
+           'are written as the nodes of a single glTF scene.')
+  parser.add_argument('-j', '--jobs', \
+      type=int, default=os.cpu_count() or 4, \
+      help='Number of worker processes used to make the surfaces of ' +
+           'a batch of domains or of the labels of an index object.')
+  parser.add_argument('-l', '--lod', \
+      type=str, default=None, \
+      help='Comma separated face counts for levels of detail (eg ' +
+           '200000,50000,20000,5000), each made from the previous ' +
+           'finer level and written to the output file name with ' +
+           '_lod<k> inserted before the extension, k = 0 being the ' +
+           'finest level. Overrides the maximum number of faces.')
+  parser.add_argument('-L', '--ldf', \
+      type=str, default=None, \
+      help='ITK-SnAP label description file giving the names and ' +
+           'colours of the labels of an index object in a glTF scene.')
   parser.add_argument('-m', '--maxface', \
       type=int, default=20000, \
       help='Maximum number of faces in the surface triangulation.')
+  parser.add_argument('-q', '--quantise', \
+      type=int, default=16, \
+      help='Number of bits to which the vertex positions of binary ' +
+           'glTF files are quantised, 0 for floating point positions.')
+  parser.add_argument('-r', '--report', \
+      type=str, default=None, \
+      help='Write a JSON report of the wall time, CPU time and peak ' +
+           'memory of each stage (read, extraction, flip, decimation ' +
+           'and write) with the numbers of vertices and faces and the ' +
+           'sizes of the files written, to the given file (- for the ' +
+           'standard output, when all other output goes to the ' +
+           'standard error).')
+  parser.add_argument('-S', '--smoother', \
+      type=str, choices=wsf.smoothers, default='meshlab', \
+      help='Taubin smoothing by MeshLab or natively using a sparse ' +
+           'Laplacian with uniform or cotangent weights.')
   parser.add_argument('-t', '--tmpdir', \
       type=str, default='/tmp', \
-      help='Temporary directory for working files.')
+      help='Unused, the surface is now made without working files.')
   parser.add_argument('-v', '--verbose', \
       action='store_true', default=False, \
       help='Verbose output (mainly useful for debugging and reassurance ' +
@@ -79,8 +152,12 @@ def ParseArgs():
   parser.add_argument('-x', '--voxelscaling', \
       action='store_true', default=False, \
       help='Use voxel size scaling.')
-  parser.add_argument('infile',
-      help='Input Woolz domain.')
+  parser.add_argument('infile', nargs='+',
+      help='Input Woolz domain or index object. Several files, ' +
+           'directories (of .wlz files) or glob patterns may be given ' +
+           'for a batch, in which case the output file must either ' +
+           'contain %%s, which is replaced by each input file\'s base ' +
+           'name, or be a directory for VTK files.')
   args = parser.parse_args()
   return(args)
 
@@ -96,196 +173,544 @@ def ReadWoolzFile(filename):
   return(obj)
 
 
-def WriteWoolzObject(filename, obj):
-  errNum = Wlz.enum__WlzErrorNum(Wlz.WLZ_ERR_FILE_OPEN)
-  afn = bytes(filename, 'ascii')
-  fp = libc.fopen(afn, b'wb')
-  if(bool(fp)):
-    errNum = Wlz.WlzWriteObj(fp, obj)
-    libc.fclose(fp)
-  return(errNum)
-
-
-def StartMeshLabFilter(flt):
-  flt.append('<!DOCTYPE FilterScript>')
-  flt.append('<FilterScript>')
-  flt.append('<filter name="Merge Close Vertices">')
-  flt.append('<Param type="RichAbsPerc" value="0.1" min="0" ' + \
-             'name="Threshold" max="16"/>')
-  flt.append('</filter>')
-
-
-def EndMeshLabFilter(flt):
-  flt.append('</FilterScript>')
-
-
-def AppendMeshLabFilter(flt, target_face_count, taubin_steps):
-  if(target_face_count > 0):
-    flt.append('<filter name="Simplification: Quadric Edge Collapse Decimation">')
-    flt.append('<Param type = "RichInt"   value = "' + \
-               str(target_face_count) + '" ' + \
-               'name = "TargetFaceNum"/>')
-    flt.append('<Param type = "RichFloat" value = "0"     ' + \
-               'name = "TargetPerc"/>')
-    flt.append('<Param type = "RichFloat" value = "0.3"   ' + \
-               'name = "QualityThr"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "PreserveBoundary"/>')
-    flt.append('<Param type = "RichFloat" value = "1"     ' + \
-               'name = "BoundaryWeight"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "PreserveNormal"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "PreserveTopology"/>')
-    flt.append('<Param type = "RichBool"  value = "true"  ' + \
-               'name = "OptimalPlacement"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "PlanarQuadric"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "QualityWeight"/>')
-    flt.append('<Param type = "RichBool"  value = "true"  ' + \
-               'name = "AutoClean"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "Selected"/>')
-    flt.append('</filter>')
-  if(taubin_steps > 0):
-    flt.append('<filter name="Taubin Smooth">')
-    flt.append('<Param type = "RichFloat" value = "0.5"   ' + \
-               'name = "lambda"/>')
-    flt.append('<Param type = "RichFloat" value = "-0.53" ' + \
-               'name = "mu"/>')
-    flt.append('<Param type = "RichInt"   value = "' + \
-               str(taubin_steps) + '"    ' + \
-               'name = "stepSmoothNum"/>')
-    flt.append('<Param type = "RichBool"  value = "false" ' + \
-               'name = "Selected"/>')
-    flt.append('</filter>')
-
-
-def WriteMeshLabFilter(filename, flt):
-  with open(filename, "w") as ff:
-    for fr in flt:
-      print(fr, file=ff)
-  ff.close()
-
-def CleanExit(stat):
-  for f in glob.glob(workfile + '[0-1].*'):
-    os.remove(f)
-  exit(stat)
-
-if __name__ == '__main__':
-  args = ParseArgs()
-  prog = sys.argv[0];
+# Returns the origin [x, y, z] and shape [z, y, x] of the given 3D
+# domain's bounding box padded by a voxel all round, so that the
+# surface is closed, together with the voxel size [x, y, z].
+def DomainBox(obj):
   errNum = Wlz.enum__WlzErrorNum(Wlz.WLZ_ERR_NONE)
+  box = Wlz.WlzBoundingBox3I(obj, ctypes.byref(errNum))
+  if(bool(errNum)):
+    return(None, None, None)
+  org = [box.xMin - 1, box.yMin - 1, box.zMin - 1]
+  shp = [box.zMax - box.zMin + 3, box.yMax - box.yMin + 3, 
+         box.xMax - box.xMin + 3]
+  vsz = obj.contents.domain.p.contents.voxel_size
+  return(org, shp, [float(vsz[0]), float(vsz[1]), float(vsz[2])])
 
-  if(args.verbose):
-    print('Args = ' + str(args))
 
-  workfile = tempfile.mktemp(dir=args.tmpdir, prefix='wd2vs')
+# Extracts the surface of a mask with the given origin [x, y, z] using marching
+# cubes. Returns the vertices (n, 3) of x, y, z and the triangular faces
+# (m, 3) with their normals directed out of the domain. The surface is
+# extracted in voxel coordinates, which are exact (integers and halves),
+# and only then scaled by the voxel size, so that vertices computed in
+# different blocks (see BlockedDomainSurface()) are identical.
+def MaskToSurface(mask, org, vsz):
+  verts, faces, _, _ = measure.marching_cubes(mask, level=0.5,
+                                              allow_degenerate=False)
+  # Marching cubes works in z, y, x order.
+  verts = verts[:, ::-1] + np.array(org, dtype=np.float64)
+  if(vsz is not None):
+    verts = verts * np.array(vsz, dtype=np.float64)
+  return(verts, faces)
 
-  # Use MAVTKDomainToSurf to create an stl file corresponding to the
-  # given Woolz domain.
-  cmdline = [MAVTKDomainToSurf, '-o' + workfile + '0.stl']
-  if(args.voxelscaling):
-    cmdline.append('-z')
-  cmdline.append(args.infile)
-  if(args.verbose):
-    print(cmdline)
-  rtn = subprocess.call(cmdline)
-  if(bool(rtn)):
-    print(prog + ': MAVTKDomainToSurf failed to create stl file.')
-    CleanExit(1)
-
-  # Convert the stl file to a Woolz contour object, read it in and then
-  # find the number of faces in the model.
-  cmdline = [WlzExtFFConvert, '-o' + workfile + '0.wlz', \
-             workfile + '0.stl']
-  if(args.verbose):
-    print(cmdline)
-  rtn = subprocess.call(cmdline)
-  if(bool(rtn)):
-    print(prog + ': WlzExtFFConvert failed to convert stl file to wlz.')
-    CleanExit(1)
-  obj = Wlz.WlzAssignObject(ReadWoolzFile(workfile + '0.wlz'), None)
-  if(not bool(obj)):
-    print(prog + ': Failed to read Woolz file.')
-    CleanExit(1)
-  model = obj.contents.domain.ctr.contents.model
-  n_faces = model.contents.res.face.numElm
-  if(args.verbose):
-    print('Initial number of faces = ' + str(n_faces))
+
+# The domain being extracted in blocks. Worker processes are forked
+# after this is set so they share the object with the parent process.
+block_obj = None
+
+# Extracts the surface within one block of block_obj, given by the
+# block's origin [x, y, z] and shape [z, y, x], in voxel coordinates.
+def DomainBlockSurface(job):
+  org, shp = job
+  mask = ws.DomainMaskToNP(block_obj, org, shp)
+  if(mask.min() == mask.max()):
+    return(np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int32))
+  return(MaskToSurface(mask, org, None))
+
+
+# Extracts the surface of a domain with the given padded bounding box
+# in blocks of at most block voxels along each side, using n_jobs
+# processes. Adjacent blocks share a plane of voxels, so each marching
+# cubes cell is in exactly one block and the vertices on the shared
+# planes are identical in both blocks. The seams are closed by welding
+# these vertices, in voxel coordinates where they are exact, before
+# the vertices are scaled by the voxel size.
+def BlockedDomainSurface(obj, org, shp, vsz, block, n_jobs):
+  global block_obj
+  jobs = []
+  for z in range(0, shp[0] - 1, block):
+    for y in range(0, shp[1] - 1, block):
+      for x in range(0, shp[2] - 1, block):
+        jobs.append(([org[0] + x, org[1] + y, org[2] + z],
+                     [min(block, shp[0] - 1 - z) + 1,
+                      min(block, shp[1] - 1 - y) + 1,
+                      min(block, shp[2] - 1 - x) + 1]))
+  block_obj = obj
+  if(n_jobs > 1):
+    with ProcessPoolExecutor(max_workers=n_jobs,
+             mp_context=multiprocessing.get_context('fork')) as pool:
+      parts = list(pool.map(DomainBlockSurface, jobs))
+  else:
+    parts = [DomainBlockSurface(j) for j in jobs]
+  block_obj = None
+  n_verts = np.cumsum([0] + [p[0].shape[0] for p in parts])
+  verts = np.concatenate([p[0] for p in parts])
+  faces = np.concatenate([p[1] + n_verts[i] for i, p in enumerate(parts)])
+  verts, faces = mio.WeldVertices(verts, faces)
+  return(verts * np.array(vsz, dtype=np.float64), faces)
+
+
+# Flips, simplifies and writes a surface according to the options in
+# opt (the parsed command line arguments), either to outfile or to a
+# file for each level of detail, recording the stages in the given
+# StageReport. If meshes is given the surfaces are appended to it as
+# (level, vertices, faces) tuples rather than being written. Returns the
+# number of faces written (for the finest level) and an error message
+# which is None on success.
+def ProcessSurface(verts, faces, outfile, opt, report = None,
+                   meshes = None):
+  if(report is None):
+    report = wsf.StageReport(False)
+  if(opt.flip):
+    st = report.begin('flip')
+    faces = mio.FlipFaces(faces)
+    report.end(st)
+  kwargs = {}
+  ext = os.path.splitext(outfile)[1].lower()
+  if(ext == '.vtk'):
+    kwargs['binary'] = opt.binary
+  elif(ext == '.glb'):
+    kwargs['bits'] = opt.quantise
+  def write(filename, verts, faces, **tags):
+    if(meshes is not None):
+      meshes.append((tags.get('level', 0), verts, faces))
+      return
+    st = report.begin('write', **tags)
+    try:
+      mio.WriteMesh(filename, verts, faces, **kwargs)
+    finally:
+      report.end(st)
+    report.setFile(st, filename)
+  if(bool(opt.lod)):
+    # Write each level of detail as it is made.
+    n_out = []
+    st = [report.begin('decimation', level=0)]
+    def writeLevel(k, maxface, ms):
+      m = ms.current_mesh()
+      report.end(st[0])
+      report.setMesh(st[0], m.vertex_number(), m.face_number())
+      write(wsf.LODOutFile(outfile, k), m.vertex_matrix(), m.face_matrix(),
+            level=k)
+      n_out.append(m.face_number())
+      if(k + 1 < len(opt.lod)):
+        st[0] = report.begin('decimation', level=k + 1)
+    ms = wsf.MakeMeshSet(verts, faces, opt.verbose)
+    try:
+      wsf.SimplifyMeshLOD(ms, opt.lod, writeLevel, verbose=opt.verbose,
+                          smoother=opt.smoother)
+    except (mio.MeshIOError, IOError) as e:
+      return(0, 'Failed to write levels of detail for ' + outfile +
+                ' (' + str(e) + ').')
+    return(n_out[0], None)
+  if(not opt.nosimplify):
+    st = report.begin('decimation')
+    ms = wsf.MakeMeshSet(verts, faces, opt.verbose)
+    wsf.SimplifyMesh(ms, opt.maxface, verbose=opt.verbose,
+                     smoother=opt.smoother)
+    m = ms.current_mesh()
+    verts = m.vertex_matrix()
+    faces = m.face_matrix()
+    report.end(st)
+    report.setMesh(st, verts.shape[0], faces.shape[0])
+  try:
+    write(outfile, verts, faces)
+  except (mio.MeshIOError, IOError) as e:
+    return(0, 'Failed to write ' + outfile + ' (' + str(e) + ').')
+  return(faces.shape[0], None)
+
+
+# Returns the files written by ProcessSurface() for outfile.
+def OutFiles(outfile, opt):
+  if(bool(opt.lod)):
+    return([wsf.LODOutFile(outfile, k) for k in range(0, len(opt.lod))])
+  return([outfile])
+
+
+# Returns the surface cache given by the options or None if there is
+# no cache.
+def OpenCache(opt):
+  if(not bool(opt.cache)):
+    return(None)
+  return(wsc.SurfaceCache(opt.cache, opt.cachesize << 20))
+
+
+# Returns the parameters which, together with the input file, determine
+# the files written for outfile.
+def CacheParams(outfile, opt):
+  return({'prog': 'WlzDomainToVTKSurf',
+          'outfile': os.path.basename(outfile),
+          'binary': opt.binary, 'flip': opt.flip, 'index': opt.index,
+          'lod': opt.lod, 'maxface': opt.maxface,
+          'nosimplify': opt.nosimplify, 'smoother': opt.smoother,
+          'voxelscaling': opt.voxelscaling, 'quantise': opt.quantise,
+          'ldf': LDFHash(opt)})
+
+
+# Returns a hash of the content of the label description file, which
+# gives the names and colours of the surfaces in a glTF scene.
+def LDFHash(opt):
+  if(not bool(opt.ldf)):
+    return(None)
+  with open(opt.ldf, 'rb') as f:
+    return(hashlib.sha256(f.read()).hexdigest())
+
+
+# Adds the files written for an input file to the cache, a failure
+# to do so only being reported.
+def CacheStore(cache, key, outfile, files):
+  try:
+    cache.store(key, outfile, files)
+  except (IOError, OSError) as e:
+    print(prog + ': Failed to cache surfaces (' + str(e) + ').',
+          file=sys.stderr)
+
+
+# Returns True if the surfaces of all the labels of an index object are
+# to be written to a single glTF scene rather than a file per label.
+def IsScene(outfile, opt):
+  return(opt.index and (not '%' in outfile) and
+         (os.path.splitext(outfile)[1].lower() == '.glb'))
+
+
+# Returns the output file name for a label of an index object.
+def LabelOutFile(outfile, lbl):
+  if('%' in outfile):
+    return(outfile % lbl)
+  base, ext = os.path.splitext(outfile)
+  return(base + str(lbl) + ext)
+
+
+# Makes the surface of a single label, run in the worker pool. The job
+# is the label, its padded mask, the mask origin, the voxel size, the
+# output file, whether the surface is for a glTF scene and the options.
+# Returns the label, the number of faces
+# extracted and written, an error message, the stage records and, for
+# a glTF scene, the surfaces made (see ProcessSurface()).
+def LabelSurface(job):
+  lbl, mask, org, vsz, outfile, scene, opt = job
+  meshes = [] if scene else None
+  report = wsf.StageReport(bool(opt.report))
+  st = report.begin('extraction')
+  verts, faces = MaskToSurface(mask, org, vsz)
+  report.end(st)
+  report.setMesh(st, verts.shape[0], faces.shape[0])
+  if(faces.shape[0] < 4):
+    return(lbl, faces.shape[0], 0,
+           'Invalid surface model (n_faces = ' + str(faces.shape[0]) + ')',
+           report.stages, None)
+  n_out, msg = ProcessSurface(verts, faces, outfile, opt, report, meshes)
+  return(lbl, faces.shape[0], n_out, msg, report.stages, meshes)
+
+
+# Makes the surface of a 3D domain, writing it to outfile, using n_jobs
+# processes for large domains, recording the stages in the given
+# StageReport. Returns the number of faces extracted and written and an
+# error message which is None on success.
+def DomainSurface(obj, outfile, opt, n_jobs = 1, report = None):
+  if(report is None):
+    report = wsf.StageReport(False)
+  # Rasterise the domain and extract its surface, in blocks if it is
+  # large.
+  st = report.begin('extraction')
+  org, shp, vsz = DomainBox(obj)
+  if(org is None):
+    report.end(st)
+    return(0, 0, 'Failed to compute domain bounding box.')
+  if(not opt.voxelscaling):
+    vsz = [1.0, 1.0, 1.0]
+  if(max(shp) > opt.block + 1):
+    verts, faces = BlockedDomainSurface(obj, org, shp, vsz, opt.block,
+                                        n_jobs)
+  else:
+    verts, faces = MaskToSurface(ws.DomainMaskToNP(obj, org, shp), org, vsz)
+  report.end(st)
+  report.setMesh(st, verts.shape[0], faces.shape[0])
+  n_faces = faces.shape[0]
   if(n_faces < 4):
-    print(prog + ': Invalid surface model (n_faces = ' + str(n_faces) + ')')
-    CleanExit(1)
-
-  # Flip face orientation if required.
-  if(args.flip):
-    if(args.verbose):
-      print('Flipping face orientation.')
-    errNum = Wlz.WlzGMFilterFlipOrient(model);
-    if(bool(errNum)):
-      print(prog + ': Failed to flip face orientation (' +
-            Wlz.WlzStringFromErrorNum(errNum, None) + ').')
-      CleanExit(1)
-
-  # Write the Woolz object file using the stl file format.
-  if(args.verbose):
-    print('Writing working Woolz file.')
-  if(bool(WriteWoolzObject(workfile + '0.wlz', obj))):
-    print(prog + ': Failed to write working Woolz file.')
-    CleanExit(1)
-  Wlz.WlzFreeObj(obj)
-  cmdline = [WlzExtFFConvert, '-o' + workfile + '0.stl', \
-             workfile + '0.wlz']
+    return(n_faces, 0,
+           'Invalid surface model (n_faces = ' + str(n_faces) + ')')
+  # Flip, reduce the number of faces, smooth and write the surface.
+  n_out, msg = ProcessSurface(verts, faces, outfile, opt, report)
+  return(n_faces, n_out, msg)
+
+
+# Reads a domain file and makes its surface, run in the worker pool for
+# batches of files. Failures are returned as messages rather than
+# raised so that they do not stop the batch. Returns the input file,
+# the number of faces extracted and written (both None if the surface
+# was found in the cache), an error message and the stage records.
+def DomainFileSurface(job):
+  infile, outfile, opt = job
+  n_in, n_out, msg = 0, 0, None
+  report = wsf.StageReport(bool(opt.report))
+  try:
+    cache = OpenCache(opt)
+    if(cache is not None):
+      st = report.begin('cache')
+      key = cache.key(infile, CacheParams(outfile, opt))
+      hit = cache.fetch(key, outfile) is not None
+      report.end(st)
+      if(hit):
+        return(infile, None, None, None, report.stages)
+    st = report.begin('read')
+    obj = ReadWoolzFile(infile)
+    report.end(st)
+    if((not bool(obj)) or (obj.contents.type != Wlz.WLZ_3D_DOMAINOBJ)):
+      msg = 'Failed to read 3D Woolz domain.'
+    else:
+      obj = Wlz.WlzAssignObject(obj, None)
+      n_in, n_out, msg = DomainSurface(obj, outfile, opt, 1, report)
+      Wlz.WlzFreeObj(obj)
+      if((cache is not None) and (not bool(msg))):
+        CacheStore(cache, key, outfile, OutFiles(outfile, opt))
+  except Exception as e:
+    msg = 'Failed (' + str(e) + ').'
+  return(infile, n_in, n_out, msg, report.stages)
+
+
+# Makes a surface for each label of a 3D index object. The labels are
+# found in a single pass over the label volume, then each label's mask
+# is cut from the volume within its bounding box. Because each mask is
+# thresholded midway between label and not label, the surfaces of
+# adjacent labels pass through the same vertices where they meet.
+# Returns the number of labels which failed and an error message for
+# failures other than those of individual labels. If given, the files
+# written are appended to the list written and the stages, tagged with
+# their labels, are recorded in the StageReport.
+def IndexSurfaces(obj, outfile, written = None, report = None):
+  if(report is None):
+    report = wsf.StageReport(False)
   if(args.verbose):
-    print(cmdline)
-  rtn = subprocess.call(cmdline)
-  if(bool(rtn)):
-    print(prog + ': WlzExtFFConvert failed to convert working wlz file to stl.')
-    CleanExit(1)
-
-  # Create meshlab filter script to reduce the number of faces and smooth
-  # the surface
+    print('Extracting label volume.')
+  st = report.begin('label_volume')
+  vol, org, gtype, errNum = ws.Obj3DToNP(obj)
+  if(bool(errNum) or (not np.issubdtype(vol.dtype, np.integer))):
+    report.end(st)
+    return(0, 'Failed to extract integer label volume from index object.')
+  vsz = [1.0, 1.0, 1.0]
+  if(args.voxelscaling):
+    v = obj.contents.domain.p.contents.voxel_size
+    vsz = [float(v[0]), float(v[1]), float(v[2])]
+  scene = IsScene(outfile, args)
+  meshes = {}
+  slices = ndimage.find_objects(np.maximum(vol, 0))
+  report.end(st)
+  n_labels = len([sl for sl in slices if sl is not None])
+  st['n_labels'] = n_labels
   if(args.verbose):
-    print('Creating MeshLab filter file.')
-  flt = []
-  taubin_steps = 10
-  StartMeshLabFilter(flt)
-  if(n_faces > args.maxface):
-    face_count = n_faces
-    while(face_count > args.maxface):
-      if(face_count > args.maxface * 4):
-        face_count = face_count / 4
+    print('Making surfaces for ' + str(n_labels) + ' labels.')
+  # The label masks are made as they are needed, with at most a couple
+  # of jobs per worker waiting, rather than all being held at once.
+  def Jobs():
+    for i, sl in enumerate(slices):
+      if(sl is not None):
+        lbl = i + 1
+        mask = np.pad(vol[sl] == lbl, 1).astype(np.uint8)
+        morg = [org[0] + sl[2].start - 1, org[1] + sl[1].start - 1,
+                org[2] + sl[0].start - 1]
+        yield (lbl, mask, morg, vsz,
+               outfile if scene else LabelOutFile(outfile, lbl), scene,
+               args)
+  def Results(pool):
+    jobs = Jobs()
+    pending = deque()
+    for job in jobs:
+      pending.append(pool.submit(LabelSurface, job))
+      if(len(pending) >= 2 * args.jobs):
+        yield pending.popleft().result()
+    while(len(pending) > 0):
+      yield pending.popleft().result()
+  n_err = 0
+  with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+    for lbl, n_in, n_out, msg, stages, lms in Results(pool):
+      report.merge(stages, label=lbl)
+      if(bool(msg)):
+        print(prog + ': Label ' + str(lbl) + ': ' + msg, file=sys.stderr)
+        n_err = n_err + 1
       else:
-        face_count = args.maxface
-      AppendMeshLabFilter(flt, face_count, taubin_steps)
-      taubin_steps = 4
-  else:
-    AppendMeshLabFilter(flt, 0, taubin_steps)
-  EndMeshLabFilter(flt)
-  WriteMeshLabFilter(workfile + '0.mlx', flt)
-  
-  # Execute the MeshLab filter
-  if(args.verbose):
-    print('Executing MeshLab filter file.')
-  ms = pymeshlab.MeshSet()
-  if(args.verbose):
-    ms.set_verbosity(True)
-  ms.load_new_mesh(workfile + '0.stl')
-  ms.load_filter_script(workfile + '0.mlx')
-  ms.apply_filter_script()
-  ms.save_current_mesh(workfile + '1.stl')
+        if(scene):
+          meshes[lbl] = lms
+        elif(written is not None):
+          written += OutFiles(LabelOutFile(outfile, lbl), args)
+        if(args.verbose):
+          print('Label ' + str(lbl) + ' ' + str(n_in) + ' -> ' +
+                str(n_out) + ' faces.')
+  if(scene and (len(meshes) > 0)):
+    msg = WriteScene(outfile, meshes, report)
+    if(bool(msg)):
+      return(n_err, msg)
+    if(written is not None):
+      written += OutFiles(outfile, args)
+  return(n_err, None)
+
+
+# Writes the surfaces of the labels of an index object as the nodes of
+# a glTF scene (for each level of detail), named and coloured using the
+# label description file if given. The surfaces are given by a dict
+# mapping each label to its list of (level, vertices, faces) tuples.
+# Returns an error message which is None on success.
+def WriteScene(outfile, meshes, report):
+  labels = {}
+  if(bool(args.ldf)):
+    try:
+      labels = mio.ReadITKSnapLabels(args.ldf)
+    except (IOError, ValueError) as e:
+      return('Failed to read label description file ' + args.ldf +
+             ' (' + str(e) + ').')
+  for k, filename in enumerate(OutFiles(outfile, args)):
+    nodes = []
+    for lbl in sorted(meshes):
+      name, colour = 'label' + str(lbl), None
+      if(lbl in labels):
+        name = labels[lbl]['name']
+        colour = tuple([v / 255.0 for v in labels[lbl]['rgb']] +
+                       [labels[lbl]['alpha']])
+      nodes += [(name, v, f, colour) for l, v, f in meshes[lbl] if l == k]
+    st = report.begin('write', level=k)
+    try:
+      mio.WriteGLBScene(filename, nodes, args.quantise)
+    except (mio.MeshIOError, IOError) as e:
+      return('Failed to write ' + filename + ' (' + str(e) + ').')
+    finally:
+      report.end(st)
+    report.setFile(st, filename)
+  return(None)
+
+
+# Expands the input arguments, each of which may be a file, a directory
+# (all the .wlz files in it) or a glob pattern, into a list of files.
+def InputFiles(inputs):
+  files = []
+  for f in inputs:
+    if(os.path.isdir(f)):
+      files += sorted(glob.glob(os.path.join(f, '*.wlz')))
+    elif(os.path.exists(f)):
+      files.append(f)
+    else:
+      files += sorted(glob.glob(f))
+  return(files)
+
+
+# Returns the output file for an input file of a batch. The output
+# file argument is either a pattern containing %s, which is replaced by
+# the input file's base name, or a directory for VTK files.
+def BatchOutFile(outfile, infile):
+  base = os.path.splitext(os.path.basename(infile))[0]
+  if('%s' in outfile):
+    return(outfile.replace('%s', base))
+  return(os.path.join(outfile, base + '.vtk'))
+
+
+# Writes the stage report if one was requested.
+def WriteReport(report, infiles):
+  if(bool(args.report)):
+    try:
+      report.write(args.report, prog='WlzDomainToVTKSurf', infiles=infiles)
+    except IOError as e:
+      print(prog + ': Failed to write report (' + str(e) + ').')
+
+
+if __name__ == '__main__':
+  args = ParseArgs()
+  prog = sys.argv[0];
+  report = wsf.StageReport(bool(args.report))
+  if(args.report == '-'):
+    report.reserveStdout()
+  if(bool(args.lod)):
+    try:
+      args.lod = wsf.ParseLOD(args.lod)
+    except ValueError as e:
+      print(prog + ': ' + str(e))
+      exit(1)
 
-  # Convert the STL file to VTK
-  if(args.verbose):
-    print('Converting to output format.')
-  cmdline = [WlzExtFFConvert, '-o' + args.outfile, \
-             workfile + '1.stl']
   if(args.verbose):
-    print(cmdline)
-  rtn = subprocess.call(cmdline)
-  if(bool(rtn)):
-    print(prog + ': WlzExtFFConvert failed to convert working stl file to vtk.')
-    CleanExit(1)
+    print('Args = ' + str(args))
+  if(args.index and (not args.nosimplify)):
+    print(prog + ': Warning: the surfaces of adjacent labels are ' +
+          'simplified independently so their shared boundaries will ' +
+          'not match, use -n to keep them closed.', file=sys.stderr)
+
+  infiles = InputFiles(args.infile)
+  if(len(infiles) == 0):
+    print(prog + ': No input files.')
+    exit(1)
+  batch = (len(infiles) > 1) or (infiles[0] != args.infile[0])
+  if(batch and (not '%s' in args.outfile) and
+     (not os.path.isdir(args.outfile))):
+    print(prog + ': Output must be a directory or contain %s for ' +
+          'multiple input files.')
+    exit(1)
+
+  if(batch and (not args.index)):
+    # Domains are processed in parallel by a pool of persistent worker
+    # processes.
+    jobs = [(f, BatchOutFile(args.outfile, f), args) for f in infiles]
+    n_err = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+      for f, n_in, n_out, msg, stages in pool.map(DomainFileSurface, jobs):
+        report.merge(stages, infile=f)
+        if(bool(msg)):
+          print(prog + ': ' + f + ': ' + msg, file=sys.stderr)
+          n_err = n_err + 1
+        elif(args.verbose):
+          if(n_in is None):
+            print(f + ' from cache.')
+          else:
+            print(f + ' ' + str(n_in) + ' -> ' + str(n_out) + ' faces.')
+    WriteReport(report, infiles)
+    if(n_err > 0):
+      print(prog + ': Failed to make surfaces for ' + str(n_err) + ' of ' +
+            str(len(infiles)) + ' domains.')
+      exit(1)
+  else:
+    # Single domains and index objects are processed one at a time, the
+    # labels of index objects being processed in parallel.
+    n_err = 0
+    cache = OpenCache(args)
+    for f in infiles:
+      outfile = BatchOutFile(args.outfile, f) if batch else args.outfile
+      if(cache is not None):
+        st = report.begin('cache', infile=f)
+        try:
+          key = cache.key(f, CacheParams(outfile, args))
+          hit = cache.fetch(key, outfile) is not None
+        except (IOError, OSError):
+          # Unreadable input files are reported when read below.
+          key, hit = None, False
+        report.end(st)
+        if(hit):
+          if(args.verbose):
+            print('Copied surfaces for ' + f + ' from cache.')
+          continue
+      st = report.begin('read', infile=f)
+      obj = ReadWoolzFile(f)
+      report.end(st)
+      if((not bool(obj)) or (obj.contents.type != Wlz.WLZ_3D_DOMAINOBJ)):
+        print(prog + ': Failed to read 3D Woolz object from ' + f + '.')
+        n_err = n_err + 1
+        continue
+      obj = Wlz.WlzAssignObject(obj, None)
+      written = []
+      if(args.index):
+        n, msg = IndexSurfaces(obj, outfile, written, report)
+        n_err = n_err + n
+        if(n > 0):
+          written = None
+      else:
+        n_in, n, msg = DomainSurface(obj, outfile, args, args.jobs, report)
+        written = OutFiles(outfile, args)
+        if(args.verbose and (not bool(msg))):
+          print('Wrote ' + str(n) + ' of ' + str(n_in) + ' faces to ' +
+                outfile + '.')
+      Wlz.WlzFreeObj(obj)
+      if(bool(msg)):
+        print(prog + ': ' + msg)
+        n_err = n_err + 1
+      elif((cache is not None) and (key is not None) and
+           (written is not None)):
+        CacheStore(cache, key, outfile, written)
+    WriteReport(report, infiles)
+    if(n_err > 0):
+      exit(1)
 
-  CleanExit(0)
+  exit(0)
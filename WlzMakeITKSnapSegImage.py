@@ -38,12 +38,16 @@
 
 from __future__ import print_function
 import os
-import re
 import sys
 import ctypes as c
 import argparse
 import subprocess
+import collections
+import numpy as np
 import Wlz as w
+import WlzSection as ws
+import WlzMeshIO as mio
+from concurrent.futures import ThreadPoolExecutor
 
 libc = c.CDLL('libc.so.6')
 
@@ -70,12 +74,21 @@ def ParseArgs(): #{
       'corresponding to the given ITK-SnAP label description file. All ' + \
       'files are both read and written using the Woolz file format, use ' + \
       'WlzExtFFConvert to convert them to NIfTI as required.')
+  parser.add_argument('-a', '--ahead', \
+      type=int, default=1, \
+      help='number of domains read ahead of painting when streaming, ' + \
+           'each of which is held in memory (more overlaps reading ' + \
+           'with painting at the cost of memory).')
   parser.add_argument('-c', '--compound', \
       action='store_true', default=False, \
       help='output compound object instead of index object.')
   parser.add_argument('-d', '--domaindir', \
       type=str, default='.', \
       help='directory containing the Woolz domains.')
+  parser.add_argument('-j', '--threads', \
+      type=int, default=16, \
+      help='number of threads used to read the domains (when not ' + \
+           'streaming, see --ahead).')
   parser.add_argument('-o', '--output', \
       type=str, default='-', \
       help='output segmentation image.')
@@ -83,6 +96,15 @@ def ParseArgs(): #{
       type=str, default='', \
       help='reference image (used to ensure index object is the same size' + \
            'the reference object).')
+  parser.add_argument('-s', '--stream', \
+      action='store_true', default=False, \
+      help='paint each domain into the index object as it is read and ' + \
+           'then free it, rather than holding all the domains, so that ' + \
+           'peak memory is that of the index object and the domains ' + \
+           'being read (one by default, see --ahead). The index ' + \
+           'object covers the reference object\'s bounding box (or else ' + \
+           'that of all the domains, found by reading them first) and ' + \
+           'has the narrowest grey type for the largest index.')
   parser.add_argument('-v', '--verbose', \
       action='store_true', default=False, \
       help='verbose output (mainly useful for debugging).')
@@ -93,75 +115,185 @@ def ParseArgs(): #{
   return(args)
 #}
 
+# Parses the label description file, returning a list of the positive
+# domain indices and a list of the corresponding domain names.
+def ParseLDF(): #{
+  dom_idxs = []
+  dom_names = []
+  try: #{
+    labels = mio.ReadITKSnapLabels(args.ldf)
+  except (IOError, ValueError) as e: #}{
+    ErrorMsg('Failed to read label description file ' + args.ldf + \
+             ' (' + str(e) + ')')
+  #}
+  for dom_idx, lbl in labels.items(): #{
+    VerbMsg('idx = ' + str(dom_idx) + ' dom = ' + lbl['name'])
+    if(dom_idx > 0): #{
+      dom_idxs.append(dom_idx)
+      dom_names.append(lbl['name'])
+    #}
+  #}
+  return(dom_idxs, dom_names)
+#}
+
+# Reads the named domain and, if props is True, gives it a name
+# property, run in the thread pool (the Woolz calls release the GIL).
+# Failures are returned as messages rather than reported, so that the
+# main thread can exit. Returns the object (None on failure) and an
+# error message.
+def ReadDomain(dom_name, props = True): #{
+  obj = None
+  errNum = w.enum__WlzErrorNum(w.WLZ_ERR_FILE_OPEN)
+  dom_file = args.domaindir + '/' + dom_name + '.wlz'
+  try: #{
+    fp = libc.fopen(dom_file.encode('utf-8'), b'rb')
+    if not bool(fp): #{
+      raise IOError()
+    #}
+    obj = w.WlzAssignObject( \
+          w.WlzReadObj(fp, c.byref(errNum)), None)
+    libc.fclose(fp)
+    if(bool(errNum)): #{
+      raise IOError()
+    #}
+    if not props: #{
+      return(obj, None)
+    #}
+    p_lst = w.WlzMakePropertyList(None)
+    p_nam = w.WlzMakeNameProperty(dom_name.encode('utf-8'),
+                                  c.byref(errNum))
+    if(bool(errNum)): #{
+      raise WlzError()
+    #}
+    ft = c.CFUNCTYPE(c.c_void_p, c.c_void_p)\
+                    (w.WlzFreePropertyListEntry)
+    alcerr = w.AlcDLPListEntryAppend(p_lst.contents.list, None, \
+                   p_nam, ft)
+    if(bool(alcerr)): #{
+      raise WlzError()
+    #}
+    obj.contents.plist = w.WlzAssignPropertyList(p_lst, None)
+  except IOError: #}{
+    return(None, 'Failed to read domain from file ' + dom_file + \
+                 ' (' + w.WlzStringFromErrorNum(errNum, None) + ')')
+  except WlzError: #}{
+    return(None, 'Failed to process domain from file ' + dom_file + \
+                 ' (' + w.WlzStringFromErrorNum(errNum, None) + ')')
+  #}
+  return(obj, None)
+#}
+
+# Yields the results of ReadDomain() for each of the named domains in
+# turn, using the given thread pool with at most n domains being read
+# or waiting to be used at any time.
+def ReadDomainsAhead(pool, dom_names, n, props): #{
+  reads = collections.deque()
+  for dom_name in dom_names: #{
+    reads.append(pool.submit(ReadDomain, dom_name, props))
+    if len(reads) >= n: #{
+      yield reads.popleft().result()
+    #}
+  #}
+  while len(reads) > 0: #{
+    yield reads.popleft().result()
+  #}
+#}
+
+# Reads the reference object and returns its bounding box.
+def ReadReferenceBox(): #{
+  try: #{
+    fp = None
+    errNum = w.enum__WlzErrorNum(w.WLZ_ERR_FILE_OPEN)
+    if args.reference == '-': #{
+      fp = libc.stdin
+    else: #}{
+      fp = libc.fopen(args.reference.encode('utf-8'), b'rb')
+    #}
+    if not bool(fp): #{
+      raise IOError()
+    #}
+    obj = w.WlzAssignObject( \
+          w.WlzReadObj(fp, c.byref(errNum)), None)
+    if not args.reference == '-': #{
+      libc.fclose(fp)
+    #}
+    if(bool(errNum)): #{
+      raise IOError()
+    #}
+    box = w.WlzBoundingBox3I(obj, c.byref(errNum))
+    w.WlzFreeObj(obj)
+    if(bool(errNum)): #{
+      raise WlzError()
+    #}
+  except IOError: #}{
+    ErrorMsg('Failed to read the reference object read from ' + \
+             args.reference + '.')
+  except WlzError: #}{
+    ErrorMsg('Failed to compute the bounding box of the reference ' + \
+             'object read from (' + args.reference + ') (' + \
+             w.WlzStringFromErrorNum(errNum, None) + ')')
+  #}
+  VerbMsg('Using bounding box ' + \
+          '(' + str(box.xMin) + ',' + str(box.xMax) + '),' + \
+          '(' + str(box.yMin) + ',' + str(box.yMax) + '),' + \
+          '(' + str(box.zMin) + ',' + str(box.zMax) + ')')
+  return(box)
+#}
+
+# Writes the index or compound object to the output file.
+def WriteOutputObj(obj, ft): #{
+  try: #{
+    VerbMsg('Writing ' + ft + ' object to output file (' + args.output + ').')
+    errNum = w.enum__WlzErrorNum(w.WLZ_ERR_FILE_OPEN)
+    if args.output == '-': #{
+      fp = libc.stdout
+    else: #}{
+      fp = libc.fopen(args.output.encode('utf-8'), b'wb')
+    #}
+    if not bool(fp): #{
+      raise IOError()
+    #}
+    errNum = w.WlzWriteObj(fp, obj)
+    if not args.output == '-': #{
+      libc.fclose(fp)
+    #}
+    if(bool(errNum)): #{
+      raise WlzError()
+    #}
+  except: #}{
+    ErrorMsg('Failed to write ' + ft + ' object to file (' + \
+             w.WlzStringFromErrorNum(errNum, None) + ')')
+  #}
+#}
+
 def ExportDomainsToIndexObj(): #{
-  # Get domain indices and names from the label description file
-  # adding the domain at each step.
+  # Get domain indices and names from the label description file then
+  # read the domains concurrently, since on network storage the time
+  # is dominated by waiting for each read.
   cpd_obj = None
   idx_obj = None
-  max_idx = 0
   obj_type = w.WLZ_NULL
-  dom_objs = []
-  dom_idxs = []
-  with open(args.ldf) as ldf: #{
-    for rec in ldf: #{
-      VerbMsg('rec = ' + rec)
-      if not re.match(r'^[ \t]*#', rec): #{
-        rec = rec.lstrip()
-        dom_idx = int(re.split('\s+', rec)[0])
-        dom_name = re.split('"', rec)[1]
-        VerbMsg('idx = ' + str(dom_idx) + ' dom = ' + dom_name)
-        if(dom_idx > 0): #{
-          try: #{
-            if dom_idx > max_idx: #{
-              max_idx = dom_idx
-            #}
-            dom_idxs.append(dom_idx)
-            errNum = w.enum__WlzErrorNum(w.WLZ_ERR_FILE_OPEN)
-            dom_file = args.domaindir + '/' + dom_name + '.wlz'
-            fp = libc.fopen(dom_file, 'rb')
-            if not bool(fp): #{
-              raise IOError()
-            #}
-            obj = w.WlzAssignObject( \
-                  w.WlzReadObj(fp, c.byref(errNum)), None)
-            if(bool(errNum)): #{
-              raise WlzError()
-            #}
-            p_lst = w.WlzMakePropertyList(None)
-            p_nam = w.WlzMakeNameProperty(dom_name, c.byref(errNum))
-            if(bool(errNum)): #{
-              raise WlzError()
-            #}
-            ft = c.CFUNCTYPE(c.c_void_p, c.c_void_p)\
-                            (w.WlzFreePropertyListEntry)
-            alcerr = w.AlcDLPListEntryAppend(p_lst.contents.list, None, \
-                           p_nam, ft)
-            if(bool(alcerr)): #{
-              raise WlzError()
-            #}
-            obj.contents.plist = w.WlzAssignPropertyList(p_lst, None)
-            dom_objs.append(obj)
-            libc.fclose(fp)
-            if(bool(errNum)): #{
-              raise WlzError()
-            #}
-            VerbMsg('domain object type (idx == ' + str(dom_idx) + ') ' + \
-                    str(w.WlzStringFromObjTypeValue( \
-                    obj.contents.type, None)))
-            if(obj_type == w.WLZ_NULL): #{
-              if((obj.contents.type == w.WLZ_2D_DOMAINOBJ) or \
-                 (obj.contents.type == w.WLZ_3D_DOMAINOBJ)): #{
-                obj_type = obj.contents.type
-              #}
-            #}
-          except IOError: #}{
-            ErrorMsg('Failed to read domain from file ' + dom_file + \
-                     ' (' + w.WlzStringFromErrorNum(errNum, None) + ')')
-          except WlzError: #}{
-            ErrorMsg('Failed to process domain from file ' + dom_file + \
-                     ' (' + w.WlzStringFromErrorNum(errNum, None) + ')')
-          #}
-        #}
+  errNum = w.enum__WlzErrorNum(w.WLZ_ERR_NONE)
+  dom_idxs, dom_names = ParseLDF()
+  max_idx = max(dom_idxs) if len(dom_idxs) > 0 else 0
+  VerbMsg('Reading ' + str(len(dom_names)) + ' domains using ' + \
+          str(args.threads) + ' threads.')
+  with ThreadPoolExecutor(max_workers = max(args.threads, 1)) as pool: #{
+    dom_objs = list(pool.map(ReadDomain, dom_names))
+  #}
+  for i in range(0, len(dom_objs)): #{
+    obj, msg = dom_objs[i]
+    if bool(msg): #{
+      ErrorMsg(msg)
+    #}
+    dom_objs[i] = obj
+    VerbMsg('domain object type (idx == ' + str(dom_idxs[i]) + ') ' + \
+            str(w.WlzStringFromObjTypeValue( \
+            obj.contents.type, None)))
+    if(obj_type == w.WLZ_NULL): #{
+      if((obj.contents.type == w.WLZ_2D_DOMAINOBJ) or \
+         (obj.contents.type == w.WLZ_3D_DOMAINOBJ)): #{
+        obj_type = obj.contents.type
       #}
     #}
   #}
@@ -202,39 +334,14 @@ def ExportDomainsToIndexObj(): #{
     #}
   #}
   if bool(args.reference) and (not args.compound): #{
+    box = ReadReferenceBox()
     try: #{
       VerbMsg('Cutting index object to the same bounding box as the\n' + \
               'reference object (read from ' + args.reference + ').')
-      fp = None
-      errNum = w.enum__WlzErrorNum(w.WLZ_ERR_FILE_OPEN)
-      if args.reference == '-': #{
-        fp = libc.stdin
-      else: #}{
-        fp = libc.fopen(args.reference, 'rb')
-      #}
-      if not bool(fp): #{
-        raise IOError()
-      #}
-      obj = w.WlzAssignObject( \
-            w.WlzReadObj(fp, c.byref(errNum)), None)
-      if not args.reference == '-': #{
-        libc.fclose(fp)
-      #}
+      gtype = w.WlzGreyTypeFromObj(idx_obj, c.byref(errNum))
       if(bool(errNum)): #{
         raise WlzError()
       #}
-      box = w.WlzBoundingBox3I(obj, c.byref(errNum))
-      if(not bool(errNum)): #{
-        gtype = w.WlzGreyTypeFromObj(idx_obj, c.byref(errNum))
-      #}
-      w.WlzFreeObj(obj)
-      if(bool(errNum)): #{
-        raise WlzError()
-      #}
-      VerbMsg('Using bounding box ' + \
-              '(' + str(box.xMin) + ',' + str(box.xMax) + '),' + \
-              '(' + str(box.yMin) + ',' + str(box.yMax) + '),' + \
-              '(' + str(box.zMin) + ',' + str(box.zMax) + ')')
       VerbMsg('Preserving grey type ' + \
               w.WlzStringFromGreyType(gtype, None) + \
               '.')
@@ -245,45 +352,139 @@ def ExportDomainsToIndexObj(): #{
       #}
       w.WlzFreeObj(idx_obj)
       idx_obj = obj
-    except IOError: #}{
-      ErrorMsg('Failed to read the reference object read from ' + \
-               args.reference + '.')
     except WlzError: #}{
       ErrorMsg('Failed to cut index object to the bounding box of the\n' + \
                'reference object read from (' + args.reference + ') (' + \
                w.WlzStringFromErrorNum(errNum, None) + ')')
     #}
   #}
-  try: #{
-    ft = 'index'
-    if args.compound: #{
-      ft = 'compound'
-    #}
-    VerbMsg('Writing ' + ft + ' object to output file (' + args.output + ').')
-    errNum = w.enum__WlzErrorNum(w.WLZ_ERR_FILE_OPEN)
-    if args.output == '-': #{
-      fp = libc.stdout
+  if args.compound: #{
+    WriteOutputObj(cpd_obj, 'compound')
+  else: #}{
+    WriteOutputObj(idx_obj, 'index')
+  #}
+#}
+
+# Makes the index object by painting each domain into it, a plane at a
+# time from the domain's intervals, as the domain is read, then freeing
+# the domain. Domains are painted in order of increasing index so that
+# where domains overlap the highest index is used.
+def StreamDomainsToIndexObj(): #{
+  errNum = w.enum__WlzErrorNum(w.WLZ_ERR_NONE)
+  dom_idxs, dom_names = ParseLDF()
+  if len(dom_idxs) == 0: #{
+    ErrorMsg('Require at least one 2 or 3D domain with a positive index.')
+  #}
+  order = sorted(range(0, len(dom_idxs)), key = lambda i: dom_idxs[i])
+  dom_idxs = [dom_idxs[i] for i in order]
+  dom_names = [dom_names[i] for i in order]
+  max_idx = dom_idxs[-1]
+  n_ahead = max(args.ahead, 1)
+  with ThreadPoolExecutor(max_workers = n_ahead) as pool: #{
+    # The domains must all be 2D or all 3D, the index object being of
+    # the same dimension.
+    obj_type = w.WLZ_NULL
+    if bool(args.reference): #{
+      box = ReadReferenceBox()
+      obj, msg = ReadDomain(dom_names[0], False)
+      if bool(msg): #{
+        ErrorMsg(msg)
+      #}
+      obj_type = obj.contents.type
+      w.WlzFreeObj(obj)
     else: #}{
-      fp = libc.fopen(args.output, 'wb')
+      VerbMsg('Finding the bounding box of the domains.')
+      box = None
+      for obj, msg in ReadDomainsAhead(pool, dom_names, n_ahead, False): #{
+        if bool(msg): #{
+          ErrorMsg(msg)
+        #}
+        if obj_type == w.WLZ_NULL: #{
+          obj_type = obj.contents.type
+        #}
+        dbox = w.WlzBoundingBox3I(obj, c.byref(errNum))
+        w.WlzFreeObj(obj)
+        if(bool(errNum)): #{
+          ErrorMsg('Failed to compute domain bounding box (' + \
+                   w.WlzStringFromErrorNum(errNum, None) + ')')
+        #}
+        if box is None: #{
+          box = dbox
+        else: #}{
+          box.xMin = min(box.xMin, dbox.xMin)
+          box.yMin = min(box.yMin, dbox.yMin)
+          box.zMin = min(box.zMin, dbox.zMin)
+          box.xMax = max(box.xMax, dbox.xMax)
+          box.yMax = max(box.yMax, dbox.yMax)
+          box.zMax = max(box.zMax, dbox.zMax)
+        #}
+      #}
     #}
-    if not bool(fp): #{
-      raise IOError()
+    if((not obj_type == w.WLZ_2D_DOMAINOBJ) and
+       (not obj_type == w.WLZ_3D_DOMAINOBJ)): #{
+      ErrorMsg('Domain ' + dom_names[0] + ' is not a 2 or 3D domain.')
     #}
-    if args.compound: #{
-      errNum = w.WlzWriteObj(fp, cpd_obj)
+    if max_idx <= 255: #{
+      gtype, vfield = w.WLZ_GREY_UBYTE, 'ubp'
+    elif max_idx <= 32767: #}{
+      gtype, vfield = w.WLZ_GREY_SHORT, 'shp'
     else: #}{
-      errNum = w.WlzWriteObj(fp, idx_obj)
+      gtype, vfield = w.WLZ_GREY_INT, 'inp'
     #}
-    if not args.output == '-': #{
-      libc.fclose(fp)
+    VerbMsg('Creating ' + w.WlzStringFromGreyType(gtype, None) + \
+            ' index object.')
+    nx = box.xMax - box.xMin + 1
+    ny = box.yMax - box.yMin + 1
+    if obj_type == w.WLZ_2D_DOMAINOBJ: #{
+      # The values of a 2D rectangular object are allocated here (as in
+      # WlzNumpyArrayDemo.py), zeroed by AlcCalloc().
+      val = w.WlzGreyP(0)
+      val.v = w.AlcCalloc(nx * ny, w.WlzGreySize(gtype))
+      idx_obj = w.WlzMakeRectI(box.yMin, box.yMax, box.xMin, box.xMax,
+                               gtype, val.inp, 0, None, None,
+                               c.byref(errNum))
+    else: #}{
+      idx_obj = w.WlzMakeCuboidI(box.zMin, box.zMax, box.yMin, box.yMax,
+                                 box.xMin, box.xMax, gtype, 0, None, None,
+                                 c.byref(errNum))
     #}
     if(bool(errNum)): #{
-      raise WlzError()
+      ErrorMsg('Failed to create index object (' + \
+               w.WlzStringFromErrorNum(errNum, None) + ')')
+    #}
+    idx_obj = w.WlzAssignObject(idx_obj, None)
+    # Views of each plane of the index object's values, a 2D object
+    # being a single plane at z = 0.
+    planes = []
+    if obj_type == w.WLZ_2D_DOMAINOBJ: #{
+      planes.append(np.ctypeslib.as_array(getattr(val, vfield), (ny, nx)))
+      org = [box.xMin, box.yMin, 0]
+    else: #}{
+      vvp = idx_obj.contents.values.vox.contents.values
+      for z in range(0, box.zMax - box.zMin + 1): #{
+        vp = getattr(vvp[z].r.contents.values, vfield)
+        planes.append(np.ctypeslib.as_array(vp, (ny, nx)))
+        planes[-1][:] = 0
+      #}
+      org = [box.xMin, box.yMin, box.zMin]
+    #}
+    reads = ReadDomainsAhead(pool, dom_names, n_ahead, False)
+    for i, (obj, msg) in enumerate(reads): #{
+      if bool(msg): #{
+        ErrorMsg(msg)
+      #}
+      if not obj.contents.type == obj_type: #{
+        ErrorMsg('Domain ' + dom_names[i] + ' is not a ' + \
+                 ('2' if obj_type == w.WLZ_2D_DOMAINOBJ else '3') + \
+                 'D domain like the others.')
+      #}
+      VerbMsg('Painting domain ' + dom_names[i] + ' (idx == ' + \
+              str(dom_idxs[i]) + ').')
+      ws.PaintDomainNP(obj, org, planes, dom_idxs[i])
+      w.WlzFreeObj(obj)
     #}
-  except: #}{
-    ErrorMsg('Failed to write ' + ft + ' object to file (' + \
-             w.WlzStringFromErrorNum(errNum, None) + ')')
   #}
+  WriteOutputObj(idx_obj, 'index')
 #}
 
 if __name__ == '__main__': #{
@@ -294,6 +495,13 @@ if __name__ == '__main__': #{
   if(args.verbose): #{
     print(prog + ': args = ' + str(args))
   #}
-  ExportDomainsToIndexObj()
+  if args.stream: #{
+    if args.compound: #{
+      ErrorMsg('A compound object can not be output when streaming.')
+    #}
+    StreamDomainsToIndexObj()
+  else: #}{
+    ExportDomainsToIndexObj()
+  #}
 #}
 
@@ -0,0 +1,1000 @@
+#!/usr/bin/python3
+##
+# \file         WlzMeshIO.py
+# \author       agent <agent@local>
+# \date         October 2026
+# \version      $Id$
+# \par
+# Address:
+#               MRC Human Genetics Unit,
+#               MRC Institute of Genetics and Molecular Medicine,
+#               University of Edinburgh,
+#               Western General Hospital,
+#               Edinburgh, EH4 2XU, UK.
+# \par
+# Copyright (C), [2026],
+# The University Court of the University of Edinburgh,
+# Old College, Edinburgh, UK.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be
+# useful but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public
+# License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+# \brief        Vectorised readers and writers for triangulated surface
+#               files (STL, legacy and XML VTK polydata, OBJ, OFF, PLY
+#               and binary glTF), with vertex welding and face
+#               orientation reversal,
+#               all working on numpy arrays of vertices (n, 3) and
+#               faces (m, 3).
+##
+
+from __future__ import print_function
+import os
+import re
+import sys
+import json
+import zlib
+import struct
+import numpy as np
+
+class MeshIOError(Exception):
+  pass
+
+# Formats for coordinates in ASCII files which preserve float32 values
+# (for formats which declare float coordinates) and float64 values (for
+# untyped formats).
+float_fmt = '%.9g'
+double_fmt = '%.17g'
+
+# Returns the given vertices with duplicates (vertices with the same
+# coordinates or, if tol > 0, which round to the same multiple of tol)
+# merged, together with the faces reindexed to the merged vertices and
+# with faces which have become degenerate removed.
+def WeldVertices(verts, faces, tol = 0.0): #{
+  verts = np.asarray(verts, dtype=np.float64)
+  key = verts if tol <= 0.0 else np.rint(verts / tol)
+  # Sort the vertices so that duplicates are adjacent and number the
+  # runs of equal vertices.
+  order = np.lexsort((key[:, 2], key[:, 1], key[:, 0]))
+  k = key[order]
+  new = np.ones(k.shape[0], dtype=bool)
+  new[1:] = np.any(k[1:] != k[:-1], axis=1)
+  inv = np.empty(k.shape[0], dtype=np.int64)
+  inv[order] = np.cumsum(new) - 1
+  first = order[new]
+  f = inv[faces]
+  ok = (f[:, 0] != f[:, 1]) & (f[:, 1] != f[:, 2]) & (f[:, 2] != f[:, 0])
+  return(verts[first], np.ascontiguousarray(f[ok], dtype=np.int32))
+#}
+
+# Returns the faces with their orientation (winding) reversed.
+def FlipFaces(faces): #{
+  return(np.ascontiguousarray(faces[:, ::-1]))
+#}
+
+# Returns the unit normals of the given faces.
+def FaceNormals(verts, faces): #{
+  v = verts[faces]
+  n = np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0])
+  l = np.sqrt(np.sum(n * n, axis=1))
+  return(n / np.where(l > 0.0, l, 1.0)[:, np.newaxis])
+#}
+
+# Triangulates polygons, given by their vertex counts and a flat array
+# of their vertex indices, as fans about their first vertices.
+def FanTriangulate(counts, idx): #{
+  counts = np.asarray(counts, dtype=np.intp)
+  idx = np.asarray(idx)
+  starts = np.cumsum(counts) - counts
+  nt = np.maximum(counts - 2, 0)
+  cell = np.repeat(np.arange(counts.size), nt)
+  j = np.arange(cell.size) - np.repeat(np.cumsum(nt) - nt, nt) + 1
+  s = starts[cell]
+  return(np.stack((idx[s], idx[s + j], idx[s + j + 1]),
+                  axis=1).astype(np.int32))
+#}
+
+# Splits a legacy VTK cell array [k, i1, ..., ik, k, ...] of n cells
+# into counts and indices. All triangle arrays are handled without a
+# Python level loop.
+def SplitCellArray(cells, n): #{
+  cells = np.asarray(cells)
+  if (cells.size == 4 * n) and np.all(cells[0::4] == 3): #{
+    c4 = cells.reshape(n, 4)
+    return(np.full(n, 3), c4[:, 1:].ravel())
+  #}
+  counts = np.zeros(n, dtype=np.intp)
+  keep = np.ones(cells.size, dtype=bool)
+  p = 0
+  for i in range(0, n): #{
+    counts[i] = cells[p]
+    keep[p] = False
+    p += counts[i] + 1
+  #}
+  return(counts, cells[keep])
+#}
+
+#
+# STL
+#
+stl_dtype = np.dtype([('n', '<f4', (3,)), ('v', '<f4', (3, 3)),
+                      ('a', '<u2')])
+
+def ReadSTL(filename): #{
+  with open(filename, 'rb') as f: #{
+    buf = f.read()
+  #}
+  n = int(np.frombuffer(buf, dtype='<u4', count=1, offset=80)[0]) \
+      if len(buf) >= 84 else -1
+  if (n >= 0) and (len(buf) == 84 + n * stl_dtype.itemsize): #{
+    tri = np.frombuffer(buf, dtype=stl_dtype, count=n, offset=84)
+    v = tri['v'].reshape(-1, 3).astype(np.float64)
+  else: #}{
+    v = np.array(re.findall(rb'vertex\s+(\S+)\s+(\S+)\s+(\S+)', buf),
+                 dtype=np.float64).reshape(-1, 3)
+  #}
+  return(WeldVertices(v, np.arange(v.shape[0]).reshape(-1, 3)))
+#}
+
+def WriteSTL(filename, verts, faces, binary = True): #{
+  nrm = FaceNormals(verts, faces)
+  if binary: #{
+    tri = np.zeros(faces.shape[0], dtype=stl_dtype)
+    tri['n'] = nrm
+    tri['v'] = verts[faces]
+    with open(filename, 'wb') as f: #{
+      f.write(b'binary STL'.ljust(80, b' '))
+      f.write(np.array([faces.shape[0]], dtype='<u4').tobytes())
+      f.write(tri.tobytes())
+    #}
+  else: #}{
+    with open(filename, 'w') as f: #{
+      print('solid surface', file=f)
+      v = verts[faces]
+      for i in range(0, faces.shape[0]): #{
+        print('facet normal %g %g %g\n outer loop' % tuple(nrm[i]), file=f)
+        for j in range(0, 3): #{
+          print('  vertex ' + ' '.join([double_fmt] * 3) % tuple(v[i, j]),
+                file=f)
+        #}
+        print(' endloop\nendfacet', file=f)
+      #}
+      print('endsolid surface', file=f)
+    #}
+  #}
+#}
+
+#
+# Legacy VTK polydata
+#
+vtk_types = {b'float': '>f4', b'double': '>f8', b'int': '>i4',
+             b'unsigned_int': '>u4', b'long': '>i8',
+             b'vtktypeint32': '>i4', b'vtktypeint64': '>i8'}
+
+class VTKLegacyParser(object): #{
+  # Reads the keyword lines and arrays of a legacy VTK file, which may
+  # be either ASCII or (big endian) binary.
+
+  def __init__(self, buf): #{
+    self.buf = buf
+    self.pos = 0
+    self.version = self.line()
+    self.title = self.line()
+    self.binary = self.line().upper().startswith(b'BINARY')
+  #}
+
+  def line(self): #{
+    # Returns the next non empty line, or None at the end of the file.
+    while self.pos < len(self.buf): #{
+      e = self.buf.find(b'\n', self.pos)
+      if e < 0: #{
+        e = len(self.buf)
+      #}
+      ln = self.buf[self.pos:e].strip()
+      self.pos = e + 1
+      if len(ln) > 0: #{
+        return(ln)
+      #}
+    #}
+    return(None)
+  #}
+
+  def array(self, n, vtype): #{
+    # Returns the next n values of the given VTK type.
+    if self.binary: #{
+      dt = np.dtype(vtk_types[vtype])
+      a = np.frombuffer(self.buf, dtype=dt, count=n, offset=self.pos)
+      self.pos += n * dt.itemsize
+    else: #}{
+      a = []
+      na = 0
+      while na < n: #{
+        t = self.line().split()
+        a.append(t)
+        na += len(t)
+      #}
+      a = np.array([x for t in a for x in t]).astype(vtk_types[vtype][1:])
+    #}
+    return(a)
+  #}
+
+  def cells(self, n, size): #{
+    # Returns the counts and indices of a cell array, in either the
+    # older or 5.1 (offsets and connectivity) layout.
+    p = self.pos
+    ln = self.line()
+    if (ln is not None) and ln.startswith(b'OFFSETS'): #{
+      off = self.array(n, ln.split()[1])
+      ln = self.line()
+      idx = self.array(size, ln.split()[1])
+      return(np.diff(off), idx)
+    #}
+    self.pos = p
+    return(SplitCellArray(self.array(size, b'int'), n))
+  #}
+#}
+
+def ReadVTK(filename): #{
+  with open(filename, 'rb') as f: #{
+    buf = f.read()
+  #}
+  prs = VTKLegacyParser(buf)
+  verts = None
+  faces = np.zeros((0, 3), dtype=np.int32)
+  ln = prs.line()
+  while ln is not None: #{
+    t = ln.split()
+    if t[0] == b'DATASET': #{
+      if t[1] != b'POLYDATA': #{
+        raise MeshIOError('VTK dataset is not POLYDATA.')
+      #}
+    elif t[0] == b'POINTS': #}{
+      verts = prs.array(3 * int(t[1]), t[2]).reshape(-1, 3)
+      verts = verts.astype(np.float64)
+    elif t[0] in [b'VERTICES', b'LINES', b'POLYGONS', b'TRIANGLE_STRIPS']: #}{
+      counts, idx = prs.cells(int(t[1]), int(t[2]))
+      if t[0] == b'POLYGONS': #{
+        faces = FanTriangulate(counts, idx)
+      #}
+    elif t[0] in [b'POINT_DATA', b'CELL_DATA']: #}{
+      break
+    #}
+    ln = prs.line()
+  #}
+  if verts is None: #{
+    raise MeshIOError('VTK file has no points.')
+  #}
+  return(verts, faces)
+#}
+
+def WriteVTK(filename, verts, faces, binary = False,
+             title = 'Woolz surface'): #{
+  nf = faces.shape[0]
+  cells = np.empty((nf, 4), dtype='>i4')
+  cells[:, 0] = 3
+  cells[:, 1:] = faces
+  with open(filename, 'wb') as f: #{
+    f.write(b'# vtk DataFile Version 3.0\n')
+    f.write(title.encode('utf-8') + b'\n')
+    f.write(b'BINARY\n' if binary else b'ASCII\n')
+    f.write(b'DATASET POLYDATA\n')
+    f.write(('POINTS ' + str(verts.shape[0]) + ' float\n').encode('ascii'))
+    if binary: #{
+      f.write(np.asarray(verts, dtype='>f4').tobytes())
+      f.write(b'\n')
+    else: #}{
+      np.savetxt(f, np.asarray(verts, dtype=np.float32), fmt=float_fmt)
+    #}
+    f.write(('POLYGONS ' + str(nf) + ' ' + str(4 * nf) + '\n').encode('ascii'))
+    if binary: #{
+      f.write(cells.tobytes())
+      f.write(b'\n')
+    else: #}{
+      np.savetxt(f, cells, fmt='%d')
+    #}
+  #}
+#}
+
+#
+# XML VTK polydata (VTP) with appended, optionally zlib compressed, data
+#
+vtp_types = {'Int8': 'i1', 'UInt8': 'u1', 'Int16': 'i2', 'UInt16': 'u2',
+             'Int32': 'i4', 'UInt32': 'u4', 'Int64': 'i8', 'UInt64': 'u8',
+             'Float32': 'f4', 'Float64': 'f8'}
+
+def VTPBlock(a, level, block_size): #{
+  # Returns the appended data block for the array a, compressed in
+  # blocks of block_size bytes if level > 0, with a UInt64 header.
+  raw = np.ascontiguousarray(a).tobytes()
+  if level <= 0: #{
+    return(np.array([len(raw)], dtype='<u8').tobytes() + raw)
+  #}
+  blks = [zlib.compress(raw[i:i + block_size], level)
+          for i in range(0, len(raw), block_size)]
+  # The size of a partial last block, zero if it is a full block.
+  last = len(raw) % block_size
+  hdr = [len(blks), block_size, last] + [len(b) for b in blks]
+  return(np.array(hdr, dtype='<u8').tobytes() + b''.join(blks))
+#}
+
+def WriteVTP(filename, verts, faces, level = 6, block_size = 1 << 16): #{
+  nf = faces.shape[0]
+  arrays = [('Points', 'Float32', 3, None, np.asarray(verts, dtype='<f4')),
+            ('Polys', 'Int32', 1, 'connectivity',
+             np.asarray(faces, dtype='<i4').ravel()),
+            ('Polys', 'Int32', 1, 'offsets',
+             np.arange(3, 3 * nf + 1, 3, dtype='<i4'))]
+  blocks = [VTPBlock(a[4], level, block_size) for a in arrays]
+  off = np.cumsum([0] + [len(b) for b in blocks])
+  cmp = ' compressor="vtkZLibDataCompressor"' if level > 0 else ''
+  xml = ['<?xml version="1.0"?>',
+         '<VTKFile type="PolyData" version="1.0" byte_order="LittleEndian"' +
+         ' header_type="UInt64"' + cmp + '>',
+         '  <PolyData>',
+         '    <Piece NumberOfPoints="' + str(verts.shape[0]) + '"' +
+         ' NumberOfVerts="0" NumberOfLines="0" NumberOfStrips="0"' +
+         ' NumberOfPolys="' + str(nf) + '">']
+  grp = None
+  for i, (g, vtype, nc, name, a) in enumerate(arrays): #{
+    if g != grp: #{
+      if grp is not None: #{
+        xml.append('      </' + grp + '>')
+      #}
+      xml.append('      <' + g + '>')
+      grp = g
+    #}
+    xml.append('        <DataArray type="' + vtype + '"' +
+               ('' if name is None else ' Name="' + name + '"') +
+               ' NumberOfComponents="' + str(nc) + '"' +
+               ' format="appended" offset="' + str(off[i]) + '"/>')
+  #}
+  xml += ['      </' + grp + '>',
+          '    </Piece>',
+          '  </PolyData>',
+          '  <AppendedData encoding="raw">']
+  with open(filename, 'wb') as f: #{
+    f.write(('\n'.join(xml) + '\n   _').encode('ascii'))
+    for b in blocks: #{
+      f.write(b)
+    #}
+    f.write(b'\n  </AppendedData>\n</VTKFile>\n')
+  #}
+#}
+
+def ReadVTP(filename): #{
+  # Reads VTP files with appended raw or inline ASCII data arrays, as
+  # written by WriteVTP() and by VTK.
+  with open(filename, 'rb') as f: #{
+    buf = f.read()
+  #}
+  app = buf.find(b'<AppendedData')
+  head = buf[0:app] if app >= 0 else buf
+  data = None
+  if app >= 0: #{
+    data = buf.find(b'_', buf.find(b'>', app)) + 1
+  #}
+  attr = lambda tag, k, d = None: (re.search(rb'\b' + k + rb'="([^"]*)"', tag)
+                                   or [None, d])[1]
+  root = re.search(rb'<VTKFile[^>]*>', head).group(0)
+  if attr(root, b'type') != b'PolyData': #{
+    raise MeshIOError('VTK XML file is not PolyData.')
+  #}
+  bo = '>' if attr(root, b'byte_order') == b'BigEndian' else '<'
+  hdt = np.dtype(bo + vtp_types[attr(root, b'header_type',
+                                          b'UInt32').decode()])
+  compressed = attr(root, b'compressor') is not None
+  def array(m): #{
+    tag = m.group(1)
+    dt = np.dtype(bo + vtp_types[attr(tag, b'type').decode()])
+    if attr(tag, b'format') == b'appended': #{
+      p = data + int(attr(tag, b'offset'))
+      if compressed: #{
+        nb = int(np.frombuffer(buf, dtype=hdt, count=1, offset=p)[0])
+        h = np.frombuffer(buf, dtype=hdt, count=3 + nb, offset=p)
+        p += (3 + nb) * hdt.itemsize
+        raw = []
+        for n in h[3:]: #{
+          raw.append(zlib.decompress(buf[p:p + int(n)]))
+          p += int(n)
+        #}
+        raw = b''.join(raw)
+      else: #}{
+        n = int(np.frombuffer(buf, dtype=hdt, count=1, offset=p)[0])
+        raw = buf[p + hdt.itemsize:p + hdt.itemsize + n]
+      #}
+      return(np.frombuffer(raw, dtype=dt))
+    elif attr(tag, b'format') == b'ascii': #}{
+      return(np.array(m.group(2).split()).astype(dt))
+    #}
+    raise MeshIOError('Unsupported VTP data array format.')
+  #}
+  arrays = {}
+  for grp in [b'Points', b'Polys']: #{
+    g = re.search(rb'<' + grp + rb'>(.*?)</' + grp + rb'>', head, re.S)
+    if g is None: #{
+      continue
+    #}
+    for m in re.finditer(rb'<DataArray([^>]*?)(?:/>|>(.*?)</DataArray>)',
+                         g.group(1), re.S): #{
+      arrays[(grp, attr(m.group(1), b'Name'))] = array(m)
+    #}
+  #}
+  pts = [v for k, v in arrays.items() if k[0] == b'Points']
+  if len(pts) == 0: #{
+    raise MeshIOError('VTP file has no points.')
+  #}
+  verts = pts[0].reshape(-1, 3).astype(np.float64)
+  faces = np.zeros((0, 3), dtype=np.int32)
+  if (b'Polys', b'offsets') in arrays: #{
+    off = arrays[(b'Polys', b'offsets')].astype(np.intp)
+    counts = np.diff(np.concatenate(([0], off)))
+    faces = FanTriangulate(counts, arrays[(b'Polys', b'connectivity')])
+  #}
+  return(verts, faces)
+#}
+
+#
+# OBJ and OFF
+#
+def ReadOBJ(filename): #{
+  vl = []
+  counts = []
+  idx = []
+  with open(filename, 'r') as f: #{
+    for ln in f: #{
+      if ln.startswith('v '): #{
+        vl.append(ln.split()[1:4])
+      elif ln.startswith('f '): #}{
+        # Indices are one based, or relative to the end if negative.
+        fi = [int(t.split('/')[0]) for t in ln.split()[1:]]
+        idx.extend([i - 1 if i > 0 else len(vl) + i for i in fi])
+        counts.append(len(fi))
+      #}
+    #}
+  #}
+  verts = np.array(vl, dtype=np.float64).reshape(-1, 3)
+  return(verts, FanTriangulate(counts, idx))
+#}
+
+def WriteOBJ(filename, verts, faces): #{
+  with open(filename, 'w') as f: #{
+    np.savetxt(f, verts, fmt='v ' + ' '.join([double_fmt] * 3))
+    np.savetxt(f, faces + 1, fmt='f %d %d %d')
+  #}
+#}
+
+def ReadOFF(filename): #{
+  # Vertices may be followed by normals, colours etc and faces by
+  # colours, so the file is read a line at a time.
+  with open(filename, 'rb') as f: #{
+    lns = [l for l in (re.sub(rb'#.*', b'', x).strip()
+                       for x in f.read().splitlines()) if len(l) > 0]
+  #}
+  t = lns[0].split()
+  if not t[0].endswith(b'OFF'): #{
+    raise MeshIOError('Not an OFF file.')
+  #}
+  p = 1
+  if len(t) == 1: #{
+    t = lns[1].split()
+    p = 2
+  else: #}{
+    t = t[1:]
+  #}
+  nv, nf = int(t[0]), int(t[1])
+  verts = np.array([l.split()[0:3] for l in lns[p:p + nv]]).astype(np.float64)
+  fl = [l.split() for l in lns[p + nv:p + nv + nf]]
+  counts = [int(t[0]) for t in fl]
+  idx = [int(i) for t in fl for i in t[1:1 + int(t[0])]]
+  return(verts.reshape(-1, 3), FanTriangulate(counts, idx))
+#}
+
+def WriteOFF(filename, verts, faces): #{
+  with open(filename, 'w') as f: #{
+    print('OFF', file=f)
+    print(str(verts.shape[0]) + ' ' + str(faces.shape[0]) + ' 0', file=f)
+    np.savetxt(f, verts, fmt=double_fmt)
+    np.savetxt(f, faces, fmt='3 %d %d %d')
+  #}
+#}
+
+#
+# PLY
+#
+ply_types = {'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+             'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+             'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+             'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'}
+
+def ReadPLYHeader(buf): #{
+  # Returns the format, the elements (as a list of name, count and list
+  # of properties) and the offset of the data.
+  end = buf.find(b'end_header')
+  if (not buf.startswith(b'ply')) or (end < 0): #{
+    raise MeshIOError('Not a PLY file.')
+  #}
+  fmt = None
+  elms = []
+  for ln in buf[0:end].decode('ascii').splitlines(): #{
+    t = ln.split()
+    if len(t) == 0: #{
+      continue
+    elif t[0] == 'format': #}{
+      fmt = t[1]
+    elif t[0] == 'element': #}{
+      elms.append((t[1], int(t[2]), []))
+    elif t[0] == 'property': #}{
+      # Properties are (name, type) or (name, count type, index type).
+      if t[1] == 'list': #{
+        elms[-1][2].append((t[4], ply_types[t[2]], ply_types[t[3]]))
+      else: #}{
+        elms[-1][2].append((t[2], ply_types[t[1]]))
+      #}
+    #}
+  #}
+  return(fmt, elms, buf.find(b'\n', end) + 1)
+#}
+
+def ReadPLY(filename): #{
+  with open(filename, 'rb') as f: #{
+    buf = f.read()
+  #}
+  fmt, elms, pos = ReadPLYHeader(buf)
+  bo = {'binary_little_endian': '<', 'binary_big_endian': '>'}.get(fmt)
+  tok = None
+  if not bo: #{
+    tok = buf[pos:].split()
+    pos = 0
+  #}
+  verts = None
+  faces = np.zeros((0, 3), dtype=np.int32)
+  for name, n, props in elms: #{
+    # Read assuming that lists all have three entries, which is checked
+    # below, falling back to reading element by element.
+    dt = []
+    for p in props: #{
+      if len(p) == 2: #{
+        dt.append((p[0], (bo or '<') + p[1]))
+      else: #}{
+        dt.append((p[0] + '_n', (bo or '<') + p[1]))
+        dt.append((p[0], (bo or '<') + p[2], (3,)))
+      #}
+    #}
+    dt = np.dtype(dt)
+    fixed = True
+    nfld = sum(1 if len(p) == 2 else 4 for p in props)
+    if bo: #{
+      if pos + n * dt.itemsize <= len(buf): #{
+        a = np.frombuffer(buf, dtype=dt, count=n, offset=pos)
+      else: #}{
+        fixed = False
+      #}
+    else: #}{
+      a = np.zeros(n, dtype=dt)
+      try: #{
+        if len(tok) - pos < n * nfld: #{
+          raise ValueError()
+        #}
+        t = np.array(tok[pos:pos + n * nfld]).reshape(n, nfld)
+        k = 0
+        for p in props: #{
+          if len(p) == 2: #{
+            a[p[0]] = t[:, k].astype(p[1])
+            k += 1
+          else: #}{
+            a[p[0] + '_n'] = t[:, k].astype(p[1])
+            a[p[0]] = t[:, k + 1:k + 4].astype(p[2])
+            k += 4
+          #}
+        #}
+      except ValueError: #}{
+        fixed = False
+      #}
+    #}
+    for p in props: #{
+      if fixed and (len(p) == 3) and np.any(a[p[0] + '_n'] != 3): #{
+        fixed = False
+      #}
+    #}
+    if fixed: #{
+      pos += n * (dt.itemsize if bo else nfld)
+      lists = dict((p[0], (np.full(n, 3), a[p[0]].ravel()))
+                   for p in props if len(p) == 3)
+    else: #}{
+      a, lists, pos = ReadPLYElement(buf if bo else tok, pos, bo, n, props)
+    #}
+    if name == 'vertex': #{
+      verts = np.stack((a['x'], a['y'], a['z']), axis=1).astype(np.float64)
+    elif name == 'face': #}{
+      for k in ['vertex_indices', 'vertex_index']: #{
+        if k in lists: #{
+          faces = FanTriangulate(*lists[k])
+        #}
+      #}
+    #}
+  #}
+  if verts is None: #{
+    raise MeshIOError('PLY file has no vertices.')
+  #}
+  return(verts, faces)
+#}
+
+def ReadPLYElement(src, pos, bo, n, props): #{
+  # Reads an element with variable length lists one entry at a time,
+  # from either a buffer (binary) or a list of tokens (ASCII). Returns
+  # the scalar properties, the list properties as counts and indices
+  # and the new position.
+  sc = dict((p[0], np.zeros(n, dtype=p[1])) for p in props if len(p) == 2)
+  ls = dict((p[0], ([], [])) for p in props if len(p) == 3)
+  def get(t): #{
+    nonlocal pos
+    if bo: #{
+      dt = np.dtype(bo + t)
+      v = np.frombuffer(src, dtype=dt, count=1, offset=pos)[0]
+      pos += dt.itemsize
+    else: #}{
+      v = np.array(src[pos]).astype(t)
+      pos += 1
+    #}
+    return(v)
+  #}
+  for i in range(0, n): #{
+    for p in props: #{
+      if len(p) == 2: #{
+        sc[p[0]][i] = get(p[1])
+      else: #}{
+        k = int(get(p[1]))
+        ls[p[0]][0].append(k)
+        ls[p[0]][1].extend([get(p[2]) for j in range(0, k)])
+      #}
+    #}
+  #}
+  return(sc, ls, pos)
+#}
+
+def WritePLY(filename, verts, faces, binary = True): #{
+  with open(filename, 'wb') as f: #{
+    fmt = 'binary_little_endian' if binary else 'ascii'
+    f.write(('ply\nformat ' + fmt + ' 1.0\n' +
+             'element vertex ' + str(verts.shape[0]) + '\n' +
+             'property float x\nproperty float y\nproperty float z\n' +
+             'element face ' + str(faces.shape[0]) + '\n' +
+             'property list uchar int vertex_indices\n' +
+             'end_header\n').encode('ascii'))
+    if binary: #{
+      f.write(np.asarray(verts, dtype='<f4').tobytes())
+      fa = np.zeros(faces.shape[0],
+                    dtype=np.dtype([('n', 'u1'), ('i', '<i4', (3,))]))
+      fa['n'] = 3
+      fa['i'] = faces
+      f.write(fa.tobytes())
+    else: #}{
+      np.savetxt(f, np.asarray(verts, dtype=np.float32), fmt=float_fmt)
+      np.savetxt(f, faces, fmt='3 %d %d %d')
+    #}
+  #}
+#}
+
+#
+# Binary glTF (GLB)
+#
+glb_types = {5120: 'i1', 5121: 'u1', 5122: '<i2', 5123: '<u2',
+             5125: '<u4', 5126: '<f4'}
+glb_ncomp = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT4': 16}
+
+# Returns unit vertex normals, each being the sum of the area weighted
+# normals of the faces which share the vertex.
+def VertexNormals(verts, faces): #{
+  v = verts[faces]
+  fn = np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0])
+  vn = np.zeros(verts.shape, dtype=np.float64)
+  for k in range(0, 3): #{
+    vn[:, k] = np.bincount(faces.ravel(), weights=np.repeat(fn[:, k], 3),
+                           minlength=verts.shape[0])
+  #}
+  l = np.sqrt(np.sum(vn * vn, axis=1))
+  return(vn / np.where(l > 0.0, l, 1.0)[:, np.newaxis])
+#}
+
+# Writes a binary glTF file with a node for each of the given meshes,
+# which are tuples of name, vertices, faces and colour (an sRGB red,
+# green, blue, alpha tuple in [0, 1] or None for grey). If bits is
+# non-zero, vertex positions are quantised to unsigned integers of the
+# given number of bits (at most 16) on a grid common to all meshes, so
+# that vertices shared by adjacent surfaces remain coincident, each
+# node's translation and (uniform) scale mapping the grid back to the
+# original coordinates. This uses the KHR_mesh_quantization extension,
+# as do the byte vertex normals which are written if normals is True.
+def WriteGLBScene(filename, meshes, bits = 16, normals = True): #{
+  meshes = [(n, np.asarray(v, dtype=np.float64), np.asarray(f))
+            + (c,) for n, v, f, c in meshes if len(f) > 0]
+  if len(meshes) == 0: #{
+    raise MeshIOError('No surfaces to write to glTF file.')
+  #}
+  if (bits < 0) or (bits > 16): #{
+    raise MeshIOError('Invalid glTF quantisation bits ' + str(bits) + '.')
+  #}
+  gltf = {'asset': {'version': '2.0', 'generator': 'WlzMeshIO'},
+          'buffers': [], 'bufferViews': [], 'accessors': [],
+          'materials': [], 'meshes': [], 'nodes': [],
+          'scenes': [{'nodes': list(range(0, len(meshes)))}], 'scene': 0}
+  if bits > 0: #{
+    lo = np.min([m[1].min(axis=0) for m in meshes], axis=0)
+    hi = np.max([m[1].max(axis=0) for m in meshes], axis=0)
+    qmax = float((1 << bits) - 1)
+    scale = max(float(np.max(hi - lo)), sys.float_info.min) / qmax
+    gltf['extensionsUsed'] = ['KHR_mesh_quantization']
+    gltf['extensionsRequired'] = ['KHR_mesh_quantization']
+  #}
+  parts = []
+  blen = [0]
+  def view(a, target, stride = None): #{
+    # Adds a buffer view of the array a, aligned to four bytes.
+    raw = np.ascontiguousarray(a).tobytes()
+    bv = {'buffer': 0, 'byteOffset': blen[0], 'byteLength': len(raw),
+          'target': target}
+    if stride is not None: #{
+      bv['byteStride'] = stride
+    #}
+    pad = (-len(raw)) % 4
+    parts.append(raw + b'\0' * pad)
+    blen[0] += len(raw) + pad
+    gltf['bufferViews'].append(bv)
+    return(len(gltf['bufferViews']) - 1)
+  #}
+  def accessor(bv, ctype, n, atype, **kwargs): #{
+    acc = {'bufferView': bv, 'componentType': ctype, 'count': n,
+           'type': atype}
+    acc.update(kwargs)
+    gltf['accessors'].append(acc)
+    return(len(gltf['accessors']) - 1)
+  #}
+  for name, verts, faces, colour in meshes: #{
+    nv = verts.shape[0]
+    node = {'name': name, 'mesh': len(gltf['meshes'])}
+    attr = {}
+    if bits > 0: #{
+      q = np.rint((verts - lo) / scale).astype(np.int64)
+      pos = np.zeros((nv, 4), dtype='<u2')
+      pos[:, 0:3] = q
+      attr['POSITION'] = accessor(view(pos, 34962, 8), 5123, nv, 'VEC3',
+                                  min=q.min(axis=0).tolist(),
+                                  max=q.max(axis=0).tolist())
+      node['translation'] = lo.tolist()
+      node['scale'] = [scale, scale, scale]
+    else: #}{
+      pos = verts.astype('<f4')
+      attr['POSITION'] = accessor(view(pos, 34962), 5126, nv, 'VEC3',
+                                  min=pos.min(axis=0).tolist(),
+                                  max=pos.max(axis=0).tolist())
+    #}
+    if normals: #{
+      nrm = np.zeros((nv, 4), dtype='i1')
+      nrm[:, 0:3] = np.rint(VertexNormals(verts, faces) * 127.0)
+      attr['NORMAL'] = accessor(view(nrm, 34962, 4), 5120, nv, 'VEC3',
+                                normalized=True)
+    #}
+    itype = '<u2' if nv < 65536 else '<u4'
+    idx = accessor(view(faces.astype(itype).ravel(), 34963),
+                   5123 if nv < 65536 else 5125, faces.size, 'SCALAR')
+    if colour is None: #{
+      colour = (0.8, 0.8, 0.8, 1.0)
+    #}
+    # Base colour factors are linear rather than sRGB.
+    rgb = np.asarray(colour[0:3], dtype=np.float64)
+    rgb = np.where(rgb <= 0.04045, rgb / 12.92,
+                   ((rgb + 0.055) / 1.055) ** 2.4)
+    alpha = float(colour[3]) if len(colour) > 3 else 1.0
+    mat = {'name': name,
+           'pbrMetallicRoughness': {'baseColorFactor': rgb.tolist() + [alpha],
+                                    'metallicFactor': 0.0,
+                                    'roughnessFactor': 0.8}}
+    if alpha < 1.0: #{
+      mat['alphaMode'] = 'BLEND'
+    #}
+    gltf['materials'].append(mat)
+    gltf['meshes'].append({'name': name, 'primitives': [
+        {'attributes': attr, 'indices': idx, 'mode': 4,
+         'material': len(gltf['materials']) - 1}]})
+    gltf['nodes'].append(node)
+  #}
+  gltf['buffers'].append({'byteLength': blen[0]})
+  js = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+  js += b' ' * ((-len(js)) % 4)
+  with open(filename, 'wb') as f: #{
+    f.write(struct.pack('<4sII', b'glTF', 2, 28 + len(js) + blen[0]))
+    f.write(struct.pack('<II', len(js), 0x4E4F534A) + js)
+    f.write(struct.pack('<II', blen[0], 0x004E4942))
+    for p in parts: #{
+      f.write(p)
+    #}
+  #}
+#}
+
+def WriteGLB(filename, verts, faces, bits = 16, normals = True,
+             colour = None, name = 'surface'): #{
+  WriteGLBScene(filename, [(name, verts, faces, colour)], bits, normals)
+#}
+
+def ReadGLB(filename): #{
+  # Reads the triangles of all meshes in the default scene of a binary
+  # glTF file, transformed by their nodes, as a single surface.
+  with open(filename, 'rb') as f: #{
+    buf = f.read()
+  #}
+  magic, version, length = struct.unpack_from('<4sII', buf, 0)
+  if (magic != b'glTF') or (version != 2): #{
+    raise MeshIOError('Not a binary glTF 2.0 file.')
+  #}
+  p = 12
+  gltf = None
+  bin_off = None
+  while p + 8 <= min(length, len(buf)): #{
+    clen, ctype = struct.unpack_from('<II', buf, p)
+    if ctype == 0x4E4F534A: #{
+      gltf = json.loads(buf[p + 8:p + 8 + clen].decode('utf-8'))
+    elif (ctype == 0x004E4942) and (bin_off is None): #}{
+      bin_off = p + 8
+    #}
+    p += 8 + clen
+  #}
+  if gltf is None: #{
+    raise MeshIOError('glTF file has no JSON chunk.')
+  #}
+  def accessor(i): #{
+    acc = gltf['accessors'][i]
+    bv = gltf['bufferViews'][acc['bufferView']]
+    if (bv.get('buffer', 0) != 0) or (bin_off is None) or \
+       ('uri' in gltf['buffers'][bv.get('buffer', 0)]): #{
+      raise MeshIOError('Only GLB embedded glTF buffers are supported.')
+    #}
+    dt = np.dtype(glb_types[acc['componentType']])
+    nc = glb_ncomp[acc['type']]
+    n = acc['count']
+    off = bin_off + bv.get('byteOffset', 0) + acc.get('byteOffset', 0)
+    stride = bv.get('byteStride', dt.itemsize * nc)
+    esz = dt.itemsize * nc
+    raw = np.frombuffer(buf, dtype=np.uint8, count=(n - 1) * stride + esz,
+                        offset=off)
+    raw = np.concatenate((raw, np.zeros(stride - esz, dtype=np.uint8)))
+    a = raw.reshape(n, stride)[:, 0:esz].copy().view(dt).reshape(n, nc)
+    if acc.get('normalized', False): #{
+      a = np.maximum(a / float(np.iinfo(dt).max), -1.0)
+    #}
+    return(a)
+  #}
+  def matrix(node): #{
+    if 'matrix' in node: #{
+      return(np.array(node['matrix'], dtype=np.float64).reshape(4, 4).T)
+    #}
+    x, y, z, w = node.get('rotation', [0.0, 0.0, 0.0, 1.0])
+    r = np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - z * w),
+                   2 * (x * z + y * w)],
+                  [2 * (x * y + z * w), 1 - 2 * (x * x + z * z),
+                   2 * (y * z - x * w)],
+                  [2 * (x * z - y * w), 2 * (y * z + x * w),
+                   1 - 2 * (x * x + y * y)]])
+    m = np.identity(4)
+    m[0:3, 0:3] = r * np.array(node.get('scale', [1.0, 1.0, 1.0]))
+    m[0:3, 3] = node.get('translation', [0.0, 0.0, 0.0])
+    return(m)
+  #}
+  verts = []
+  faces = []
+  nv = [0]
+  def visit(i, parent): #{
+    node = gltf['nodes'][i]
+    m = parent.dot(matrix(node))
+    if 'mesh' in node: #{
+      for prim in gltf['meshes'][node['mesh']]['primitives']: #{
+        if prim.get('mode', 4) != 4: #{
+          continue
+        #}
+        v = accessor(prim['attributes']['POSITION'])[:, 0:3]
+        v = v.astype(np.float64).dot(m[0:3, 0:3].T) + m[0:3, 3]
+        if 'indices' in prim: #{
+          f = accessor(prim['indices']).reshape(-1, 3).astype(np.int64)
+        else: #}{
+          f = np.arange(v.shape[0]).reshape(-1, 3)
+        #}
+        verts.append(v)
+        faces.append(f + nv[0])
+        nv[0] += v.shape[0]
+      #}
+    #}
+    for c in node.get('children', []): #{
+      visit(c, m)
+    #}
+  #}
+  scene = gltf['scenes'][gltf.get('scene', 0)] if 'scenes' in gltf else \
+          {'nodes': range(0, len(gltf.get('nodes', [])))}
+  for i in scene['nodes']: #{
+    visit(i, np.identity(4))
+  #}
+  if len(verts) == 0: #{
+    return(np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int32))
+  #}
+  return(np.concatenate(verts), np.concatenate(faces).astype(np.int32))
+#}
+
+#
+# ITK-SnAP label description files
+#
+
+# Reads an ITK-SnAP label description file, in which each record is
+#   IDX R G B A VIS MSH "LABEL"
+# with the colour components in [0, 255] and the alpha in [0, 1].
+# Returns a dict, in the order of the file, which maps each label index
+# to a dict with its 'name', 'rgb' (a list of ints), 'alpha' and 'vis'
+# (visibility). Fields missing from the end of a record before the label
+# give white, opaque and visible. Raises ValueError for a bad record.
+def ReadITKSnapLabels(filename): #{
+  labels = {}
+  with open(filename) as f: #{
+    for rec in f: #{
+      rec = rec.strip()
+      if (len(rec) > 0) and (not rec.startswith('#')): #{
+        fld = rec.split('"')
+        val = fld[0].split()
+        if (len(fld) < 3) or (len(val) < 1): #{
+          raise ValueError('Bad label description record: ' + rec)
+        #}
+        val = val + ['255', '255', '255', '1', '1'][len(val) - 1:]
+        labels[int(val[0])] = {
+            'name':  fld[1],
+            'rgb':   [int(val[1]), int(val[2]), int(val[3])],
+            'alpha': float(val[4]),
+            'vis':   bool(int(val[5]))}
+      #}
+    #}
+  #}
+  return(labels)
+#}
+
+#
+# Format dispatch
+#
+mesh_readers = {'.stl': ReadSTL, '.vtk': ReadVTK, '.vtp': ReadVTP,
+                '.obj': ReadOBJ, '.off': ReadOFF, '.ply': ReadPLY,
+                '.glb': ReadGLB}
+mesh_writers = {'.stl': WriteSTL, '.vtk': WriteVTK, '.vtp': WriteVTP,
+                '.obj': WriteOBJ, '.off': WriteOFF, '.ply': WritePLY,
+                '.glb': WriteGLB}
+
+# Returns True if the named file's extension is of a known mesh format.
+def IsMeshFormat(filename): #{
+  return(os.path.splitext(filename)[1].lower() in mesh_readers)
+#}
+
+# Reads a surface from the named file, returning its vertices and
+# triangular faces.
+def ReadMesh(filename): #{
+  ext = os.path.splitext(filename)[1].lower()
+  if not ext in mesh_readers: #{
+    raise MeshIOError('Unknown surface file format ' + ext + '.')
+  #}
+  verts, faces = mesh_readers[ext](filename)
+  return(verts, np.ascontiguousarray(faces, dtype=np.int32))
+#}
+
+# Writes a surface to the named file, with the format given by the file
+# extension. Any keyword arguments are passed on to the writer.
+def WriteMesh(filename, verts, faces, **kwargs): #{
+  ext = os.path.splitext(filename)[1].lower()
+  if not ext in mesh_writers: #{
+    raise MeshIOError('Unknown surface file format ' + ext + '.')
+  #}
+  mesh_writers[ext](filename, np.asarray(verts), np.asarray(faces),
+                    **kwargs)
+#}
@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+##
+# \file         WlzMeshSmooth.py
+# \author       agent <agent@local>
+# \date         October 2026
+# \version      $Id$
+# \par
+# Address:
+#               MRC Human Genetics Unit,
+#               MRC Institute of Genetics and Molecular Medicine,
+#               University of Edinburgh,
+#               Western General Hospital,
+#               Edinburgh, EH4 2XU, UK.
+# \par
+# Copyright (C), [2026],
+# The University Court of the University of Edinburgh,
+# Old College, Edinburgh, UK.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be
+# useful but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public
+# License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+# \brief        Taubin smoothing of triangulated surfaces using a
+#               sparse Laplacian, without MeshLab.
+##
+
+from __future__ import print_function
+import numpy as np
+from scipy import sparse
+
+# Returns the (n, n) sparse matrix W of the given surface for which W v
+# is the weighted average of each vertex's neighbours, so that the
+# Laplacian is W - I. Weights are either 'uniform' or 'cotangent', the
+# latter computed for the given vertex positions with negative weights
+# (opposite obtuse angles) clamped to zero. As in MeshLab, vertices on
+# a boundary are averaged uniformly over themselves and their
+# neighbours on the boundary.
+def MeshLaplacian(verts, faces, weights = 'uniform'): #{
+  n = verts.shape[0]
+  i = faces[:, [0, 1, 2]].ravel()
+  j = faces[:, [1, 2, 0]].ravel()
+  if weights == 'cotangent': #{
+    # Cotangent of the angle opposite each edge.
+    k = faces[:, [2, 0, 1]].ravel()
+    a = verts[i] - verts[k]
+    b = verts[j] - verts[k]
+    crs = np.sqrt(np.sum(np.cross(a, b) ** 2, axis=1))
+    w = 0.5 * np.sum(a * b, axis=1) / np.where(crs > 0.0, crs, 1.0)
+    w = np.maximum(w, 0.0) + 1.0e-8
+  elif weights == 'uniform': #}{
+    w = np.ones(i.size)
+  else: #}{
+    raise ValueError('Unknown Laplacian weights ' + str(weights) + '.')
+  #}
+  ij = (np.concatenate((i, j)), np.concatenate((j, i)))
+  W = sparse.csr_matrix((np.concatenate((w, w)), ij), shape=(n, n))
+  # Number of faces sharing each edge, one for boundary edges.
+  U = sparse.csr_matrix((np.ones(2 * i.size), ij), shape=(n, n))
+  if weights == 'uniform': #{
+    W.data[:] = 1.0
+  #}
+  bnd = U.data == 1.0
+  if np.any(bnd): #{
+    U.data = bnd.astype(np.float64)
+    bv = np.asarray(U.sum(axis=1)).ravel() > 0.0
+    rows = np.repeat(bv, np.diff(W.indptr))
+    W.data[rows] = bnd[rows].astype(np.float64)
+    W.eliminate_zeros()
+    W = W + sparse.diags(bv.astype(np.float64))
+  #}
+  d = np.asarray(W.sum(axis=1)).ravel()
+  return(sparse.diags(1.0 / np.where(d > 0.0, d, 1.0)).dot(W).tocsr())
+#}
+
+# Applies steps of Taubin smoothing, each being a shrinking step with
+# factor lambda_ followed by an inflating step with factor mu, to the
+# vertices of the given surface and returns the smoothed vertices. The
+# defaults match those of MeshLab. The Laplacian is built once, or may
+# be given as W (see MeshLaplacian()) to reuse it.
+def TaubinSmooth(verts, faces, steps, lambda_ = 0.5, mu = -0.53,
+                 weights = 'uniform', W = None): #{
+  v = np.array(verts, dtype=np.float64)
+  if steps > 0: #{
+    if W is None: #{
+      W = MeshLaplacian(v, faces, weights)
+    #}
+    for s in range(0, steps): #{
+      v += lambda_ * (W.dot(v) - v)
+      v += mu * (W.dot(v) - v)
+    #}
+  #}
+  return(v)
+#}
@@ -0,0 +1,941 @@
+#!/usr/bin/python
+##
+# \file         WlzSection.py
+# \author       agent <agent@local>
+# \date         October 2026
+# \version      $Id$
+# \par
+# Address:
+#               MRC Human Genetics Unit,
+#               MRC Institute of Genetics and Molecular Medicine,
+#               University of Edinburgh,
+#               Western General Hospital,
+#               Edinburgh, EH4 2XU, UK.
+# \par
+# Copyright (C), [2026],
+# The University Court of the University of Edinburgh,
+# Old College, Edinburgh, UK.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be
+# useful but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public
+# License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+# \brief        Sectioning of 3D Woolz objects to numpy arrays, used by
+#               WlzView. This module does not use Qt.
+##
+
+from __future__ import print_function
+import threading
+import collections
+import ctypes as c
+import numpy as np
+import math as m
+import Wlz as w
+from concurrent.futures import ThreadPoolExecutor
+
+class WlzError(Exception): #{
+  pass
+#}
+
+# Returns the ctypes type corresponding to the given Woolz grey type or
+# None if the grey type is not supported.
+def GreyCType(gtype): #{
+  vtype = None
+  if gtype == w.WLZ_GREY_INT: #{
+    vtype = c.c_int
+  elif gtype == w.WLZ_GREY_SHORT: #}{
+    vtype = c.c_short
+  elif gtype == w.WLZ_GREY_UBYTE: #}{
+    vtype = c.c_ubyte
+  elif gtype == w.WLZ_GREY_FLOAT: #}{
+    vtype = c.c_float
+  elif gtype == w.WLZ_GREY_DOUBLE: #}{
+    vtype = c.c_double
+  #}
+  return(vtype)
+#}
+
+# Returns the value of a WlzPixelV as a python number.
+def GreyValue(pix, gtype): #{
+  gv = pix.v
+  if gtype == w.WLZ_GREY_UBYTE: #{
+    v = gv.ubv
+  elif gtype == w.WLZ_GREY_SHORT: #}{
+    v = gv.shv
+  elif gtype == w.WLZ_GREY_INT: #}{
+    v = gv.inv
+  elif gtype == w.WLZ_GREY_FLOAT: #}{
+    v = gv.flv
+  else: #}{
+    v = gv.dbv
+  #}
+  return(v)
+#}
+
+# Converts the rectangular region of the given 2D Woolz object with the
+# given origin and size to a numpy array indexed [y, x].
+def RegionToNP(obj, org, sz, gtype): #{
+  ary = None
+  vtype = GreyCType(gtype)
+  if vtype is None: #{
+    errnum = c.c_int(w.WLZ_ERR_GREY_TYPE)
+  else: #}{
+    UPP = c.POINTER(c.POINTER(vtype))
+    UPV = c.POINTER(c.c_void_p)
+    aryc = c.cast(0,UPV)
+    errnum = w.WlzToArray2D(c.byref(aryc), obj, sz, org, 0, c.c_int(gtype))
+    if not bool(errnum): #{
+      ary = np.ctypeslib.as_array(c.cast(aryc, UPP).contents,
+                                  (sz.vtY, sz.vtX)).copy()
+      w.Alc2Free(aryc)
+    #}
+  #}
+  return(ary, errnum)
+#}
+
+# Converts the whole of the given 2D Woolz object to a numpy array
+# indexed [y, x]. Returns the array, the origin [x, y] of the array,
+# the grey type and a Woolz error code.
+def Obj2DToNP(obj): #{
+  ary = None
+  org = [0, 0]
+  gtype = w.WLZ_GREY_ERROR
+  errnum = c.c_int(w.WLZ_ERR_NONE)
+  box = w.WlzBoundingBox3I(obj, c.byref(errnum))
+  if not bool(errnum): #{
+    gtype = w.WlzGreyTypeFromObj(obj, c.byref(errnum))
+  #}
+  if not bool(errnum): #{
+    o = w.WlzIVertex2()
+    o.vtX = box.xMin
+    o.vtY = box.yMin
+    sz = w.WlzIVertex2()
+    sz.vtX = box.xMax - box.xMin + 1
+    sz.vtY = box.yMax - box.yMin + 1
+    org = [box.xMin, box.yMin]
+    ary, errnum = RegionToNP(obj, o, sz, gtype)
+  #}
+  return(ary, org, gtype, errnum)
+#}
+
+# Makes a new 3D view structure for the given angles (in degrees) and
+# distance, using up-is-up mode and a fixed point at the origin.
+def MakeViewStruct(pitch, yaw, roll, dist): #{
+  errnum = c.c_int(w.WLZ_ERR_NONE)
+  view = w.WlzMake3DViewStruct(c.c_int(w.WLZ_3D_VIEW_STRUCT),
+                               c.byref(errnum))
+  if not bool(errnum): #{
+    f = w.WlzDVertex3()
+    f.vtX = c.c_double(0.0)
+    f.vtY = c.c_double(0.0)
+    f.vtZ = c.c_double(0.0)
+    view.contents.theta = yaw   * m.pi / 180.0
+    view.contents.phi   = pitch * m.pi / 180.0
+    view.contents.zeta  = roll  * m.pi / 180.0
+    view.contents.dist  = dist
+    view.contents.fixed = f
+    view.contents.view_mode = c.c_int(w.WLZ_UP_IS_UP_MODE)
+    view.contents.scale = c.c_double(1.0)
+    view.contents.voxelRescaleFlg = c.c_int(0)
+    view = w.WlzAssign3DViewStruct(view, None)
+  #}
+  return(view, errnum)
+#}
+
+# Cuts a section from the given 3D object using the given angles (in
+# degrees) and distance. Each call uses its own view structure so that
+# sections may be cut concurrently from the same object. Returns the
+# section as for Obj2DToNP().
+def CutSection(obj, pitch, yaw, roll, dist,
+               interp = w.WLZ_INTERPOLATION_NEAREST): #{
+  ary = None
+  org = [0, 0]
+  gtype = w.WLZ_GREY_ERROR
+  view, errnum = MakeViewStruct(pitch, yaw, roll, dist)
+  if not bool(errnum): #{
+    w.WlzInit3DViewStruct(view, obj)
+    o2d = w.WlzGetSubSectionFromObject(obj, None, view, c.c_int(interp),
+                                       None, c.byref(errnum))
+    if not bool(errnum): #{
+      o2d = w.WlzAssignObject(o2d, None)
+      ary, org, gtype, errnum = Obj2DToNP(o2d)
+      w.WlzFreeObj(o2d)
+    #}
+    w.WlzFree3DViewStruct(view)
+  #}
+  return(ary, org, gtype, errnum)
+#}
+
+# Returns the section plane geometry of an initialised view structure
+# as a tuple (rot, fixed, dist) in which rot is the 3x3 rotation matrix
+# (numpy array) and fixed the fixed point. A point p = [x, y, z] of the
+# object is at section coordinates rot . (p - fixed), with the third
+# coordinate being the distance along the view normal.
+def ViewPlaneGeometry(view): #{
+  v = view.contents
+  rot = np.array([[v.rotation[i][j] for j in range(0, 3)]
+                  for i in range(0, 3)], dtype=np.float64)
+  fixed = np.array([v.fixed.vtX, v.fixed.vtY, v.fixed.vtZ],
+                   dtype=np.float64)
+  return(rot, fixed, float(v.dist))
+#}
+
+# Returns the object coordinates of the points with section coordinates
+# uvd, an (n, 3) array of u, v and distance, for the given plane geometry.
+def SectionToObjPoints(geom, uvd): #{
+  rot, fixed, dist = geom
+  return(np.dot(np.asarray(uvd, dtype=np.float64), rot) + fixed)
+#}
+
+# Computes the section plane geometry for the given object and angles.
+def PlaneGeometry(obj, pitch, yaw, roll, dist): #{
+  geom = None
+  view, errnum = MakeViewStruct(pitch, yaw, roll, dist)
+  if not bool(errnum): #{
+    w.WlzInit3DViewStruct(view, obj)
+    geom = ViewPlaneGeometry(view)
+    w.WlzFree3DViewStruct(view)
+  #}
+  return(geom, errnum)
+#}
+
+# A thread safe cache of sections (as returned by CutSection()) keyed
+# by view parameters, from which the least recently used sections are
+# discarded when the total size of the cached arrays exceeds max_bytes.
+class SectionCache(object): #{
+
+  def __init__(self, max_bytes = 256 * 1024 * 1024): #{
+    self.max_bytes = max_bytes
+    self.n_bytes = 0
+    self.lock = threading.Lock()
+    self.secs = collections.OrderedDict()
+  #}
+
+  @staticmethod
+  def key(pitch, yaw, roll, dist, interp): #{
+    return((round(pitch, 6), round(yaw, 6), round(roll, 6), round(dist, 6),
+            int(interp)))
+  #}
+
+  def get(self, key): #{
+    sec = None
+    with self.lock: #{
+      if key in self.secs: #{
+        sec = self.secs.pop(key)
+        self.secs[key] = sec
+      #}
+    #}
+    return(sec)
+  #}
+
+  def put(self, key, sec): #{
+    n = sec[0].nbytes
+    with self.lock: #{
+      if key in self.secs: #{
+        self.n_bytes -= self.secs.pop(key)[0].nbytes
+      #}
+      self.secs[key] = sec
+      self.n_bytes += n
+      while (self.n_bytes > self.max_bytes) and (len(self.secs) > 1): #{
+        k, s = self.secs.popitem(last=False)
+        self.n_bytes -= s[0].nbytes
+      #}
+    #}
+  #}
+
+  def clear(self): #{
+    with self.lock: #{
+      self.secs.clear()
+      self.n_bytes = 0
+    #}
+  #}
+#}
+
+# Cuts sections from a 3D object using a pool of threads and a shared
+# section cache. WlzGetSubSectionFromObject() is native code which is
+# called without holding the python GIL, so sections cut concurrently
+# really are computed in parallel.
+class SectionCutter(object): #{
+
+  def __init__(self, obj, n_threads = 3, cache = None): #{
+    self.obj = w.WlzAssignObject(obj, None)
+    self.n_threads = n_threads
+    if cache is None: #{
+      cache = SectionCache()
+    #}
+    self.cache = cache
+    self.pool = ThreadPoolExecutor(max_workers = n_threads)
+  #}
+
+  def free(self): #{
+    self.pool.shutdown(wait = True)
+    self.cache.clear()
+    w.WlzFreeObj(self.obj)
+    self.obj = None
+  #}
+
+  def cut(self, pitch, yaw, roll, dist,
+          interp = w.WLZ_INTERPOLATION_NEAREST): #{
+    return(self.cutMany([(pitch, yaw, roll, dist)], interp)[0])
+  #}
+
+  def cutMany(self, views, interp = w.WLZ_INTERPOLATION_NEAREST): #{
+    # Cuts sections for a list of (pitch, yaw, roll, dist) tuples in a
+    # single round of parallel work, returning a list of (ary, org, gtype,
+    # errnum) tuples in the same order. Cached sections are not recut.
+    secs = [None] * len(views)
+    futs = {}
+    for i, v in enumerate(views): #{
+      k = SectionCache.key(v[0], v[1], v[2], v[3], interp)
+      secs[i] = self.cache.get(k)
+      if secs[i] is None: #{
+        futs[i] = (k, self.pool.submit(CutSection, self.obj,
+                                       v[0], v[1], v[2], v[3], interp))
+      #}
+    #}
+    for i in futs: #{
+      k, f = futs[i]
+      secs[i] = f.result()
+      if not bool(secs[i][3]): #{
+        self.cache.put(k, secs[i])
+      #}
+    #}
+    return(secs)
+  #}
+
+  def project(self, pitch, yaw, roll, dist, thickness, mode = 'mip',
+              interp = w.WLZ_INTERPOLATION_NEAREST): #{
+    # Returns a projection, as for VolumeSectioner.project(), through the
+    # slab of the given thickness centred on the section at dist, for
+    # objects too large for a dense volume. The slab's sections are cut
+    # by Woolz, a chunk of one per thread at a time, and accumulated so
+    # at most a chunk of sections is held in memory. The sections are
+    # not cached. Pixels outside of a section's bounding box are ignored.
+    n = max(1, int(round(thickness)))
+    dst = dist + np.arange(0, n, dtype=np.float64) - 0.5 * (n - 1)
+    if mode == 'mean': #{
+      fill = 0.0
+    elif mode == 'minip': #}{
+      fill = np.inf
+    else: #}{
+      fill = -np.inf
+    #}
+    errnum = c.c_int(w.WLZ_ERR_NONE)
+    bgd = w.WlzGetBackground(self.obj, c.byref(errnum))
+    if not bool(errnum): #{
+      box = w.WlzBoundingBox3I(self.obj, c.byref(errnum))
+    #}
+    if not bool(errnum): #{
+      geom, errnum = PlaneGeometry(self.obj, pitch, yaw, roll, 0.0)
+    #}
+    if bool(errnum): #{
+      return(None, [0, 0], w.WLZ_GREY_ERROR, errnum)
+    #}
+    # Only cut the planes which intersect the object's bounding box.
+    d0, d1 = DistRange(geom, [box.xMin, box.yMin, box.zMin],
+                       [box.zMax - box.zMin + 1, box.yMax - box.yMin + 1,
+                        box.xMax - box.xMin + 1])
+    dst = dst[(dst >= d0 - 0.5) & (dst <= d1 + 0.5)]
+    n = len(dst)
+    if n == 0: #{
+      # As for a single section beyond the object.
+      dst = np.array([dist], dtype=np.float64)
+      n = 1
+    #}
+    acc = None
+    cnt = None
+    org = None
+    dtype = None
+    gtype = w.WLZ_GREY_ERROR
+    for k0 in range(0, n, self.n_threads): #{
+      futs = [self.pool.submit(CutSection, self.obj, pitch, yaw, roll, d,
+                               interp)
+              for d in dst[k0:k0 + self.n_threads]]
+      for f in futs: #{
+        ary, o, gtype, errnum = f.result()
+        if bool(errnum): #{
+          return(None, [0, 0], gtype, errnum)
+        #}
+        dtype = ary.dtype
+        if acc is None: #{
+          org = list(o)
+          acc = np.full(ary.shape, fill, dtype=np.float64)
+          cnt = np.zeros(ary.shape, dtype=np.int32)
+        #}
+        # Grow the accumulated box to include the section's box.
+        lo = [min(org[0], o[0]), min(org[1], o[1])]
+        hi = [max(org[0] + acc.shape[1], o[0] + ary.shape[1]),
+              max(org[1] + acc.shape[0], o[1] + ary.shape[0])]
+        if (lo != org) or (hi[0] - lo[0] != acc.shape[1]) or \
+           (hi[1] - lo[1] != acc.shape[0]): #{
+          a = np.full((hi[1] - lo[1], hi[0] - lo[0]), fill, dtype=np.float64)
+          b = np.zeros(a.shape, dtype=np.int32)
+          y0, x0 = org[1] - lo[1], org[0] - lo[0]
+          a[y0:y0 + acc.shape[0], x0:x0 + acc.shape[1]] = acc
+          b[y0:y0 + acc.shape[0], x0:x0 + acc.shape[1]] = cnt
+          acc, cnt, org = a, b, lo
+        #}
+        y0, x0 = o[1] - org[1], o[0] - org[0]
+        sa = acc[y0:y0 + ary.shape[0], x0:x0 + ary.shape[1]]
+        if mode == 'mean': #{
+          sa += ary
+        elif mode == 'minip': #}{
+          np.minimum(sa, ary, out=sa)
+        else: #}{
+          np.maximum(sa, ary, out=sa)
+        #}
+        cnt[y0:y0 + ary.shape[0], x0:x0 + ary.shape[1]] += 1
+      #}
+    #}
+    nz = cnt > 0
+    if mode == 'mean': #{
+      acc[nz] /= cnt[nz]
+    #}
+    acc[~nz] = GreyValue(bgd, gtype)
+    if (mode == 'mean') or (not interp == w.WLZ_INTERPOLATION_NEAREST): #{
+      rtype = np.float32
+    else: #}{
+      rtype = dtype
+    #}
+    return(acc.astype(rtype), org, gtype, c.c_int(w.WLZ_ERR_NONE))
+  #}
+#}
+
+# Converts the cuboid region of the given 3D Woolz object with the given
+# origin [x, y, z] and size [x, y, z] to a numpy array indexed [z, y, x].
+# Positions outside of the object are given the background value.
+def RegionToNP3D(obj, org, sz, gtype): #{
+  vol = None
+  vtype = GreyCType(gtype)
+  if vtype is None: #{
+    errnum = c.c_int(w.WLZ_ERR_GREY_TYPE)
+  else: #}{
+    o = w.WlzIVertex3()
+    o.vtX = int(org[0])
+    o.vtY = int(org[1])
+    o.vtZ = int(org[2])
+    s = w.WlzIVertex3()
+    s.vtX = int(sz[0])
+    s.vtY = int(sz[1])
+    s.vtZ = int(sz[2])
+    UPPP = c.POINTER(c.POINTER(c.POINTER(vtype)))
+    UPV = c.POINTER(c.POINTER(c.c_void_p))
+    aryc = c.cast(0, UPV)
+    errnum = w.WlzToArray3D(c.byref(aryc), obj, s, o, 0, c.c_int(gtype))
+    if not bool(errnum): #{
+      vol = np.ctypeslib.as_array(c.cast(aryc, UPPP).contents.contents,
+                                  (s.vtZ, s.vtY, s.vtX)).copy()
+      w.Alc3Free(aryc)
+    #}
+  #}
+  return(vol, errnum)
+#}
+
+# Converts the whole of the given 3D Woolz object to a dense numpy
+# volume indexed [z, y, x]. Returns the volume, its origin [x, y, z],
+# the grey type and a Woolz error code.
+def Obj3DToNP(obj): #{
+  vol = None
+  org = [0, 0, 0]
+  gtype = w.WLZ_GREY_ERROR
+  errnum = c.c_int(w.WLZ_ERR_NONE)
+  box = w.WlzBoundingBox3I(obj, c.byref(errnum))
+  if not bool(errnum): #{
+    gtype = w.WlzGreyTypeFromObj(obj, c.byref(errnum))
+  #}
+  if not bool(errnum): #{
+    org = [box.xMin, box.yMin, box.zMin]
+    vol, errnum = RegionToNP3D(obj, org,
+                               [box.xMax - box.xMin + 1,
+                                box.yMax - box.yMin + 1,
+                                box.zMax - box.zMin + 1], gtype)
+  #}
+  return(vol, org, gtype, errnum)
+#}
+
+# Returns points spaced step apart along the 3D polyline with the given
+# vertices (an (n, 3) array of x, y, z) together with the distance of
+# each point along the polyline. The last vertex is always included.
+def PolylinePoints(verts, step = 1.0): #{
+  verts = np.asarray(verts, dtype=np.float64).reshape(-1, 3)
+  if verts.shape[0] < 2: #{
+    return(verts.copy(), np.zeros(verts.shape[0]))
+  #}
+  seg = np.diff(verts, axis=0)
+  sln = np.sqrt(np.sum(seg * seg, axis=1))
+  cum = np.concatenate(([0.0], np.cumsum(sln)))
+  s = np.append(np.arange(0.0, cum[-1], step), cum[-1])
+  k = np.clip(np.searchsorted(cum, s, side='right') - 1, 0, seg.shape[0] - 1)
+  t = (s - cum[k]) / np.where(sln[k] > 0.0, sln[k], 1.0)
+  return(verts[k] + t[:, np.newaxis] * seg[k], s)
+#}
+
+# Sets the elements of the 2D mask (indexed [y, x] with origin org
+# [x, y]) which are within the given interval domain, clipped to the
+# mask, to the given value.
+def IntervalDomainToMask(idom, org, mask, value = 1): #{
+  ny, nx = mask.shape
+  if bool(idom): #{
+    d = idom.contents
+    l0 = max(d.line1, org[1])
+    l1 = min(d.lastln, org[1] + ny - 1)
+    if d.type == w.WLZ_INTERVALDOMAIN_RECT: #{
+      k0 = max(d.kol1, org[0]) - org[0]
+      k1 = min(d.lastkl, org[0] + nx - 1) - org[0]
+      if (l1 >= l0) and (k1 >= k0): #{
+        mask[l0 - org[1]:l1 - org[1] + 1, k0:k1 + 1] = value
+      #}
+    else: #}{
+      for l in range(l0, l1 + 1): #{
+        il = d.intvlines[l - d.line1]
+        row = mask[l - org[1]]
+        for i in range(0, il.nintvs): #{
+          itv = il.intvs[i]
+          k0 = max(d.kol1 + itv.ileft - org[0], 0)
+          k1 = min(d.kol1 + itv.iright - org[0], nx - 1)
+          if k1 >= k0: #{
+            row[k0:k1 + 1] = value
+          #}
+        #}
+      #}
+    #}
+  #}
+#}
+
+# Sets the elements of vol, indexed [z, y, x] with origin org [x, y, z],
+# which are within the domain of the given 2D or 3D object to the given
+# value. 2D objects are treated as a single plane at z = 0. The domain
+# is painted directly from its intervals a plane at a time, so vol may
+# be any sequence of 2D arrays (such as views of the planes of a Woolz
+# object's values).
+def PaintDomainNP(obj, org, vol, value = 1): #{
+  o = obj.contents
+  if o.type == w.WLZ_2D_DOMAINOBJ: #{
+    if (org[2] <= 0) and (org[2] + len(vol) > 0): #{
+      IntervalDomainToMask(o.domain.i, org, vol[-org[2]], value)
+    #}
+  elif o.type == w.WLZ_3D_DOMAINOBJ: #}{
+    pd = o.domain.p.contents
+    for p in range(max(pd.plane1, org[2]),
+                   min(pd.lastpl, org[2] + len(vol) - 1) + 1): #{
+      IntervalDomainToMask(pd.domains[p - pd.plane1].i, org,
+                           vol[p - org[2]], value)
+    #}
+  #}
+#}
+
+# Returns a uint8 mask, indexed [z, y, x] with origin org [x, y, z] and
+# shape shp [z, y, x], which is set within the domain of the given 2D or
+# 3D object, see PaintDomainNP().
+def DomainMaskToNP(obj, org, shp): #{
+  mask = np.zeros(shp, dtype=np.uint8)
+  PaintDomainNP(obj, org, mask)
+  return(mask)
+#}
+
+# Samples the grey values of a 2D or 3D Woolz object at arbitrary
+# points, many at a time, with values outside of the object's domain
+# set to its background value. If the object fits within max_bytes it
+# is held as a single dense volume, otherwise cubic blocks of it are
+# converted to dense arrays as they are needed and the most recently
+# used of these are kept. Sampling is thread safe.
+class PointSampler(object): #{
+
+  def __init__(self, obj, max_bytes = 256 * 1024 * 1024, block = 64): #{
+    self.obj = None
+    self.vol = None
+    self.mask = None
+    self.block = block
+    self.blocks = collections.OrderedDict()
+    self.lock = threading.Lock()
+    self.errnum = c.c_int(w.WLZ_ERR_NONE)
+    self.is3D = obj.contents.type == w.WLZ_3D_DOMAINOBJ
+    self.gtype = w.WlzGreyTypeFromObj(obj, c.byref(self.errnum))
+    if not bool(self.errnum): #{
+      box = w.WlzBoundingBox3I(obj, c.byref(self.errnum))
+    #}
+    if not bool(self.errnum): #{
+      bgd = w.WlzGetBackground(obj, c.byref(self.errnum))
+    #}
+    if not bool(self.errnum): #{
+      if GreyCType(self.gtype) is None: #{
+        self.errnum = c.c_int(w.WLZ_ERR_GREY_TYPE)
+      #}
+    #}
+    if not bool(self.errnum): #{
+      self.obj = w.WlzAssignObject(obj, None)
+      self.dtype = np.dtype(GreyCType(self.gtype))
+      self.bkg = self.dtype.type(GreyValue(bgd, self.gtype))
+      self.org = np.array([box.xMin, box.yMin, box.zMin])
+      self.shape = np.array([box.xMax - box.xMin + 1, box.yMax - box.yMin + 1,
+                             box.zMax - box.zMin + 1])
+      blk_bytes = (self.dtype.itemsize + 1) * (block + 1) ** (3 if self.is3D
+                                                              else 2)
+      self.max_blocks = max(max_bytes // blk_bytes, 1)
+      if (self.dtype.itemsize + 1) * int(np.prod(self.shape)) <= max_bytes: #{
+        self.vol, self.mask, self.errnum = self.region(self.org, self.shape)
+      #}
+    #}
+  #}
+
+  def free(self): #{
+    if bool(self.obj): #{
+      w.WlzFreeObj(self.obj)
+    #}
+    self.obj = None
+    self.vol = None
+    self.mask = None
+    self.blocks.clear()
+  #}
+
+  def region(self, org, sz): #{
+    # Returns the dense values and domain mask, indexed [z, y, x], of
+    # the region with origin org and size sz (both [x, y, z]).
+    if self.is3D: #{
+      vol, errnum = RegionToNP3D(self.obj, org, sz, self.gtype)
+    else: #}{
+      o = w.WlzIVertex2()
+      o.vtX = int(org[0])
+      o.vtY = int(org[1])
+      s = w.WlzIVertex2()
+      s.vtX = int(sz[0])
+      s.vtY = int(sz[1])
+      vol, errnum = RegionToNP(self.obj, o, s, self.gtype)
+      if vol is not None: #{
+        vol = vol[np.newaxis]
+      #}
+    #}
+    mask = None
+    if not bool(errnum): #{
+      mask = DomainMaskToNP(self.obj, org, vol.shape)
+    #}
+    return(vol, mask, errnum)
+  #}
+
+  def sampleDense(self, vol, mask, org, pts, interp): #{
+    val, ok = SampleVolumeMask(vol, org, pts, interp)
+    # Points are within the domain if their nearest voxel is.
+    i = np.clip(np.rint(pts - org).astype(np.intp), 0,
+                np.array(vol.shape[::-1]) - 1)
+    ok &= mask[i[:, 2], i[:, 1], i[:, 0]] > 0
+    val[~ok] = self.bkg
+    return(val)
+  #}
+
+  def getBlock(self, key): #{
+    with self.lock: #{
+      blk = self.blocks.get(key)
+      if blk is not None: #{
+        self.blocks.move_to_end(key)
+        return(blk, c.c_int(w.WLZ_ERR_NONE))
+      #}
+    #}
+    # Blocks overlap by one voxel so linear interpolation never needs
+    # a neighbouring block.
+    org = self.org + np.array(key) * self.block
+    sz = [self.block + 1, self.block + 1, self.block + 1 if self.is3D else 1]
+    vol, mask, errnum = self.region(org, sz)
+    blk = (vol, mask, org)
+    if not bool(errnum): #{
+      with self.lock: #{
+        self.blocks[key] = blk
+        while len(self.blocks) > self.max_blocks: #{
+          self.blocks.popitem(last = False)
+        #}
+      #}
+    #}
+    return(blk, errnum)
+  #}
+
+  def sample(self, pts, interp = w.WLZ_INTERPOLATION_NEAREST): #{
+    # Returns the values at the points pts, an (n, 3) array of x, y, z
+    # (or (n, 2) of x, y for 2D objects), and a Woolz error code.
+    # Values are of the object's type for nearest neighbour and
+    # float32 for linear interpolation.
+    pts = np.asarray(pts, dtype=np.float64)
+    pts = pts.reshape(-1, pts.shape[-1])
+    if (pts.shape[1] < 3) or (not self.is3D): #{
+      pts = np.concatenate((pts[:, 0:2], np.zeros((pts.shape[0], 1))), axis=1)
+    #}
+    errnum = c.c_int(w.WLZ_ERR_NONE)
+    if self.vol is not None: #{
+      return(self.sampleDense(self.vol, self.mask, self.org, pts, interp),
+             errnum)
+    #}
+    vtype = self.dtype if interp == w.WLZ_INTERPOLATION_NEAREST \
+            else np.dtype(np.float32)
+    val = np.full(pts.shape[0], self.bkg, dtype=vtype)
+    # Find the block of each point, matching the bounds of the dense
+    # volume sampling.
+    q = pts - self.org
+    if interp == w.WLZ_INTERPOLATION_NEAREST: #{
+      q = np.rint(q)
+      inside = np.all((q >= 0) & (q < self.shape), axis=1)
+    else: #}{
+      inside = np.all((q >= 0) & (q <= self.shape - 1), axis=1)
+      q = np.floor(q)
+    #}
+    q = q.astype(np.intp)
+    idx = np.flatnonzero(inside)
+    keys = q[idx] // self.block
+    # Sample the points of each block together.
+    keys, inv = np.unique(keys, axis=0, return_inverse=True)
+    inv = inv.ravel()
+    order = np.argsort(inv, kind='stable')
+    bnd = np.searchsorted(inv[order], np.arange(0, keys.shape[0] + 1))
+    for k in range(0, keys.shape[0]): #{
+      sel = idx[order[bnd[k]:bnd[k + 1]]]
+      (vol, mask, org), errnum = self.getBlock(tuple(int(x) for x in keys[k]))
+      if bool(errnum): #{
+        break
+      #}
+      val[sel] = self.sampleDense(vol, mask, org, pts[sel], interp)
+    #}
+    return(val, errnum)
+  #}
+#}
+
+# Returns the corners of the box with the given origin [x, y, z] and
+# shape [z, y, x] in section coordinates as an 8x3 array.
+def BoxCornersInSection(geom, org, shape): #{
+  rot, fixed, dist = geom
+  hi = [org[0] + shape[2] - 1, org[1] + shape[1] - 1, org[2] + shape[0] - 1]
+  crn = np.array([[x, y, z] for z in (org[2], hi[2])
+                            for y in (org[1], hi[1])
+                            for x in (org[0], hi[0])], dtype=np.float64)
+  return(np.dot(crn - fixed, rot.T))
+#}
+
+# Returns the range of distances along the view normal covered by the
+# box with the given origin and shape.
+def DistRange(geom, org, shape): #{
+  crn = BoxCornersInSection(geom, org, shape)
+  return(float(np.min(crn[:, 2])), float(np.max(crn[:, 2])))
+#}
+
+# Samples the dense volume with origin org [x, y, z] at the points pts,
+# an array of shape (..., 3) with the last axis being x, y, z. Returns
+# the sampled values and a mask which is True where the points are
+# within the volume, values elsewhere are undefined. Nearest neighbour
+# interpolation preserves the volume's type, linear interpolation
+# (trilinear) gives float32 values.
+def SampleVolumeMask(vol, org, pts, interp = w.WLZ_INTERPOLATION_NEAREST): #{
+  shp = np.array(vol.shape[::-1])
+  q = pts - np.asarray(org, dtype=np.float64)
+  if interp == w.WLZ_INTERPOLATION_NEAREST: #{
+    i = np.rint(q).astype(np.intp)
+    ok = np.all((i >= 0) & (i < shp), axis=-1)
+    np.clip(i, 0, shp - 1, out=i)
+    val = vol[i[..., 2], i[..., 1], i[..., 0]]
+  else: #}{
+    i0 = np.floor(q)
+    f = (q - i0).astype(np.float32)
+    i0 = i0.astype(np.intp)
+    ok = np.all((i0 >= 0) & (i0 < shp), axis=-1) & \
+         np.all(q <= shp - 1, axis=-1)
+    i1 = np.minimum(i0 + 1, shp - 1)
+    np.clip(i0, 0, shp - 1, out=i0)
+    fx = f[..., 0]
+    fy = f[..., 1]
+    fz = f[..., 2]
+    x0, y0, z0 = i0[..., 0], i0[..., 1], i0[..., 2]
+    x1, y1, z1 = i1[..., 0], i1[..., 1], i1[..., 2]
+    v00 = vol[z0, y0, x0] * (1.0 - fx) + vol[z0, y0, x1] * fx
+    v01 = vol[z0, y1, x0] * (1.0 - fx) + vol[z0, y1, x1] * fx
+    v10 = vol[z1, y0, x0] * (1.0 - fx) + vol[z1, y0, x1] * fx
+    v11 = vol[z1, y1, x0] * (1.0 - fx) + vol[z1, y1, x1] * fx
+    v0 = v00 * (1.0 - fy) + v01 * fy
+    v1 = v10 * (1.0 - fy) + v11 * fy
+    val = (v0 * (1.0 - fz) + v1 * fz).astype(np.float32)
+  #}
+  return(val, ok)
+#}
+
+# As SampleVolumeMask() but with points outside the volume given the
+# value bkg.
+def SampleVolume(vol, org, pts, interp = w.WLZ_INTERPOLATION_NEAREST,
+                 bkg = 0): #{
+  val, ok = SampleVolumeMask(vol, org, pts, interp)
+  val[~ok] = bkg
+  return(val)
+#}
+
+# Returns the points (shape (nv, nu, 3)) of the rows v0 + [r0, r1) of a
+# section plane with columns u0 + [0, nu) at distance d. If d is an
+# array of distances the points of each plane are returned, with shape
+# (nd, nv, nu, 3).
+def PlanePoints(geom, u0, nu, v0, r0, r1, d): #{
+  rot, fixed, dist = geom
+  u = np.arange(u0, u0 + nu, dtype=np.float64)
+  v = np.arange(v0 + r0, v0 + r1, dtype=np.float64)
+  pts = (u[np.newaxis, :, np.newaxis] * rot[0]) + \
+        (v[:, np.newaxis, np.newaxis] * rot[1]) + fixed
+  if np.ndim(d) > 0: #{
+    d = np.asarray(d, dtype=np.float64)
+    pts = pts[np.newaxis] + d[:, np.newaxis, np.newaxis, np.newaxis] * rot[2]
+  else: #}{
+    pts = pts + rot[2] * d
+  #}
+  return(pts)
+#}
+
+# Reslices a dense volume (as from Obj3DToNP()) along arbitrary planes,
+# as an alternative to cutting sections with WlzGetSubSectionFromObject()
+# for objects which fit in memory. The plane geometry is taken from a
+# Woolz view structure initialised for the object, so sections match
+# those cut by Woolz, but the sampling is done with vectorised numpy
+# code in chunks of rows spread over a pool of threads.
+class VolumeSectioner(object): #{
+
+  def __init__(self, obj, n_threads = 4, chunk_rows = 64, chunk_depth = 8,
+               min_pool_voxels = 1 << 22): #{
+    self.obj = w.WlzAssignObject(obj, None)
+    self.chunk_rows = chunk_rows
+    self.chunk_depth = chunk_depth
+    self.min_pool_voxels = min_pool_voxels
+    self.geoms = {}
+    self.pool = ThreadPoolExecutor(max_workers = n_threads)
+    self.vol, self.org, self.gtype, self.errnum = Obj3DToNP(obj)
+    self.bkg = 0
+    if not bool(self.errnum): #{
+      bgd = w.WlzGetBackground(obj, c.byref(self.errnum))
+      self.bkg = self.vol.dtype.type(GreyValue(bgd, self.gtype))
+    #}
+  #}
+
+  def free(self): #{
+    self.pool.shutdown(wait = True)
+    w.WlzFreeObj(self.obj)
+    self.obj = None
+    self.vol = None
+  #}
+
+  def geometry(self, pitch, yaw, roll, dist): #{
+    # The rotation only depends on the angles so it is computed once
+    # for each set of angles using Woolz.
+    k = (pitch, yaw, roll)
+    if not k in self.geoms: #{
+      geom, errnum = PlaneGeometry(self.obj, pitch, yaw, roll, 0.0)
+      if bool(errnum): #{
+        raise WlzError()
+      #}
+      self.geoms[k] = geom
+    #}
+    rot, fixed, d = self.geoms[k]
+    return((rot, fixed, float(dist)))
+  #}
+
+  def planeExtent(self, geom): #{
+    crn = BoxCornersInSection(geom, self.org, self.vol.shape)
+    u0 = int(m.floor(np.min(crn[:, 0])))
+    v0 = int(m.floor(np.min(crn[:, 1])))
+    u1 = int(m.ceil(np.max(crn[:, 0])))
+    v1 = int(m.ceil(np.max(crn[:, 1])))
+    return(u0, v0, u1 - u0 + 1, v1 - v0 + 1)
+  #}
+
+  def distRange(self, pitch, yaw, roll): #{
+    return(DistRange(self.geometry(pitch, yaw, roll, 0.0),
+                     self.org, self.vol.shape))
+  #}
+
+  def forChunks(self, nv, fn, n_vox = None): #{
+    # Calls fn(r0, r1) for chunks of rows in the thread pool, or just
+    # once for all rows if fewer than min_pool_voxels are to be sampled.
+    if (n_vox is not None) and (n_vox < self.min_pool_voxels): #{
+      fn(0, nv)
+    else: #}{
+      futs = [self.pool.submit(fn, r0, min(r0 + self.chunk_rows, nv))
+              for r0 in range(0, nv, self.chunk_rows)]
+      for f in futs: #{
+        f.result()
+      #}
+    #}
+  #}
+
+  def cut(self, pitch, yaw, roll, dist,
+          interp = w.WLZ_INTERPOLATION_NEAREST): #{
+    # Returns a section as for CutSection().
+    try: #{
+      geom = self.geometry(pitch, yaw, roll, dist)
+    except WlzError: #}{
+      return(None, [0, 0], self.gtype, c.c_int(w.WLZ_ERR_PARAM_DATA))
+    #}
+    u0, v0, nu, nv = self.planeExtent(geom)
+    if interp == w.WLZ_INTERPOLATION_NEAREST: #{
+      ary = np.empty((nv, nu), dtype=self.vol.dtype)
+    else: #}{
+      ary = np.empty((nv, nu), dtype=np.float32)
+    #}
+    def fn(r0, r1): #{
+      pts = PlanePoints(geom, u0, nu, v0, r0, r1, geom[2])
+      ary[r0:r1, :] = SampleVolume(self.vol, self.org, pts, interp, self.bkg)
+    #}
+    self.forChunks(nv, fn)
+    return(ary, [u0, v0], self.gtype, c.c_int(w.WLZ_ERR_NONE))
+  #}
+
+  def project(self, pitch, yaw, roll, dist, thickness, mode = 'mip',
+              interp = w.WLZ_INTERPOLATION_NEAREST): #{
+    # Returns a projection, as for cut(), through the slab of the given
+    # thickness centred on the section at dist. The mode is one of
+    # 'mip' (maximum), 'minip' (minimum) or 'mean'. The slab is sampled
+    # in chunks of at most chunk_depth planes which are accumulated, so
+    # the whole slab is never held in memory. Samples outside of the
+    # volume are ignored.
+    try: #{
+      geom = self.geometry(pitch, yaw, roll, dist)
+    except WlzError: #}{
+      return(None, [0, 0], self.gtype, c.c_int(w.WLZ_ERR_PARAM_DATA))
+    #}
+    n = max(1, int(round(thickness)))
+    dst = dist + np.arange(0, n, dtype=np.float64) - 0.5 * (n - 1)
+    u0, v0, nu, nv = self.planeExtent(geom)
+    if (mode == 'mean') or (not interp == w.WLZ_INTERPOLATION_NEAREST): #{
+      rtype = np.float32
+    else: #}{
+      rtype = self.vol.dtype
+    #}
+    ary = np.empty((nv, nu), dtype=rtype)
+    def fn(r0, r1): #{
+      acc = None
+      cnt = np.zeros((r1 - r0, nu), dtype=np.int32)
+      for k0 in range(0, n, self.chunk_depth): #{
+        pts = PlanePoints(geom, u0, nu, v0, r0, r1,
+                          dst[k0:k0 + self.chunk_depth])
+        val, ok = SampleVolumeMask(self.vol, self.org, pts, interp)
+        pts = None
+        cnt += np.count_nonzero(ok, axis=0).astype(np.int32)
+        if mode == 'mean': #{
+          val = np.where(ok, val, 0).astype(np.float64).sum(axis=0)
+          acc = val if acc is None else acc + val
+        elif mode == 'minip': #}{
+          val = np.where(ok, val, np.inf).min(axis=0)
+          acc = val if acc is None else np.minimum(acc, val)
+        else: #}{
+          val = np.where(ok, val, -np.inf).max(axis=0)
+          acc = val if acc is None else np.maximum(acc, val)
+        #}
+      #}
+      nz = cnt > 0
+      if mode == 'mean': #{
+        acc[nz] /= cnt[nz]
+      #}
+      acc[~nz] = self.bkg
+      ary[r0:r1, :] = acc.astype(rtype)
+    #}
+    self.forChunks(nv, fn, n * nv * nu)
+    return(ary, [u0, v0], self.gtype, c.c_int(w.WLZ_ERR_NONE))
+  #}
+#}
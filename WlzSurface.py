@@ -0,0 +1,277 @@
+#!/usr/bin/python3
+##
+# \file         WlzSurface.py
+# \author       agent <agent@local>
+# \date         October 2026
+# \version      $Id$
+# \par
+# Address:
+#               MRC Human Genetics Unit,
+#               MRC Institute of Genetics and Molecular Medicine,
+#               University of Edinburgh,
+#               Western General Hospital,
+#               Edinburgh, EH4 2XU, UK.
+# \par
+# Copyright (C), [2026],
+# The University Court of the University of Edinburgh,
+# Old College, Edinburgh, UK.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be
+# useful but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public
+# License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+# \brief        Common surface processing for the Woolz surface scripts,
+#               using PyMeshLab for decimation and smoothing.
+##
+
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import resource
+import numpy as np
+import pymeshlab
+import WlzMeshIO as mio
+import WlzMeshSmooth as msm
+
+# Smoothers for SmoothMesh(), MeshLab's own or the WlzMeshSmooth Taubin
+# smoothing with the given Laplacian weights.
+smoothers = ['meshlab', 'uniform', 'cotangent']
+
+# Returns the target face counts used to simplify a surface with n_faces
+# faces to at most maxface faces, with the number of faces reduced by at
+# most a factor of step at each step, or in a single step if step is
+# zero.
+def DecimationSchedule(n_faces, maxface, step = 4): #{
+  sched = []
+  face_count = n_faces
+  while face_count > maxface: #{
+    if (step > 1) and (face_count > maxface * step): #{
+      face_count = face_count // step
+    else: #}{
+      face_count = maxface
+    #}
+    sched.append(face_count)
+  #}
+  return(sched)
+#}
+
+# Applies steps of Taubin smoothing to the current mesh of the given
+# MeshSet using the given smoother (one of smoothers). The native
+# smoothers replace the current mesh with the smoothed one.
+def SmoothMesh(ms, steps, smoother = 'meshlab'): #{
+  if steps > 0: #{
+    if smoother == 'meshlab': #{
+      ms.apply_coord_taubin_smoothing(lambda_=0.5, mu=-0.53,
+                                      stepsmoothnum=steps)
+    else: #}{
+      m = ms.current_mesh()
+      faces = m.face_matrix()
+      verts = msm.TaubinSmooth(m.vertex_matrix(), faces, steps,
+                               weights=smoother)
+      ms.delete_current_mesh()
+      ms.add_mesh(pymeshlab.Mesh(vertex_matrix=verts, face_matrix=faces))
+    #}
+  #}
+#}
+
+# Simplifies the current mesh of the given MeshSet to each of the given
+# levels of detail (maximum numbers of faces) in turn, from the finest
+# to the coarsest, each level being derived from the previous one.
+# Close vertices are first merged, then the faces are reduced following
+# DecimationSchedule() for the given step with quadric edge collapse
+# decimation, each step being followed by Taubin smoothing, taubin_first
+# steps the first time and taubin_next steps after that, see
+# SmoothMesh(). If no decimation is needed for the first level the
+# surface is just smoothed with taubin_first steps. If given,
+# level_fn(k, maxface, ms) is called after making level k.
+def SimplifyMeshLOD(ms, face_counts, level_fn = None, taubin_first = 10,
+                    taubin_next = 4, verbose = False,
+                    smoother = 'meshlab', step = 4): #{
+  ms.meshing_merge_close_vertices(threshold=pymeshlab.PureValue(0.1))
+  taubin_steps = taubin_first
+  for k, maxface in enumerate(sorted(face_counts, reverse=True)): #{
+    sched = DecimationSchedule(ms.current_mesh().face_number(), maxface,
+                               step)
+    if (k == 0) and (len(sched) == 0): #{
+      SmoothMesh(ms, taubin_steps, smoother)
+    #}
+    for face_count in sched: #{
+      if verbose: #{
+        print('Decimating to ' + str(face_count) + ' faces.')
+      #}
+      ms.meshing_decimation_quadric_edge_collapse(targetfacenum=face_count,
+          targetperc=0.0, qualitythr=0.3, preserveboundary=False,
+          boundaryweight=1.0, preservenormal=False, preservetopology=False,
+          optimalplacement=True, planarquadric=False, qualityweight=False,
+          autoclean=True, selected=False)
+      SmoothMesh(ms, taubin_steps, smoother)
+      taubin_steps = taubin_next
+    #}
+    if level_fn is not None: #{
+      level_fn(k, maxface, ms)
+    #}
+  #}
+#}
+
+# Simplifies the current mesh of the given MeshSet to at most maxface
+# faces, see SimplifyMeshLOD().
+def SimplifyMesh(ms, maxface, taubin_first = 10, taubin_next = 4,
+                 verbose = False, smoother = 'meshlab', step = 4): #{
+  SimplifyMeshLOD(ms, [maxface], None, taubin_first, taubin_next, verbose,
+                  smoother, step)
+#}
+
+# Parses a comma separated list of face counts for levels of detail,
+# returning them from the finest to the coarsest.
+def ParseLOD(s): #{
+  lod = sorted([int(f) for f in s.split(',')], reverse=True)
+  if (len(lod) == 0) or (lod[-1] < 4): #{
+    raise ValueError('Invalid level of detail face counts ' + s + '.')
+  #}
+  return(lod)
+#}
+
+# Returns the output file name for level of detail k.
+def LODOutFile(outfile, k): #{
+  base, ext = os.path.splitext(outfile)
+  return(base + '_lod' + str(k) + ext)
+#}
+
+# Makes a MeshSet holding the given surface.
+def MakeMeshSet(verts, faces, verbose = False): #{
+  ms = pymeshlab.MeshSet()
+  if verbose: #{
+    ms.set_verbosity(True)
+  #}
+  ms.add_mesh(pymeshlab.Mesh(
+      vertex_matrix=np.asarray(verts, dtype=np.float64),
+      face_matrix=np.asarray(faces, dtype=np.int32)))
+  return(ms)
+#}
+
+# Writes the current mesh of the given MeshSet, in the format given by
+# the file extension, see WlzMeshIO.WriteMesh().
+def WriteMeshSet(filename, ms, **kwargs): #{
+  m = ms.current_mesh()
+  mio.WriteMesh(filename, m.vertex_matrix(), m.face_matrix(), **kwargs)
+#}
+
+# Times the stages of a surface pipeline, recording for each stage its
+# name, any tags (eg the level of detail or label), the wall time, the
+# CPU time (including that of child processes which have been waited
+# for) and the peak resident set size of the process and its children
+# on completion. Further values such as the numbers of vertices and
+# faces, or the size of a file written, may be added to a stage's
+# record. If not enabled records are returned but not kept or timed.
+class StageReport(object): #{
+  def __init__(self, enabled = True): #{
+    self.enabled = enabled
+    self.stages = []
+    self.stdout = None
+    self.t0 = time.perf_counter()
+    self.cpu0 = self.cpuTime()
+  #}
+
+  def cpuTime(self): #{
+    t = os.times()
+    return(t.user + t.system + t.children_user + t.children_system)
+  #}
+
+  def peakRSS(self): #{
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return(rss / 1024.0)
+  #}
+
+  # Starts a stage, returning its record which is completed by end().
+  def begin(self, name, **tags): #{
+    rec = {'stage': name}
+    rec.update(tags)
+    if self.enabled: #{
+      rec['wall_s'] = time.perf_counter()
+      rec['cpu_s'] = self.cpuTime()
+      self.stages.append(rec)
+    #}
+    return(rec)
+  #}
+
+  def end(self, rec): #{
+    if self.enabled: #{
+      rec['wall_s'] = time.perf_counter() - rec['wall_s']
+      rec['cpu_s'] = self.cpuTime() - rec['cpu_s']
+      rec['peak_rss_mb'] = self.peakRSS()
+    #}
+  #}
+
+  # Sets the numbers of vertices and faces in a stage's record.
+  def setMesh(self, rec, n_verts, n_faces): #{
+    rec['n_verts'] = int(n_verts)
+    rec['n_faces'] = int(n_faces)
+  #}
+
+  # Sets the file written by a stage and its size.
+  def setFile(self, rec, filename): #{
+    rec['file'] = filename
+    if self.enabled and os.path.exists(filename): #{
+      rec['file_bytes'] = os.path.getsize(filename)
+    #}
+  #}
+
+  # Keeps the standard output for the report alone, redirecting all
+  # other output to it (including that of native code and of child
+  # processes) to the standard error.
+  def reserveStdout(self): #{
+    sys.stdout.flush()
+    self.stdout = os.fdopen(os.dup(1), 'w')
+    os.dup2(2, 1)
+  #}
+
+  # Adds stage records made by another (eg a worker process's) report,
+  # tagging each with the given tags.
+  def merge(self, stages, **tags): #{
+    for rec in stages: #{
+      rec.update(tags)
+      self.stages.append(rec)
+    #}
+  #}
+
+  # Writes the report as JSON, to the standard output if the file name
+  # is '-', with the given information, the totals since the report was
+  # made, the totals for each stage name and the individual records.
+  def write(self, filename, **info): #{
+    totals = {}
+    for rec in self.stages: #{
+      tot = totals.setdefault(rec['stage'], {'count': 0, 'wall_s': 0.0,
+                                             'cpu_s': 0.0})
+      tot['count'] += 1
+      tot['wall_s'] += rec['wall_s']
+      tot['cpu_s'] += rec['cpu_s']
+    #}
+    rpt = dict(info)
+    rpt.update({'wall_s': time.perf_counter() - self.t0,
+                'cpu_s': self.cpuTime() - self.cpu0, 'peak_rss_mb': self.peakRSS(),
+                'totals': totals, 'stages': self.stages})
+    if filename == '-': #{
+      out = sys.stdout if self.stdout is None else self.stdout
+      print(json.dumps(rpt, indent=2), file=out)
+      out.flush()
+    else: #}{
+      with open(filename, 'w') as f: #{
+        json.dump(rpt, f, indent=2)
+      #}
+    #}
+  #}
+#}
@@ -0,0 +1,307 @@
+#!/usr/bin/python3
+##
+# \file         WlzSurfaceBench.py
+# \author       agent <agent@local>
+# \date         October 2026
+# \version      $Id$
+# \par
+# Address:
+#               MRC Human Genetics Unit,
+#               MRC Institute of Genetics and Molecular Medicine,
+#               University of Edinburgh,
+#               Western General Hospital,
+#               Edinburgh, EH4 2XU, UK.
+# \par
+# Copyright (C), [2026],
+# The University Court of the University of Edinburgh,
+# Old College, Edinburgh, UK.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be
+# useful but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public
+# License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+# \brief        Benchmark of alternative decimation schedules for the
+#               surface scripts, reporting the time, memory and fidelity
+#               of each schedule for synthetic and real surfaces.
+##
+
+from __future__ import print_function
+import sys
+import json
+import time
+import argparse
+import resource
+import multiprocessing
+import numpy as np
+from scipy import ndimage
+from scipy.spatial import cKDTree
+from skimage import measure
+import WlzSurface as wsf
+import WlzMeshIO as mio
+
+prog = 'WlzSurfaceBench'
+args = None
+
+# The schedules compared: name, decimation step (zero for a single
+# step) and the number of Taubin smoothing steps after the first and
+# subsequent decimation steps.
+schedules = [('single', 0, 0, 0),
+             ('single_smooth', 0, 10, 4),
+             ('step2', 2, 0, 0),
+             ('step2_smooth', 2, 10, 4),
+             ('step4', 4, 0, 0),
+             ('step4_smooth', 4, 10, 4)]
+
+def ErrorMsg(msg): #{
+  print(prog + ': ' + msg, file=sys.stderr)
+  exit(1)
+#}
+
+def VerbMsg(msg): #{
+  if(args.verbose): #{
+    print(prog + ': ' + msg, file=sys.stderr)
+  #}
+#}
+
+def ParseArgs(): #{
+  parser = argparse.ArgumentParser(description = \
+      'Runs synthetic and real surfaces through alternative decimation ' + \
+      'schedules (a single step or steps reducing the number of faces ' + \
+      'by at most 2x or 4x, with or without Taubin smoothing between ' + \
+      'steps), writing the wall time, peak memory, final number of ' + \
+      'faces and the Hausdorff, RMS and mean distances from the ' + \
+      'undecimated surface of each as JSON. The distances are ' + \
+      'sampled: they are between points sampled on each surface ' + \
+      '(at half the mean edge length of the undecimated surface) ' + \
+      'and their nearest samples on the other, not exact ' + \
+      'point to surface distances, so they may exceed the true ' + \
+      'distances by up to about the sample spacing.')
+  parser.add_argument('-k', '--smoother', \
+      type=str, choices=wsf.smoothers, default='meshlab', \
+      help='Taubin smoother.')
+  parser.add_argument('-m', '--maxface', \
+      type=int, default=20000, \
+      help='maximum number of faces in the decimated surfaces.')
+  parser.add_argument('-n', '--repeats', \
+      type=int, default=1, \
+      help='number of times each schedule is timed.')
+  parser.add_argument('-o', '--output', \
+      type=str, default='-', \
+      help='output JSON file.')
+  parser.add_argument('-s', '--sizes', \
+      type=str, default='64,128', \
+      help='comma separated edge lengths of the synthetic domains.')
+  parser.add_argument('-S', '--shapes', \
+      type=str, default='sphere,torus,blobs', \
+      help='comma separated synthetic domain shapes (sphere, torus ' + \
+           'or blobs), none if empty.')
+  parser.add_argument('-v', '--verbose', \
+      action='store_true', default=False, \
+      help='verbose output (mainly useful for debugging).')
+  parser.add_argument('infile', nargs='*', \
+      help='real surfaces, either surface files or 3D Woolz domains.')
+  args = parser.parse_args()
+  return(args)
+#}
+
+# Makes a [z, y, x] mask of the given shape with n voxels along each
+# side.
+def MakeSyntheticMask(shape, n): #{
+  z, y, x = (np.mgrid[0:n, 0:n, 0:n].astype(np.float64) + 0.5) / n - 0.5
+  if shape == 'sphere': #{
+    mask = x * x + y * y + z * z < 0.16
+  elif shape == 'torus': #}{
+    mask = (np.sqrt(x * x + y * y) - 0.28) ** 2 + z * z < 0.01
+  elif shape == 'blobs': #}{
+    # A smooth random field thresholded within a sphere.
+    rng = np.random.RandomState(0)
+    f = ndimage.gaussian_filter(rng.standard_normal((n, n, n)), n / 16.0)
+    mask = (f > 0.0) & (x * x + y * y + z * z < 0.2)
+  else: #}{
+    raise ValueError('Unknown synthetic shape ' + shape + '.')
+  #}
+  return(np.pad(mask, 1).astype(np.uint8))
+#}
+
+def MaskToSurface(mask): #{
+  verts, faces, _, _ = measure.marching_cubes(mask, level=0.5,
+                                              allow_degenerate=False)
+  return(verts[:, ::-1], faces)
+#}
+
+# Reads a real surface from a surface file or extracts it from a 3D
+# Woolz domain in the same way as WlzDomainToVTKSurf.
+def ReadSurface(filename): #{
+  if mio.IsMeshFormat(filename): #{
+    return(mio.ReadMesh(filename))
+  #}
+  import WlzSection as ws
+  import WlzDomainToVTKSurf as d2s
+  obj = d2s.ReadWoolzFile(filename)
+  if (not bool(obj)) or (obj.contents.type != d2s.Wlz.WLZ_3D_DOMAINOBJ): #{
+    raise IOError('Failed to read 3D Woolz domain from ' + filename + '.')
+  #}
+  obj = d2s.Wlz.WlzAssignObject(obj, None)
+  org, shp, vsz = d2s.DomainBox(obj)
+  verts, faces = d2s.MaskToSurface(ws.DomainMaskToNP(obj, org, shp), org,
+                                   [1.0, 1.0, 1.0])
+  d2s.Wlz.WlzFreeObj(obj)
+  return(verts, faces)
+#}
+
+def MeanEdgeLength(verts, faces): #{
+  return(float(np.mean(np.linalg.norm(verts[faces[:, [1, 2, 0]]] -
+                                      verts[faces], axis=2))))
+#}
+
+# Returns points sampling the given surface with at most about the
+# given spacing: the vertices together with points on a regular
+# barycentric grid over each face.
+def SurfaceSamples(verts, faces, spacing): #{
+  n = int(min(max(np.ceil(MeanEdgeLength(verts, faces) / spacing), 1), 16))
+  bary = np.array([[i, j, n - i - j] for i in range(0, n + 1)
+                   for j in range(0, n + 1 - i)
+                   if max(i, j, n - i - j) < n], dtype=np.float64) / n
+  pts = [verts]
+  if len(bary) > 0: #{
+    pts.append(np.einsum('bk,fkd->fbd', bary, verts[faces]).reshape(-1, 3))
+  #}
+  return(np.concatenate(pts))
+#}
+
+# Returns the sampled symmetric Hausdorff distance and the RMS and mean
+# of the sampled distances between two surfaces, with the sample spacing.
+# Distances are those between points sampled on each surface, at half the
+# mean edge length of the first surface, and their nearest samples on the
+# other, found by k-d tree queries. These are not point to surface
+# distances and may exceed them by up to about the sample spacing.
+def SurfaceDistance(verts0, faces0, verts1, faces1): #{
+  spacing = 0.5 * MeanEdgeLength(verts0, faces0)
+  s0 = SurfaceSamples(verts0, faces0, spacing)
+  s1 = SurfaceSamples(verts1, faces1, spacing)
+  d01 = cKDTree(s1).query(s0, workers=-1)[0]
+  d10 = cKDTree(s0).query(s1, workers=-1)[0]
+  d = np.concatenate((d01, d10))
+  return({'sampled_hausdorff': float(d.max()),
+          'sampled_rms': float(np.sqrt(np.mean(d * d))),
+          'sampled_mean': float(np.mean(d)),
+          'sample_spacing': float(spacing)})
+#}
+
+# Decimates the given surface with a schedule, returning the wall time,
+# the peak resident set size of the process, its growth during the
+# decimation and the decimated surface.
+def Decimate(verts, faces, sched): #{
+  name, step, taubin_first, taubin_next = sched
+  rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  t0 = time.perf_counter()
+  ms = wsf.MakeMeshSet(verts, faces)
+  wsf.SimplifyMesh(ms, args.maxface, taubin_first, taubin_next,
+                   smoother=args.smoother, step=step)
+  t = time.perf_counter() - t0
+  rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  m = ms.current_mesh()
+  return({'wall_s': t, 'peak_rss_mb': rss1 / 1024.0,
+          'rss_growth_mb': (rss1 - rss0) / 1024.0},
+         m.vertex_matrix(), m.face_matrix())
+#}
+
+# Runs Decimate() in a forked process so that each schedule's peak
+# memory is measured from the same starting point. The parent closes its
+# copy of the pipe's write end so that a child which fails before sending
+# its result gives an EOFError rather than a hang.
+def DecimateIsolated(verts, faces, sched): #{
+  ctx = multiprocessing.get_context('fork')
+  rd, wr = ctx.Pipe(False)
+  p = ctx.Process(target=lambda: wr.send(Decimate(verts, faces, sched)))
+  p.start()
+  wr.close()
+  try: #{
+    res = rd.recv()
+  except EOFError: #}{
+    res = None
+  #}
+  rd.close()
+  p.join()
+  if (res is None) or (p.exitcode != 0): #{
+    raise RuntimeError('schedule ' + sched[0] +
+                       ' failed in child process (exit code ' +
+                       str(p.exitcode) + ')')
+  #}
+  return(res)
+#}
+
+def BenchSurface(verts, faces): #{
+  res = {'n_faces': int(faces.shape[0]), 'schedules': {}}
+  for sched in schedules: #{
+    VerbMsg('  schedule ' + sched[0] + '.')
+    try: #{
+      runs = [DecimateIsolated(verts, faces, sched)
+              for i in range(0, args.repeats)]
+    except RuntimeError as e: #}{
+      ErrorMsg(str(e))
+    #}
+    stats, dverts, dfaces = runs[-1]
+    stats['wall_s'] = float(np.median([r[0]['wall_s'] for r in runs]))
+    stats['peak_rss_mb'] = max([r[0]['peak_rss_mb'] for r in runs])
+    stats['rss_growth_mb'] = max([r[0]['rss_growth_mb'] for r in runs])
+    stats['step'] = sched[1]
+    stats['taubin'] = [sched[2], sched[3]]
+    stats['n_faces'] = int(dfaces.shape[0])
+    stats.update(SurfaceDistance(verts, faces, dverts, dfaces))
+    res['schedules'][sched[0]] = stats
+  #}
+  return(res)
+#}
+
+if __name__ == '__main__': #{
+  args = ParseArgs()
+  prog = sys.argv[0]
+  results = {'maxface': args.maxface, 'smoother': args.smoother,
+             'repeats': args.repeats, 'surfaces': {}}
+  shapes = [s for s in args.shapes.split(',') if s]
+  sizes = [int(s) for s in args.sizes.split(',') if s]
+  for shape in shapes: #{
+    for n in sizes: #{
+      name = shape + str(n)
+      VerbMsg('Making synthetic surface ' + name + '.')
+      try: #{
+        verts, faces = MaskToSurface(MakeSyntheticMask(shape, n))
+      except ValueError as e: #}{
+        ErrorMsg(str(e))
+      #}
+      VerbMsg('Benchmarking ' + name + ' (' + str(faces.shape[0]) +
+              ' faces).')
+      results['surfaces'][name] = BenchSurface(verts, faces)
+    #}
+  #}
+  for f in args.infile: #{
+    try: #{
+      verts, faces = ReadSurface(f)
+    except (mio.MeshIOError, IOError, ValueError) as e: #}{
+      ErrorMsg('Failed to read surface from ' + f + ' (' + str(e) + ').')
+    #}
+    VerbMsg('Benchmarking ' + f + ' (' + str(faces.shape[0]) + ' faces).')
+    results['surfaces'][f] = BenchSurface(verts, faces)
+  #}
+  if args.output == '-': #{
+    json.dump(results, sys.stdout, indent=2)
+    print()
+  else: #}{
+    with open(args.output, 'w') as f: #{
+      json.dump(results, f, indent=2)
+    #}
+  #}
+  exit(0)
+#}
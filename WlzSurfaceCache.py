@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+##
+# \file         WlzSurfaceCache.py
+# \author       agent <agent@local>
+# \date         October 2026
+# \version      $Id$
+# \par
+# Address:
+#               MRC Human Genetics Unit,
+#               MRC Institute of Genetics and Molecular Medicine,
+#               University of Edinburgh,
+#               Western General Hospital,
+#               Edinburgh, EH4 2XU, UK.
+# \par
+# Copyright (C), [2026],
+# The University Court of the University of Edinburgh,
+# Old College, Edinburgh, UK.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be
+# useful but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public
+# License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+# \brief        On-disk cache of the files written by the Woolz surface
+#               scripts, keyed by the content of the input file and the
+#               parameters used, with least recently used eviction.
+##
+
+from __future__ import print_function
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+# Incremented whenever a change to the surface scripts would change
+# their output for the same input and parameters.
+cache_version = 1
+
+# The age in seconds after which a temporary directory, left by a process
+# which was interrupted while adding or removing an entry, is removed.
+stale_age = 3600
+
+# A cache of output files held in a directory, with an entry (a
+# sub-directory named by the key) for each input and set of parameters.
+# The modification time of an entry's directory is its last use, and
+# the least recently used entries are removed once the total size of
+# the cached files exceeds max_bytes. Entries are made atomically by
+# renaming, so a cache may be shared by concurrent processes.
+class SurfaceCache(object): #{
+  def __init__(self, cachedir, max_bytes = 1 << 30): #{
+    self.cachedir = cachedir
+    self.max_bytes = max_bytes
+    os.makedirs(cachedir, exist_ok=True)
+  #}
+
+  # Returns the key for the given input file and parameters (a dict of
+  # values which can be written as JSON). The output file's base name
+  # should be included in the parameters since the cached files are
+  # restored with the names they were written with.
+  def key(self, infile, params): #{
+    h = hashlib.sha256()
+    h.update(json.dumps([cache_version, params], sort_keys=True).encode())
+    with open(infile, 'rb') as f: #{
+      for buf in iter(lambda: f.read(1 << 20), b''): #{
+        h.update(buf)
+      #}
+    #}
+    return(h.hexdigest())
+  #}
+
+  def entryDir(self, key): #{
+    return(os.path.join(self.cachedir, key))
+  #}
+
+  # Copies the files of the entry with the given key to the directory
+  # of outfile, returning the list of files written or None if there is
+  # no such entry.
+  def fetch(self, key, outfile): #{
+    ent = self.entryDir(key)
+    odir = os.path.dirname(outfile)
+    files = []
+    try: #{
+      with open(os.path.join(ent, 'files.json')) as f: #{
+        names = json.load(f)
+      #}
+      os.utime(ent)
+      for i, name in enumerate(names): #{
+        dst = os.path.join(odir, name)
+        if os.path.dirname(name): #{
+          os.makedirs(os.path.dirname(dst), exist_ok=True)
+        #}
+        shutil.copyfile(os.path.join(ent, str(i)), dst)
+        files.append(dst)
+      #}
+    except (IOError, ValueError): #}{
+      # No entry, or it was evicted while being fetched.
+      return(None)
+    #}
+    return(files)
+  #}
+
+  # Adds an entry with the given key holding copies of the given files,
+  # which were written to the directory of outfile, then evicts the
+  # least recently used entries if the cache has grown too large.
+  def store(self, key, outfile, files): #{
+    odir = os.path.dirname(outfile)
+    tmp = tempfile.mkdtemp(prefix='.tmp', dir=self.cachedir)
+    names = []
+    try: #{
+      for i, f in enumerate(files): #{
+        shutil.copyfile(f, os.path.join(tmp, str(i)))
+        names.append(os.path.relpath(f, odir or os.curdir))
+      #}
+      with open(os.path.join(tmp, 'files.json'), 'w') as f: #{
+        json.dump(names, f)
+      #}
+    except BaseException: #}{
+      shutil.rmtree(tmp, ignore_errors=True)
+      raise
+    #}
+    try: #{
+      os.rename(tmp, self.entryDir(key))
+    except OSError: #}{
+      # Another process has made the same entry.
+      shutil.rmtree(tmp, ignore_errors=True)
+    #}
+    self.evict()
+  #}
+
+  # Removes temporary directories older than stale_age, then the least
+  # recently used entries until the total size of the cache (including
+  # any remaining temporary directories) is at most max_bytes.
+  def evict(self): #{
+    ents = []
+    total = 0
+    now = time.time()
+    for e in os.scandir(self.cachedir): #{
+      if e.is_dir(): #{
+        try: #{
+          mtime = e.stat().st_mtime
+          if e.name.startswith('.') and (now - mtime > stale_age): #{
+            shutil.rmtree(e.path, ignore_errors=True)
+            continue
+          #}
+          sz = sum(f.stat().st_size for f in os.scandir(e.path))
+          if not e.name.startswith('.'): #{
+            ents.append((mtime, sz, e.path))
+          #}
+          total = total + sz
+        except OSError: #}{
+          pass
+        #}
+      #}
+    #}
+    for mtime, sz, path in sorted(ents): #{
+      if total <= self.max_bytes: #{
+        break
+      #}
+      # Rename before removal so that a partly removed entry is never
+      # fetched.
+      dead = os.path.join(self.cachedir, '.del' + os.path.basename(path) +
+                          '.' + str(os.getpid()))
+      try: #{
+        os.rename(path, dead)
+        shutil.rmtree(dead, ignore_errors=True)
+      except OSError: #}{
+        pass
+      #}
+      total = total - sz
+    #}
+  #}
+#}
@@ -5,9 +5,13 @@ import os
 import sys
 import argparse
 import logging
+import threading
+import collections
 import ctypes as c
 import numpy as np
 import Wlz as w
+import WlzSection as ws
+import WlzMeshIO as mio
 import math as m
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtCore, QtGui
@@ -15,11 +19,277 @@ from pyqtgraph.Qt import QtCore, QtGui
 libc = c.CDLL("libc.so.6")
 
 libc.fopen.restype = c.POINTER(w.FILE)
+libc.ftell.restype = c.c_long
 
 class WlzError(Exception): #{
   pass
 #}
 
+# A lazily built multi-resolution tile pyramid for large 2D Woolz
+# objects. Level 0 is the object itself and each further level is
+# point sampled by a factor of two from the level below. Levels are
+# only sampled and tiles only converted to numpy arrays when first
+# needed, with the most recently used tiles kept in a cache. Tile
+# rectangles are in the image coordinates used by WlzView, ie level 0
+# pixels relative to the object's bounding box origin.
+class WlzTilePyramid(object): #{
+
+  def __init__(self, obj2d, gtype, tile_sz, max_tiles): #{
+    self.gtype = gtype
+    self.tile_sz = tile_sz
+    self.max_tiles = max_tiles
+    self.errnum = c.c_int(w.WLZ_ERR_NONE)
+    self.tiles = collections.OrderedDict()
+    self.gvwsp = None
+    self.objs = [w.WlzAssignObject(obj2d, None)]
+    self.boxes = [w.WlzBoundingBox3I(obj2d, c.byref(self.errnum))]
+    b = self.boxes[0]
+    n = max(b.xMax - b.xMin + 1, b.yMax - b.yMin + 1)
+    self.n_levels = 1
+    while n > tile_sz: #{
+      n = (n + 1) // 2
+      self.n_levels += 1
+    #}
+  #}
+
+  def free(self): #{
+    if bool(self.gvwsp): #{
+      w.WlzGreyValueFreeWSp(self.gvwsp)
+      self.gvwsp = None
+    #}
+    for o in self.objs: #{
+      w.WlzFreeObj(o)
+    #}
+    self.objs = []
+    self.tiles.clear()
+  #}
+
+  def levelObj(self, lvl): #{
+    while (len(self.objs) <= lvl) and (not bool(self.errnum)): #{
+      logging.debug('WlzTilePyramid sampling level ' + str(len(self.objs)))
+      f = w.WlzIVertex3()
+      f.vtX = 2
+      f.vtY = 2
+      f.vtZ = 1
+      o = w.WlzSampleObj(self.objs[-1], f,
+                         c.c_int(w.WLZ_SAMPLEFN_POINT), c.byref(self.errnum))
+      if not bool(self.errnum): #{
+        self.objs.append(w.WlzAssignObject(o, None))
+        self.boxes.append(w.WlzBoundingBox3I(o, c.byref(self.errnum)))
+      #}
+    #}
+    o = None
+    if len(self.objs) > lvl: #{
+      o = self.objs[lvl]
+    #}
+    return(o)
+  #}
+
+  def levelRect(self, lvl, x0, y0, nx, ny): #{
+    f = 1 << lvl
+    b0 = self.boxes[0]
+    return(QtCore.QRectF(x0 * f - b0.xMin, y0 * f - b0.yMin, nx * f, ny * f))
+  #}
+
+  def levelImage(self, lvl): #{
+    ary = None
+    rect = None
+    o = self.levelObj(lvl)
+    if bool(o): #{
+      b = self.boxes[lvl]
+      org = w.WlzIVertex2()
+      org.vtX = b.xMin
+      org.vtY = b.yMin
+      sz = w.WlzIVertex2()
+      sz.vtX = b.xMax - b.xMin + 1
+      sz.vtY = b.yMax - b.yMin + 1
+      ary, self.errnum = ws.RegionToNP(o, org, sz, self.gtype)
+      rect = self.levelRect(lvl, b.xMin, b.yMin, sz.vtX, sz.vtY)
+    #}
+    return(ary, rect)
+  #}
+
+  def visibleTiles(self, lvl, vr): #{
+    # Returns the keys (lvl, tx, ty) of the tiles at the given level
+    # which intersect the given view rectangle.
+    keys = []
+    if bool(self.levelObj(lvl)): #{
+      f = 1 << lvl
+      b0 = self.boxes[0]
+      b = self.boxes[lvl]
+      t = self.tile_sz
+      ntx = (b.xMax - b.xMin + t) // t
+      nty = (b.yMax - b.yMin + t) // t
+      x0 = int(m.floor((vr.left() + b0.xMin) / f)) - b.xMin
+      x1 = int(m.floor((vr.right() + b0.xMin) / f)) - b.xMin
+      y0 = int(m.floor((vr.top() + b0.yMin) / f)) - b.yMin
+      y1 = int(m.floor((vr.bottom() + b0.yMin) / f)) - b.yMin
+      for ty in range(max(0, y0 // t), min(nty - 1, y1 // t) + 1): #{
+        for tx in range(max(0, x0 // t), min(ntx - 1, x1 // t) + 1): #{
+          keys.append((lvl, tx, ty))
+        #}
+      #}
+    #}
+    return(keys)
+  #}
+
+  def tile(self, lvl, tx, ty): #{
+    key = (lvl, tx, ty)
+    b = self.boxes[lvl]
+    t = self.tile_sz
+    org = w.WlzIVertex2()
+    org.vtX = b.xMin + tx * t
+    org.vtY = b.yMin + ty * t
+    sz = w.WlzIVertex2()
+    sz.vtX = min(t, b.xMax - org.vtX + 1)
+    sz.vtY = min(t, b.yMax - org.vtY + 1)
+    if key in self.tiles: #{
+      ary = self.tiles.pop(key)
+    else: #}{
+      ary, self.errnum = ws.RegionToNP(self.levelObj(lvl), org, sz,
+                                       self.gtype)
+    #}
+    if ary is not None: #{
+      self.tiles[key] = ary
+      while len(self.tiles) > self.max_tiles: #{
+        self.tiles.popitem(last=False)
+      #}
+    #}
+    return(ary, self.levelRect(lvl, org.vtX, org.vtY, sz.vtX, sz.vtY))
+  #}
+
+  def value(self, x, y): #{
+    # Returns the level 0 grey value at the given image coordinates.
+    if not bool(self.gvwsp): #{
+      errnum = c.c_int(w.WLZ_ERR_NONE)
+      self.gvwsp = w.WlzGreyValueMakeWSp(self.objs[0], c.byref(errnum))
+    #}
+    b0 = self.boxes[0]
+    w.WlzGreyValueGet(self.gvwsp, 0, y + b0.yMin, x + b0.xMin)
+    gv = self.gvwsp.contents.gVal[0]
+    if self.gtype == w.WLZ_GREY_UBYTE: #{
+      v = gv.ubv
+    elif self.gtype == w.WLZ_GREY_SHORT: #}{
+      v = gv.shv
+    elif self.gtype == w.WLZ_GREY_INT: #}{
+      v = gv.inv
+    elif self.gtype == w.WLZ_GREY_FLOAT: #}{
+      v = gv.flv
+    else: #}{
+      v = gv.dbv
+    #}
+    return(v)
+  #}
+#}
+
+# One pane of the tri-planar view, showing the section with the given
+# pitch and yaw (in degrees) through the crosshair, which is drawn as a
+# pair of movable lines. Images are placed at their section coordinates.
+class TriPlanePane(object): #{
+
+  def __init__(self, name, pitch, yaw, view_box): #{
+    self.name = name
+    self.pitch = pitch
+    self.yaw = yaw
+    self.geom = None
+    self.view_box = view_box
+    self.view_box.setAspectLocked()
+    self.view_box.invertY()
+    self.img_itm = pg.ImageItem()
+    self.view_box.addItem(self.img_itm)
+    self.vline = pg.InfiniteLine(angle=90, movable=True, pen=(0,9))
+    self.hline = pg.InfiniteLine(angle=0, movable=True, pen=(0,9))
+    self.view_box.addItem(self.vline)
+    self.view_box.addItem(self.hline)
+  #}
+
+  def dist(self, p): #{
+    rot, fixed, d = self.geom
+    return(float(np.dot(rot[2], np.asarray(p) - fixed)))
+  #}
+
+  def toSection(self, p): #{
+    rot, fixed, d = self.geom
+    return(np.dot(rot, np.asarray(p) - fixed))
+  #}
+
+  def fromSection(self, u, v, d): #{
+    rot, fixed, d0 = self.geom
+    return(fixed + np.dot(rot.T, np.array([u, v, d])))
+  #}
+
+  def setSection(self, sec, p): #{
+    ary, org, gtype, errnum = sec
+    if ary is not None: #{
+      self.img_itm.setImage(ary.astype(np.float64).T)
+      self.img_itm.setRect(QtCore.QRectF(org[0], org[1],
+                                         ary.shape[1], ary.shape[0]))
+    #}
+    q = self.toSection(p)
+    self.vline.setValue(q[0])
+    self.hline.setValue(q[1])
+  #}
+#}
+
+# Reads a Woolz object from a file in a background thread so that the
+# GUI remains responsive while large files are read. The number of bytes
+# read so far is available through bytesRead() for progress reporting.
+# WlzReadObj() can not be interrupted, so a cancelled read runs to
+# completion and its object is then discarded.
+class WlzReadWorker(QtCore.QThread): #{
+
+  done = QtCore.Signal(object)
+
+  def __init__(self, fname, parent = None): #{
+    super(WlzReadWorker, self).__init__(parent)
+    self.fname = fname
+    self.obj = None
+    self.errnum = c.c_int(w.WLZ_ERR_FILE_OPEN)
+    self.cancelled = False
+    self.handler = None
+    self.fp = None
+    self.fp_lock = threading.Lock()
+    try: #{
+      self.size = os.path.getsize(fname)
+    except OSError: #}{
+      self.size = 0
+    #}
+  #}
+
+  def bytesRead(self): #{
+    n = 0
+    with self.fp_lock: #{
+      if bool(self.fp): #{
+        n = libc.ftell(self.fp)
+      #}
+    #}
+    return(n)
+  #}
+
+  def run(self): #{
+    logging.debug('WlzReadWorker.run() reading ' + self.fname)
+    fp = c.cast(libc.fopen(self.fname.encode('utf-8'), b'rb'),
+                c.POINTER(w.FILE))
+    if bool(fp): #{
+      with self.fp_lock: #{
+        self.fp = fp
+      #}
+      errnum = c.c_int(w.WLZ_ERR_NONE)
+      obj = w.WlzReadObj(fp, c.byref(errnum))
+      with self.fp_lock: #{
+        self.fp = None
+      #}
+      libc.fclose(fp)
+      self.errnum = errnum
+      if not bool(errnum): #{
+        self.obj = w.WlzAssignObject(obj, None)
+      #}
+    #}
+    logging.debug('WlzReadWorker.run() done')
+    self.done.emit(self)
+  #}
+#}
+
 class WlzView(QtGui.QMainWindow): #{
 
   args = None
@@ -55,11 +325,59 @@ class WlzView(QtGui.QMainWindow): #{
   track_proxy = None
   # file formats understood
   file_formats = ['wlz']
+  # tiled rendering of large 2D images
+  tile_sz = 512
+  tile_max = 128
+  tile_threshold = 4096 * 4096
+  tile_pyramid = None
+  tile_itms = {}
+  img_levels = None
+  # tri-planar orthogonal views sharing a section cache
+  tri_planar = False
+  tri_panes = []
+  tri_cutter = None
+  xhair = [0.0, 0.0, 0.0]
+  img_stack = None
+  # dense volume reslicing
+  dense = False
+  dense_sec = None
+  dense_max_bytes = 1024 * 1024 * 1024
+  interp = w.WLZ_INTERPOLATION_NEAREST
+  dense_act = None
+  # projection through a slab about the section
+  proj_mode = None
+  proj_thickness = 10.0
+  proj_cutter = None
+  # section controls
+  dst_sld = None
+  dst_val = None
+  pit_spn = None
+  yaw_spn = None
+  rol_spn = None
+  # label overlay of an index object, coloured through a lookup table
+  lbl_obj = None
+  lbl_itm = None
+  lbl_desc = {}
+  lbl_lut = None
+  lbl_ary = None
+  lbl_org = [0, 0]
+  lbl_opacity = 0.5
+  lbl_dialog = None
+  # batched sampling of grey values at points through the object
+  sampler = None
+  sampler_max_bytes = 64 * 1024 * 1024
+  sec_geom = None
+  sec_geom_key = None
+  # background file reading
+  read_worker = None
+  read_progress = None
+  read_timer = None
 
   def __init__(self, prog, args): #{
     super(WlzView, self).__init__()
     self.prog = prog
     self.args = args
+    self.dense_max_bytes = args.maxdense * 1024 * 1024
     self.initUI()
   #}
 
@@ -79,6 +397,14 @@ class WlzView(QtGui.QMainWindow): #{
     fOpen.setStatusTip('Open new Woolz file.')
     fOpen.triggered.connect(self.openFile)
     fMenu.addAction(fOpen)
+    fOpenLbl = QtGui.QAction('Open Index Object', self)
+    fOpenLbl.setStatusTip('Open a Woolz index object to overlay as labels.')
+    fOpenLbl.triggered.connect(self.openLabelObj)
+    fMenu.addAction(fOpenLbl)
+    fOpenLdf = QtGui.QAction('Open Label Descriptions', self)
+    fOpenLdf.setStatusTip('Open an ITK-SnAP label description file.')
+    fOpenLdf.triggered.connect(self.openLabelDesc)
+    fMenu.addAction(fOpenLdf)
     # 
     fExit  = QtGui.QAction(QtGui.QIcon('exit.png'), 'Exit', self)
     fExit.setShortcut('Ctrl+Q')
@@ -91,6 +417,47 @@ class WlzView(QtGui.QMainWindow): #{
     vViewAll.setStatusTip('View All')
     vViewAll.triggered.connect(self.viewAll)
     vMenu.addAction(vViewAll)
+    vTri = vMenu.addAction('Tri-planar')
+    vTri.setCheckable(True)
+    vTri.setStatusTip('Show orthogonal XY, XZ and YZ sections.')
+    vTri.triggered.connect(self.setTriPlanar)
+    vDense = vMenu.addAction('Dense volume reslicing')
+    vDense.setCheckable(True)
+    vDense.setStatusTip('Cut sections from a dense in memory copy of the ' +
+                        'object.')
+    vDense.triggered.connect(self.setDense)
+    self.dense_act = vDense
+    prjMenu = vMenu.addMenu('&Projection')
+    prjGrp = QtGui.QActionGroup(self)
+    for nam, mode in [('None', None), ('Maximum intensity', 'mip'),
+                      ('Minimum intensity', 'minip'), ('Mean', 'mean')]: #{
+      act = prjMenu.addAction(nam)
+      act.setCheckable(True)
+      act.setChecked(mode is None)
+      prjGrp.addAction(act)
+      act.triggered.connect(lambda q, mode=mode: self.setProjMode(mode))
+    #}
+    lblMenu = vMenu.addMenu('&Labels')
+    lblVis = lblMenu.addAction('Visibility...')
+    lblVis.triggered.connect(self.showLabelVisibility)
+    lblOpa = lblMenu.addAction('Opacity...')
+    lblOpa.triggered.connect(self.setLabelOpacity)
+    lblClr = lblMenu.addAction('Remove')
+    lblClr.triggered.connect(self.removeLabels)
+    prjMenu.addSeparator()
+    prjThk = prjMenu.addAction('Slab thickness...')
+    prjThk.triggered.connect(self.setProjThickness)
+    intMenu = vMenu.addMenu('&Interpolation')
+    intNearest = intMenu.addAction('Nearest')
+    intLinear = intMenu.addAction('Linear')
+    intGrp = QtGui.QActionGroup(self)
+    intGrp.addAction(intNearest)
+    intGrp.addAction(intLinear)
+    intNearest.setCheckable(True)
+    intLinear.setCheckable(True)
+    intNearest.setChecked(True)
+    intNearest.triggered.connect(self.setInterpNearest)
+    intLinear.triggered.connect(self.setInterpLinear)
     # Measurement menu
     curVal = mMenu.addAction('Value at cursor')
     curVal.setCheckable(True)
@@ -112,6 +479,10 @@ class WlzView(QtGui.QMainWindow): #{
     roiNone.triggered.connect(self.setROITypeNone)
     roiLine.triggered.connect(self.setROITypeLine)
     roiRect.triggered.connect(self.setROITypeRect)
+    prf3D = mMenu.addAction('3D Profile...')
+    prf3D.setStatusTip('Plot the values along a polyline through the ' +
+                       '3D object.')
+    prf3D.triggered.connect(self.showProfile3D)
     # Help menu
     self.about = AboutDialog(self.version)
     hAbout = QtGui.QAction('About', self)
@@ -129,9 +500,13 @@ class WlzView(QtGui.QMainWindow): #{
     grd0 = QtGui.QGridLayout(w0)
     grd0.setSpacing(8)
     gl0 = pg.GraphicsLayoutWidget()
+    gl_tri = pg.GraphicsLayoutWidget()
+    self.img_stack = QtGui.QStackedWidget()
+    self.img_stack.addWidget(gl0)
+    self.img_stack.addWidget(gl_tri)
     pw = pg.PlotWidget()
     ctl = QtGui.QFrame()
-    grd0.addWidget(gl0, 0, 0, 8, 4)
+    grd0.addWidget(self.img_stack, 0, 0, 8, 4)
     grd0.addWidget(pw, 0, 6, 2, 2)
     grd0.addWidget(ctl, 4, 6, 2, 2)
     #
@@ -140,12 +515,28 @@ class WlzView(QtGui.QMainWindow): #{
     gl1 = pg.GraphicsLayoutWidget()
     dst_lab = QtGui.QLabel('Distance')
     dst_sld = QtGui.QSlider(QtCore.Qt.Horizontal)
-    dst_sld.setRange(0.0, 100.0) # TODO
-    dst_sld.setValue(0.0) # TODO
+    dst_sld.setRange(0, 0)
+    dst_sld.setValue(0)
     dst_val = QtGui.QLineEdit('0.0')
     pit_lab = QtGui.QLabel('Pitch')
     yaw_lab = QtGui.QLabel('Yaw')
     rol_lab = QtGui.QLabel('Roll')
+    pit_spn = QtGui.QDoubleSpinBox()
+    yaw_spn = QtGui.QDoubleSpinBox()
+    rol_spn = QtGui.QDoubleSpinBox()
+    for spn in [pit_spn, yaw_spn, rol_spn]: #{
+      spn.setRange(-360.0, 360.0)
+      spn.setSingleStep(1.0)
+      spn.setKeyboardTracking(False)
+      spn.valueChanged.connect(self.setAngles)
+    #}
+    dst_sld.valueChanged.connect(self.setDistFromSlider)
+    dst_val.editingFinished.connect(self.setDistFromText)
+    self.dst_sld = dst_sld
+    self.dst_val = dst_val
+    self.pit_spn = pit_spn
+    self.yaw_spn = yaw_spn
+    self.rol_spn = rol_spn
     grd1.addWidget(dst_lab, 0, 0, 1, 1)
     dst_lab.setAlignment(QtCore.Qt.AlignLeft)
     grd1.addWidget(dst_sld, 0, 1, 1, 6)
@@ -154,12 +545,29 @@ class WlzView(QtGui.QMainWindow): #{
     grd1.addWidget(pit_lab, 1, 0, 1, 1)
     grd1.addWidget(yaw_lab, 2, 0, 1, 1)
     grd1.addWidget(rol_lab, 3, 0, 1, 1)
+    grd1.addWidget(pit_spn, 1, 1, 1, 2)
+    grd1.addWidget(yaw_spn, 2, 1, 1, 2)
+    grd1.addWidget(rol_spn, 3, 1, 1, 2)
     #
     self.img_view_box = gl0.addViewBox(0, 0)
     self.img_itm = pg.ImageItem()
     self.img_view_box.setAspectLocked()
     self.img_view_box.addItem(self.img_itm)
     self.img_view_box.invertY()
+    self.img_view_box.sigRangeChanged.connect(self.updateTiles)
+    self.lbl_itm = pg.ImageItem()
+    self.lbl_itm.setZValue(2)
+    self.img_view_box.addItem(self.lbl_itm)
+    #
+    self.tri_panes = [
+        TriPlanePane('XY',  0.0,  0.0, gl_tri.addViewBox(0, 0)),
+        TriPlanePane('XZ', 90.0, 90.0, gl_tri.addViewBox(0, 1)),
+        TriPlanePane('YZ', 90.0,  0.0, gl_tri.addViewBox(1, 0))]
+    for pane in self.tri_panes: #{
+      pane.vline.sigPositionChangeFinished.connect(self.triPlanarLineMoved)
+      pane.hline.sigPositionChangeFinished.connect(self.triPlanarLineMoved)
+    #}
+    gl_tri.scene().sigMouseClicked.connect(self.triPlanarClicked)
     #
     self.plt_itm = pw.getPlotItem()
     #
@@ -172,8 +580,7 @@ class WlzView(QtGui.QMainWindow): #{
     self.show()
   #}
 
-  def openFile(self): #{
-    logging.debug('openFile()')
+  def getOpenPath(self, title): #{
     c = ''
     s = 'Woolz files ('
     for f in self.file_formats: #{
@@ -181,21 +588,106 @@ class WlzView(QtGui.QMainWindow): #{
       c = ' '
     #}
     s = s + ');; All files (*)'
-    path = QtGui.QFileDialog.getOpenFileName(self, 'Open Woolz file',
+    path = QtGui.QFileDialog.getOpenFileName(self, title,
                self.current_path, s)
-    if(path): #{
-      p = str(path)
+    if isinstance(path, tuple): #{
+      path = path[0]
+    #}
+    return(str(path) if path else None)
+  #}
+
+  def openFile(self): #{
+    logging.debug('openFile()')
+    p = self.getOpenPath('Open Woolz file')
+    if(p): #{
       self.addObjFromFile(p)
     #}
   #}
 
   def addObjFromFile(self, f): #{
     logging.debug('addObjFromFile()')
-    obj = self.readWlzObj(f)
-    if bool(obj): #{
-      self.addObj(obj)
+    self.readObjFromFile(f, self.addObj)
+  #}
+
+  def readObjFromFile(self, f, handler): #{
+    # Starts reading an object in the background, handler is called
+    # with the object once it has been read.
+    logging.debug('readObjFromFile()')
+    if bool(self.read_worker): #{
+      self.cancelRead()
+    #}
+    self.current_path = os.path.dirname(f)
+    self.read_worker = WlzReadWorker(f, self)
+    self.read_worker.handler = handler
+    self.read_worker.done.connect(self.readDone)
+    self.read_progress = QtGui.QProgressDialog('Reading ' + f, 'Cancel',
+                                               0, 1000, self)
+    self.read_progress.setWindowTitle(self.prog)
+    self.read_progress.setMinimumDuration(500)
+    self.read_progress.setValue(0)
+    self.read_progress.canceled.connect(self.cancelRead)
+    self.read_timer = QtCore.QTimer(self)
+    self.read_timer.timeout.connect(self.updateReadProgress)
+    self.read_timer.start(100)
+    self.statusBar().showMessage('Reading ' + f)
+    self.read_worker.start()
+  #}
+
+  def updateReadProgress(self): #{
+    wkr = self.read_worker
+    if bool(wkr) and bool(self.read_progress) and (wkr.size > 0): #{
+      n = wkr.bytesRead()
+      self.read_progress.setValue(min(999, (1000 * n) // wkr.size))
+      self.read_progress.setLabelText('Reading ' + wkr.fname + ' (' +
+          str(n // 1048576) + ' of ' + str(wkr.size // 1048576) + ' MB)')
+    #}
+  #}
+
+  def stopReadProgress(self): #{
+    if bool(self.read_timer): #{
+      self.read_timer.stop()
+      self.read_timer = None
+    #}
+    if bool(self.read_progress): #{
+      self.read_progress.canceled.disconnect(self.cancelRead)
+      self.read_progress.close()
+      self.read_progress = None
     #}
   #}
+
+  def cancelRead(self): #{
+    logging.debug('cancelRead()')
+    wkr = self.read_worker
+    if bool(wkr): #{
+      wkr.cancelled = True
+      self.read_worker = None
+      self.statusBar().showMessage('Cancelled reading ' + wkr.fname)
+    #}
+    self.stopReadProgress()
+  #}
+
+  def readDone(self, wkr): #{
+    logging.debug('readDone()')
+    if wkr.cancelled: #{
+      logging.debug('discarding object from cancelled read of ' + wkr.fname)
+      w.WlzFreeObj(wkr.obj)
+    else: #}{
+      self.read_worker = None
+      self.stopReadProgress()
+      self.statusBar().clearMessage()
+      if bool(wkr.errnum) or not bool(wkr.obj): #{
+        self.errnum = wkr.errnum
+        self.warnWlzError('Failed to read object from ' + wkr.fname)
+      else: #}{
+        # The handler assigns the object if it keeps it, so the worker's
+        # link is always freed.
+        wkr.handler(wkr.obj)
+        w.WlzFreeObj(wkr.obj)
+      #}
+    #}
+    wkr.obj = None
+    wkr.deleteLater()
+  #}
   
   def addObj(self, o): #{
     logging.debug('addObj()')
@@ -206,23 +698,11 @@ class WlzView(QtGui.QMainWindow): #{
         self.errnum = c.c_int(w.WLZ_ERR_NONE)
       else: #}{
         logging.debug('making view struct')
-        v = w.WlzMake3DViewStruct(c.c_int(w.WLZ_3D_VIEW_STRUCT), \
-                                  c.byref(self.errnum))
+        v, self.errnum = ws.MakeViewStruct(self.pitch, self.yaw, self.roll,
+                                           self.dist)
         if not bool(self.errnum): #{
-          f = w.WlzDVertex3()
-          v.vtX = c.c_double(0.0)
-          v.vtY = c.c_double(0.0)
-          v.vtZ = c.c_double(0.0)
-          v.contents.theta = self.yaw   * m.pi / 180.0
-          v.contents.phi   = self.pitch * m.pi / 180.0
-          v.contents.zeta  = self.roll  * m.pi / 180.0
-          v.contents.dist  = self.dist
-          v.contents.fixed = f
-          v.contents.view_mode = c.c_int(w.WLZ_UP_IS_UP_MODE)
-          v.contents.scale = c.c_double(1.0)
-          v.contents.voxelRescaleFlg = c.c_int(0)
           w.WlzFree3DViewStruct(self.view)
-          self.view = w.WlzAssign3DViewStruct(v, None)
+          self.view = v
         #}
       #}
     #}
@@ -230,12 +710,17 @@ class WlzView(QtGui.QMainWindow): #{
       w.WlzFreeObj(self.obj)
       self.obj = w.WlzAssignObject(o, None)
       self.errnum = self.setObj2D()
+      self.initTriPlanar()
+      self.initDense()
+      self.initProjCutter()
+      self.initSampler()
+      self.updateDistRange()
     #}
     if not bool(self.errnum): #{
-      ary = self.wlz2DToNP()
-      logging.debug('setting image')
-      self.img = ary.astype(np.float64).T
-      self.img_itm.setImage(self.img)
+      self.setImageFromObj2D()
+    #}
+    if not bool(self.errnum): #{
+      self.updateLabelSection()
       self.setROIType('N')
     #}
     if bool(self.errnum): #{
@@ -253,10 +738,8 @@ class WlzView(QtGui.QMainWindow): #{
       logging.debug('cutting section from 3D object')
       w.WlzInit3DViewStruct(self.view, self.obj)
       o2d = w.WlzGetSubSectionFromObject(self.obj, None,
-                self.view, c.c_int(w.WLZ_INTERPOLATION_NEAREST),
+                self.view, c.c_int(self.interp),
                 None, c.byref(errnum))
-      print(o2d)
-      print(errnum)
       if not bool(errnum): #{
         w.WlzFreeObj(self.obj2d)
         self.obj2d = w.WlzAssignObject(o2d, None)
@@ -265,56 +748,649 @@ class WlzView(QtGui.QMainWindow): #{
     return(errnum)
   #}
 
+  def obj2DGeometry(self): #{
+    logging.debug('obj2DGeometry()')
+    box = w.WlzBoundingBox3I(self.obj2d, c.byref(self.errnum))
+    if(bool(self.errnum)): #{
+      raise WlzError()
+    #}
+    sz = w.WlzIVertex2()
+    sz.vtX = box.xMax - box.xMin + 1
+    sz.vtY = box.yMax - box.yMin + 1
+    org = w.WlzIVertex2()
+    org.vtX = box.xMin
+    org.vtY = box.yMin
+    gtype = w.WlzGreyTypeFromObj(self.obj2d, c.byref(self.errnum))
+    if(bool(self.errnum)): #{
+      raise WlzError()
+    #}
+    if ws.GreyCType(gtype) is None: #{
+      self.errnum = c.c_int(w.WLZ_ERR_GREY_TYPE)
+      raise WlzError()
+    #}
+    self.obj_gtype = gtype
+    self.obj2d_sz = [sz.vtX, sz.vtY]
+    self.obj2d_org = [org.vtX, org.vtY]
+    return(org, sz, gtype)
+  #}
+
   def wlz2DToNP(self): #{
     ary = None
     logging.debug('wlz2DToNP()')
     try: #{
-      box = w.WlzBoundingBox3I(self.obj2d, c.byref(self.errnum))
+      org, sz, gtype = self.obj2DGeometry()
+      ary, self.errnum = ws.RegionToNP(self.obj2d, org, sz, gtype)
       if(bool(self.errnum)): #{
         raise WlzError()
       #}
-      sz = w.WlzIVertex2()
-      sz.vtX = box.xMax - box.xMin + 1
-      sz.vtY = box.yMax - box.yMin + 1
-      org = w.WlzIVertex2()
-      org.vtX = box.xMin
-      org.vtY = box.yMin
-      gtype = w.WlzGreyTypeFromObj(self.obj2d, c.byref(self.errnum))
-      if(bool(self.errnum)): #{
-        raise WlzError()
+    except WlzError: #}{
+      self.warnWlzError('Failed to extract numeric data from object.')
+    #}
+    return(ary)
+  #}
+
+  def setImageFromObj2D(self): #{
+    logging.debug('setImageFromObj2D()')
+    self.clearTiles()
+    try: #{
+      org, sz, gtype = self.obj2DGeometry()
+    except WlzError: #}{
+      return
+    #}
+    if sz.vtX * sz.vtY <= self.tile_threshold: #{
+      ary = self.wlz2DToNP()
+      if ary is not None: #{
+        self.setImageFromNP(ary, self.obj2d_org, gtype)
+      #}
+    else: #}{
+      logging.debug('setting tiled image')
+      self.tile_pyramid = WlzTilePyramid(self.obj2d, gtype, self.tile_sz,
+                                         self.tile_max)
+      # The coarsest level is shown as a low resolution backdrop, used
+      # for the histogram and ROIs, with tiles drawn over it.
+      lvl = self.tile_pyramid.n_levels - 1
+      ary, rect = self.tile_pyramid.levelImage(lvl)
+      if ary is None: #{
+        self.errnum = self.tile_pyramid.errnum
+        self.clearTiles()
+        self.warnWlzError('Failed to extract numeric data from object.')
+        return
+      #}
+      self.img = ary.astype(np.float64).T
+      self.img_levels = (np.min(self.img), np.max(self.img))
+      self.img_itm.setImage(self.img, levels=self.img_levels)
+      self.img_itm.setRect(rect)
+      self.updateTiles()
+    #}
+  #}
+
+  def setImageFromNP(self, ary, org, gtype): #{
+    logging.debug('setting image')
+    self.img = ary.astype(np.float64).T
+    self.img_itm.setImage(self.img)
+    self.img_itm.setRect(QtCore.QRectF(0, 0, ary.shape[1], ary.shape[0]))
+    self.obj_gtype = gtype
+    self.obj2d_sz = [ary.shape[1], ary.shape[0]]
+    self.obj2d_org = list(org)
+  #}
+
+  def is3D(self): #{
+    return(bool(self.obj) and (self.obj.contents.type == w.WLZ_3D_DOMAINOBJ))
+  #}
+
+  def setAngles(self, v): #{
+    logging.debug('setAngles()')
+    self.pitch = self.pit_spn.value()
+    self.yaw = self.yaw_spn.value()
+    self.roll = self.rol_spn.value()
+    self.updateDistRange()
+    self.updateSection()
+  #}
+
+  def setDistFromSlider(self, v): #{
+    logging.debug('setDistFromSlider(' + str(v) + ')')
+    self.dist = float(v)
+    self.dst_val.setText(str(self.dist))
+    self.updateSection()
+  #}
+
+  def setDistFromText(self): #{
+    logging.debug('setDistFromText()')
+    try: #{
+      d = float(str(self.dst_val.text()))
+    except ValueError: #}{
+      self.dst_val.setText(str(self.dist))
+      return
+    #}
+    if not d == self.dist: #{
+      self.dist = d
+      self.dst_sld.blockSignals(True)
+      self.dst_sld.setValue(int(round(d)))
+      self.dst_sld.blockSignals(False)
+      self.updateSection()
+    #}
+  #}
+
+  def updateDistRange(self): #{
+    # Sets the distance slider's range to that covered by the object's
+    # bounding box along the current view normal.
+    logging.debug('updateDistRange()')
+    if not self.is3D(): #{
+      return
+    #}
+    if bool(self.dense_sec): #{
+      d0, d1 = self.dense_sec.distRange(self.pitch, self.yaw, self.roll)
+    else: #}{
+      geom, errnum = ws.PlaneGeometry(self.obj, self.pitch, self.yaw,
+                                      self.roll, self.dist)
+      if bool(errnum): #{
+        return
+      #}
+      box = w.WlzBoundingBox3I(self.obj, c.byref(errnum))
+      d0, d1 = ws.DistRange(geom, [box.xMin, box.yMin, box.zMin],
+                            [box.zMax - box.zMin + 1,
+                             box.yMax - box.yMin + 1,
+                             box.xMax - box.xMin + 1])
+    #}
+    self.dst_sld.blockSignals(True)
+    self.dst_sld.setRange(int(m.floor(d0)), int(m.ceil(d1)))
+    self.dst_sld.setValue(int(round(self.dist)))
+    self.dst_sld.blockSignals(False)
+  #}
+
+  def setDense(self, q): #{
+    logging.debug('setDense(' + str(q) + ')')
+    self.dense = bool(q)
+    self.initDense()
+    self.initProjCutter()
+    self.updateSection()
+  #}
+
+  def initDense(self): #{
+    logging.debug('initDense()')
+    if bool(self.dense_sec): #{
+      self.dense_sec.free()
+      self.dense_sec = None
+    #}
+    if self.dense and self.is3D(): #{
+      errnum = c.c_int(w.WLZ_ERR_NONE)
+      box = w.WlzBoundingBox3I(self.obj, c.byref(errnum))
+      if not bool(errnum): #{
+        gtype = w.WlzGreyTypeFromObj(self.obj, c.byref(errnum))
+      #}
+      if bool(errnum) or (ws.GreyCType(gtype) is None): #{
+        self.statusBar().showMessage('Dense reslicing not possible for ' +
+                                     'this object.')
+        return
       #}
-      if gtype == w.WLZ_GREY_INT: #{
-        vtype = c.c_int
-      elif gtype == w.WLZ_GREY_SHORT: #}{
-        vtype = c.c_short
-      elif gtype == w.WLZ_GREY_UBYTE: #}{
-        vtype = c.c_ubyte
-      elif gtype == w.WLZ_GREY_FLOAT: #}{
-        vtype = c.c_float
-      elif gtype == w.WLZ_GREY_DOUBLE: #}{
-        vtype = c.c_double
+      n = (box.xMax - box.xMin + 1) * (box.yMax - box.yMin + 1) * \
+          (box.zMax - box.zMin + 1) * c.sizeof(ws.GreyCType(gtype))
+      if n > self.dense_max_bytes: #{
+        self.statusBar().showMessage('Object too large for dense ' +
+            'reslicing (' + str(n // 1048576) + ' MB).')
+        return
+      #}
+      QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+      sec = ws.VolumeSectioner(self.obj)
+      QtGui.QApplication.restoreOverrideCursor()
+      if bool(sec.errnum): #{
+        self.errnum = sec.errnum
+        sec.free()
+        self.warnWlzError('Failed to make dense volume.')
       else: #}{
-        self.errnum = c.c_int(w.WLZ_ERR_GREY_TYPE)
-        raise WlzError()
+        self.dense_sec = sec
       #}
-      UPP = c.POINTER(c.POINTER(vtype))
-      UPV = c.POINTER(c.c_void_p)
-      aryc = c.cast(0,UPV)
-      self.errnum = w.WlzToArray2D(c.byref(aryc), self.obj2d, sz, org, 0, \
-                                   c.c_int(gtype))
-      if(bool(self.errnum)): #{
-        raise WlzError()
+    #}
+  #}
+
+  def initProjCutter(self): #{
+    # Projections of objects without a dense volume (eg those too large
+    # for one) are accumulated from sections cut by Woolz.
+    logging.debug('initProjCutter()')
+    if bool(self.proj_cutter): #{
+      self.proj_cutter.free()
+      self.proj_cutter = None
+    #}
+    if (self.proj_mode is not None) and self.is3D() and \
+       (not bool(self.dense_sec)): #{
+      self.proj_cutter = ws.SectionCutter(self.obj, os.cpu_count() or 4)
+      self.statusBar().showMessage('Projecting from Woolz sections ' +
+                                   '(no dense volume).')
+    #}
+  #}
+
+  def initSampler(self): #{
+    logging.debug('initSampler()')
+    if bool(self.sampler): #{
+      self.sampler.free()
+      self.sampler = None
+    #}
+    self.sec_geom_key = None
+    smp = ws.PointSampler(self.obj, self.sampler_max_bytes)
+    if bool(smp.errnum): #{
+      smp.free()
+      self.statusBar().showMessage('Point sampling not possible for ' +
+                                   'this object.')
+    else: #}{
+      self.sampler = smp
+    #}
+  #}
+
+  def sectionGeometry(self): #{
+    # Returns the plane geometry of the current section, which is only
+    # recomputed when the view parameters change.
+    k = (self.pitch, self.yaw, self.roll, self.dist)
+    if k != self.sec_geom_key: #{
+      self.sec_geom, self.errnum = ws.PlaneGeometry(self.obj, self.pitch,
+                                      self.yaw, self.roll, self.dist)
+      if bool(self.errnum): #{
+        return(None)
+      #}
+      self.sec_geom_key = k
+    #}
+    return(self.sec_geom)
+  #}
+
+  def imageToObj(self, pts): #{
+    # Maps points [x, y] of the displayed image to object coordinates,
+    # [x, y, z] for 3D objects and [x, y] for 2D objects.
+    pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2) + \
+          np.array(self.obj2d_org[0:2], dtype=np.float64)
+    if self.is3D(): #{
+      geom = self.sectionGeometry()
+      if geom is None: #{
+        return(None)
+      #}
+      uvd = np.concatenate((pts, np.full((pts.shape[0], 1), self.dist)),
+                           axis=1)
+      pts = ws.SectionToObjPoints(geom, uvd)
+    #}
+    return(pts)
+  #}
+
+  def setProjMode(self, mode): #{
+    logging.debug('setProjMode(' + str(mode) + ')')
+    self.proj_mode = mode
+    if (mode is not None) and (not bool(self.dense_sec)): #{
+      # Projections are computed from the dense volume if the object
+      # fits in one, otherwise from Woolz sections.
+      self.dense = True
+      self.initDense()
+      self.dense = bool(self.dense_sec)
+      self.dense_act.setChecked(self.dense)
+    #}
+    self.initProjCutter()
+    self.updateSection()
+  #}
+
+  def setProjThickness(self): #{
+    logging.debug('setProjThickness()')
+    t, ok = QtGui.QInputDialog.getDouble(self, self.prog,
+                'Projection slab thickness (voxels)', self.proj_thickness,
+                1.0, 10000.0, 1)
+    if ok: #{
+      self.proj_thickness = t
+      if self.proj_mode is not None: #{
+        self.updateSection()
+      #}
+    #}
+  #}
+
+  def setInterpNearest(self): #{
+    self.interp = w.WLZ_INTERPOLATION_NEAREST
+    self.updateSection()
+  #}
+
+  def setInterpLinear(self): #{
+    self.interp = w.WLZ_INTERPOLATION_LINEAR
+    self.updateSection()
+  #}
+
+  def updateSection(self): #{
+    # Recuts the section after a change of the view parameters, either
+    # from the dense volume or using Woolz.
+    logging.debug('updateSection()')
+    if not self.is3D(): #{
+      return
+    #}
+    if bool(self.dense_sec): #{
+      if self.proj_mode is None: #{
+        ary, org, gtype, self.errnum = self.dense_sec.cut(self.pitch,
+            self.yaw, self.roll, self.dist, self.interp)
+      else: #}{
+        ary, org, gtype, self.errnum = self.dense_sec.project(self.pitch,
+            self.yaw, self.roll, self.dist, self.proj_thickness,
+            self.proj_mode, self.interp)
+      #}
+      if not bool(self.errnum): #{
+        self.clearTiles()
+        self.setImageFromNP(ary, org, gtype)
+      #}
+    elif (self.proj_mode is not None) and bool(self.proj_cutter): #}{
+      QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+      ary, org, gtype, self.errnum = self.proj_cutter.project(self.pitch,
+          self.yaw, self.roll, self.dist, self.proj_thickness,
+          self.proj_mode, self.interp)
+      QtGui.QApplication.restoreOverrideCursor()
+      if not bool(self.errnum): #{
+        self.clearTiles()
+        self.setImageFromNP(ary, org, gtype)
+      #}
+    else: #}{
+      v, self.errnum = ws.MakeViewStruct(self.pitch, self.yaw, self.roll,
+                                         self.dist)
+      if not bool(self.errnum): #{
+        w.WlzFree3DViewStruct(self.view)
+        self.view = v
+        self.errnum = self.setObj2D()
+      #}
+      if not bool(self.errnum): #{
+        self.setImageFromObj2D()
+      #}
+    #}
+    if bool(self.errnum): #{
+      self.warnWlzError('Failed to cut section.')
+    else: #}{
+      self.updateLabelSection()
+      self.refreshPlot()
+    #}
+  #}
+
+  def openLabelObj(self): #{
+    logging.debug('openLabelObj()')
+    p = self.getOpenPath('Open Woolz index object')
+    if(p): #{
+      self.readObjFromFile(p, self.setLabelObj)
+    #}
+  #}
+
+  def setLabelObj(self, o): #{
+    logging.debug('setLabelObj()')
+    errnum = c.c_int(w.WLZ_ERR_NONE)
+    gtype = w.WlzGreyTypeFromObj(o, c.byref(errnum))
+    if (not bool(errnum)) and (gtype == w.WLZ_GREY_FLOAT or
+                               gtype == w.WLZ_GREY_DOUBLE): #{
+      errnum = c.c_int(w.WLZ_ERR_GREY_TYPE)
+    #}
+    if bool(errnum): #{
+      self.errnum = errnum
+      self.warnWlzError('Index objects must have integral grey values.')
+      return
+    #}
+    w.WlzFreeObj(self.lbl_obj)
+    self.lbl_obj = w.WlzAssignObject(o, None)
+    self.updateLabelSection()
+  #}
+
+  def openLabelDesc(self): #{
+    logging.debug('openLabelDesc()')
+    path = QtGui.QFileDialog.getOpenFileName(self,
+               'Open ITK-SnAP label description file', self.current_path,
+               'Label description files (*.txt *.label);; All files (*)')
+    if isinstance(path, tuple): #{
+      path = path[0]
+    #}
+    if path: #{
+      try: #{
+        self.lbl_desc = mio.ReadITKSnapLabels(str(path))
+      except (IOError, ValueError, IndexError): #}{
+        QtGui.QMessageBox.critical(self, 'Warning',
+            'Failed to read label descriptions from ' + str(path),
+            QtGui.QMessageBox.Close)
+        return
+      #}
+      self.lbl_lut = None
+      self.colourLabels()
+    #}
+  #}
+
+  def removeLabels(self): #{
+    w.WlzFreeObj(self.lbl_obj)
+    self.lbl_obj = None
+    self.lbl_ary = None
+    self.lbl_itm.clear()
+  #}
+
+  def updateLabelSection(self): #{
+    # Cuts the index object's section corresponding to the current
+    # section of the reference object and then colours it.
+    if not bool(self.lbl_obj): #{
+      return
+    #}
+    logging.debug('updateLabelSection()')
+    t = self.lbl_obj.contents.type
+    if t == w.WLZ_3D_DOMAINOBJ: #{
+      ary, org, gtype, errnum = ws.CutSection(self.lbl_obj, self.pitch,
+          self.yaw, self.roll, self.dist, w.WLZ_INTERPOLATION_NEAREST)
+    else: #}{
+      ary, org, gtype, errnum = ws.Obj2DToNP(self.lbl_obj)
+    #}
+    if bool(errnum): #{
+      self.lbl_ary = None
+      self.lbl_itm.clear()
+      return
+    #}
+    self.lbl_ary = ary.T
+    self.lbl_org = org
+    self.colourLabels()
+  #}
+
+  def makeLabelLUT(self, max_idx): #{
+    # Builds an RGBA lookup table indexed by label value. Labels without
+    # a description are given distinct colours.
+    n = max_idx + 1
+    if len(self.lbl_desc) > 0: #{
+      n = max(n, max(self.lbl_desc.keys()) + 1)
+    #}
+    lut = np.zeros((n, 4), dtype=np.uint8)
+    hue = (np.arange(0, n) * 0.618033988749895) % 1.0
+    for i in range(1, n): #{
+      lut[i, 0:3] = np.array(QtGui.QColor.fromHsvF(hue[i], 0.8, 1.0).getRgb(
+                             )[0:3])
+      lut[i, 3] = 255
+    #}
+    for i, d in self.lbl_desc.items(): #{
+      if i > 0: #{
+        lut[i, 0:3] = d['rgb']
+        lut[i, 3] = int(255 * d['alpha']) if d['vis'] else 0
+      #}
+    #}
+    self.lbl_lut = lut
+    self.lbl_dialog = None
+  #}
+
+  def colourLabels(self): #{
+    # Colours the index section with a single lookup table gather, this
+    # does not recut the section.
+    if self.lbl_ary is None: #{
+      return
+    #}
+    mx = int(np.max(self.lbl_ary))
+    if (self.lbl_lut is None) or (self.lbl_lut.shape[0] <= mx): #{
+      self.makeLabelLUT(mx)
+    #}
+    rgba = self.lbl_lut[np.clip(self.lbl_ary, 0, None)]
+    self.lbl_itm.setImage(rgba, autoLevels=False)
+    self.lbl_itm.setOpacity(self.lbl_opacity)
+    org = self.obj2d_org
+    self.lbl_itm.setRect(QtCore.QRectF(self.lbl_org[0] - org[0],
+                                       self.lbl_org[1] - org[1],
+                                       rgba.shape[0], rgba.shape[1]))
+  #}
+
+  def setLabelOpacity(self): #{
+    o, ok = QtGui.QInputDialog.getDouble(self, self.prog,
+                'Label opacity', self.lbl_opacity, 0.0, 1.0, 2)
+    if ok: #{
+      self.lbl_opacity = o
+      self.lbl_itm.setOpacity(o)
+    #}
+  #}
+
+  def showLabelVisibility(self): #{
+    logging.debug('showLabelVisibility()')
+    if self.lbl_lut is None: #{
+      return
+    #}
+    if not bool(self.lbl_dialog): #{
+      self.lbl_dialog = LabelVisibilityDialog(self.lbl_desc, self.lbl_lut,
+                                              self.setLabelVisible, self)
+    #}
+    self.lbl_dialog.show()
+  #}
+
+  def setLabelVisible(self, idx, vis): #{
+    if (self.lbl_lut is not None) and (idx < self.lbl_lut.shape[0]): #{
+      a = 255
+      if idx in self.lbl_desc: #{
+        self.lbl_desc[idx]['vis'] = vis
+        a = int(255 * self.lbl_desc[idx]['alpha'])
+      #}
+      self.lbl_lut[idx, 3] = a if vis else 0
+      self.colourLabels()
+    #}
+  #}
+
+  def refreshPlot(self): #{
+    if self.roi_type == 'N': #{
+      self.setROIType('N')
+    else: #}{
+      self.updateROI()
+    #}
+  #}
+
+  def clearTiles(self): #{
+    for itm in self.tile_itms.values(): #{
+      self.img_view_box.removeItem(itm)
+    #}
+    self.tile_itms = {}
+    if bool(self.tile_pyramid): #{
+      self.tile_pyramid.free()
+      self.tile_pyramid = None
+    #}
+  #}
+
+  def updateTiles(self): #{
+    pyr = self.tile_pyramid
+    if not bool(pyr): #{
+      return
+    #}
+    logging.debug('updateTiles()')
+    # Choose the level with about one level pixel per screen pixel and
+    # then show only the tiles of that level which intersect the view.
+    px = self.img_view_box.viewPixelSize()
+    s = max(px[0], px[1], 1.0)
+    lvl = min(int(m.floor(m.log(s, 2))), pyr.n_levels - 1)
+    vis = pyr.visibleTiles(lvl, self.img_view_box.viewRect())
+    for key in list(self.tile_itms.keys()): #{
+      if not key in vis: #{
+        self.img_view_box.removeItem(self.tile_itms.pop(key))
+      #}
+    #}
+    for key in vis: #{
+      if not key in self.tile_itms: #{
+        ary, rect = pyr.tile(*key)
+        if ary is not None: #{
+          itm = pg.ImageItem()
+          itm.setZValue(1)
+          itm.setImage(ary.T, levels=self.img_levels, autoLevels=False)
+          itm.setRect(rect)
+          self.img_view_box.addItem(itm)
+          self.tile_itms[key] = itm
+        #}
+      #}
+    #}
+  #}
+
+  def setTriPlanar(self, q): #{
+    logging.debug('setTriPlanar(' + str(q) + ')')
+    self.tri_planar = bool(q)
+    self.initTriPlanar()
+  #}
+
+  def initTriPlanar(self): #{
+    logging.debug('initTriPlanar()')
+    if bool(self.tri_cutter): #{
+      self.tri_cutter.free()
+      self.tri_cutter = None
+    #}
+    is3d = bool(self.obj) and (self.obj.contents.type == w.WLZ_3D_DOMAINOBJ)
+    if self.tri_planar and is3d: #{
+      errnum = c.c_int(w.WLZ_ERR_NONE)
+      for pane in self.tri_panes: #{
+        if not bool(errnum): #{
+          pane.geom, errnum = ws.PlaneGeometry(self.obj,
+                                               pane.pitch, pane.yaw, 0.0, 0.0)
+        #}
+      #}
+      if not bool(errnum): #{
+        box_err = c.c_int(w.WLZ_ERR_NONE)
+        box = w.WlzBoundingBox3I(self.obj, c.byref(box_err))
+        errnum = box_err
+      #}
+      if bool(errnum): #{
+        self.errnum = errnum
+        self.warnWlzError('Failed to set up tri-planar view.')
+        self.img_stack.setCurrentIndex(0)
+        return
+      #}
+      self.xhair = [0.5 * (box.xMin + box.xMax),
+                    0.5 * (box.yMin + box.yMax),
+                    0.5 * (box.zMin + box.zMax)]
+      self.tri_cutter = ws.SectionCutter(self.obj, len(self.tri_panes))
+      self.img_stack.setCurrentIndex(1)
+      self.updateTriPlanar()
+      for pane in self.tri_panes: #{
+        pane.view_box.autoRange(items=[pane.img_itm])
+      #}
+    else: #}{
+      self.img_stack.setCurrentIndex(0)
+    #}
+  #}
+
+  def updateTriPlanar(self): #{
+    logging.debug('updateTriPlanar()')
+    if not bool(self.tri_cutter): #{
+      return
+    #}
+    p = self.xhair
+    views = [(pane.pitch, pane.yaw, 0.0, pane.dist(p))
+             for pane in self.tri_panes]
+    secs = self.tri_cutter.cutMany(views)
+    for pane, sec in zip(self.tri_panes, secs): #{
+      pane.setSection(sec, p)
+    #}
+    self.statusBar().showMessage('Crosshair ' +
+        str([round(x, 1) for x in p]))
+  #}
+
+  def setCrosshair(self, p): #{
+    self.xhair = [float(x) for x in p]
+    self.updateTriPlanar()
+  #}
+
+  def triPlanarLineMoved(self, line): #{
+    for pane in self.tri_panes: #{
+      if (line is pane.vline) or (line is pane.hline): #{
+        self.setCrosshair(pane.fromSection(pane.vline.value(),
+                                           pane.hline.value(),
+                                           pane.dist(self.xhair)))
+      #}
+    #}
+  #}
+
+  def triPlanarClicked(self, evt): #{
+    if not bool(self.tri_cutter): #{
+      return
+    #}
+    pos = evt.scenePos()
+    for pane in self.tri_panes: #{
+      if pane.view_box.sceneBoundingRect().contains(pos): #{
+        q = pane.view_box.mapSceneToView(pos)
+        self.setCrosshair(pane.fromSection(q.x(), q.y(),
+                                           pane.dist(self.xhair)))
       #}
-      aryc = c.cast(aryc, UPP)
-      ary = np.ctypeslib.as_array(aryc.contents, (sz.vtY, sz.vtX))
-      self.obj_gtype = gtype
-      self.obj2d_sz = [sz.vtX, sz.vtY]
-      self.obj2d_org = [org.vtX, org.vtY]
-      w.AlcFree(aryc)
-    except WlzError: #}{
-      self.warnWlzError('Failed to extract numeric data from object.')
     #}
-    return(ary)
   #}
 
   def setTrackCurVal(self, q): #{
@@ -337,7 +1413,21 @@ class WlzView(QtGui.QMainWindow): #{
     if self.img_itm.sceneBoundingRect().contains(pos): #{
       q = self.img_view_box.mapSceneToView(pos)
       p = [int(q.x()), int(q.y())]
-      v = self.img[p[0], p[1]]
+      pts = None
+      if bool(self.sampler) and (self.proj_mode is None): #{
+        pts = self.imageToObj([q.x(), q.y()])
+      #}
+      if pts is not None: #{
+        # Sample the object itself, at full resolution even when only
+        # a tiled backdrop is displayed.
+        v, errnum = self.sampler.sample(pts, self.interp)
+        v = v[0]
+        p = [round(float(x), 1) for x in pts[0]]
+      elif bool(self.tile_pyramid): #}{
+        v = self.tile_pyramid.value(p[0], p[1])
+      else: #}{
+        v = self.img[p[0], p[1]]
+      #}
       g = w.WlzStringFromGreyType(self.obj_gtype, None)
       msg = str(g) + ' ' + str(p) + ' ' + str(v)
       self.statusBar().showMessage(msg)
@@ -361,6 +1451,24 @@ class WlzView(QtGui.QMainWindow): #{
 
   def updateROI(self): #{
     logging.debug('updateROI()')
+    if (self.roi_type == 'L') and self.is3D(): #{
+      # Sample along the line through the volume rather than from the
+      # displayed image, which may be a projection or a tiled backdrop.
+      ends = []
+      for h in self.roi.getHandles(): #{
+        p = self.roi.mapToParent(h.pos())
+        ends.append([p.x(), p.y()])
+      #}
+      verts = self.imageToObj(ends)
+      if verts is not None: #{
+        s, val = self.profile3D(verts)
+      #}
+      if not bool(self.errnum): #{
+        self.plt_itm.clear()
+        self.plt_itm.plot(s, val)
+      #}
+      return
+    #}
     data = self.roi.getArrayRegion(self.img, self.img_itm)
     if self.roi_type == 'L': #{
       self.plt_itm.clear()
@@ -372,6 +1480,55 @@ class WlzView(QtGui.QMainWindow): #{
     #}
   #}
 
+  def profile3D(self, verts): #{
+    # Returns the distances along and the values sampled at unit steps
+    # along the polyline with the given 3D vertices, using the dense
+    # volume when there is one.
+    pts, s = ws.PolylinePoints(verts)
+    if bool(self.dense_sec): #{
+      self.errnum = c.c_int(w.WLZ_ERR_NONE)
+      val = ws.SampleVolume(self.dense_sec.vol, self.dense_sec.org, pts,
+                            self.interp, self.dense_sec.bkg)
+    elif bool(self.sampler): #}{
+      val, self.errnum = self.sampler.sample(pts, self.interp)
+    else: #}{
+      self.errnum = c.c_int(w.WLZ_ERR_GREY_TYPE)
+      val = None
+    #}
+    return(s, val)
+  #}
+
+  def showProfile3D(self): #{
+    logging.debug('showProfile3D()')
+    if not self.is3D(): #{
+      return
+    #}
+    txt, ok = QtGui.QInputDialog.getText(self, self.prog,
+                  'Polyline vertices (x,y,z; x,y,z; ...)')
+    if ok: #{
+      try: #{
+        verts = [[float(x) for x in v.split(',')]
+                 for v in str(txt).split(';') if len(v.strip()) > 0]
+        if (len(verts) < 2) or any(len(v) != 3 for v in verts): #{
+          raise ValueError()
+        #}
+      except ValueError: #}{
+        QtGui.QMessageBox.warning(self, self.prog,
+                                  'Invalid polyline vertices.')
+        return
+      #}
+      s, val = self.profile3D(verts)
+      if bool(self.errnum): #{
+        self.warnWlzError('Failed to sample 3D profile.')
+      else: #}{
+        self.setROIType('N')
+        self.plt_itm.clear()
+        self.plt_itm.setTitle('3D Profile')
+        self.plt_itm.plot(s, val)
+      #}
+    #}
+  #}
+
   def setROIType(self, t): #{
     logging.debug('setROIType()')
     if bool(self.roi): #{
@@ -460,6 +1617,41 @@ class WlzView(QtGui.QMainWindow): #{
   #}
 #}
 
+# Lists the labels with a check box for each, calling setvis(idx, vis)
+# when a label's visibility is changed.
+class LabelVisibilityDialog(QtGui.QDialog): #{
+
+  def __init__(self, desc, lut, setvis, parent = None): #{
+    super(LabelVisibilityDialog, self).__init__(parent)
+    self.setvis = setvis
+    self.setWindowTitle('Label Visibility')
+    lo = QtGui.QVBoxLayout(self)
+    self.lst = QtGui.QListWidget()
+    for i in range(1, lut.shape[0]): #{
+      nam = desc[i]['name'] if i in desc else ''
+      itm = QtGui.QListWidgetItem(str(i) + ' ' + nam)
+      itm.setData(QtCore.Qt.UserRole, i)
+      itm.setFlags(itm.flags() | QtCore.Qt.ItemIsUserCheckable)
+      itm.setCheckState(QtCore.Qt.Checked if lut[i, 3] > 0 else
+                        QtCore.Qt.Unchecked)
+      itm.setForeground(QtGui.QColor(*lut[i, 0:3]))
+      self.lst.addItem(itm)
+    #}
+    self.lst.itemChanged.connect(self.itemChanged)
+    lo.addWidget(self.lst)
+    but = QtGui.QDialogButtonBox(
+              QtGui.QDialogButtonBox.Close,
+              QtCore.Qt.Horizontal, self)
+    but.rejected.connect(self.hide)
+    lo.addWidget(but)
+  #}
+
+  def itemChanged(self, itm): #{
+    idx = int(itm.data(QtCore.Qt.UserRole))
+    self.setvis(idx, itm.checkState() == QtCore.Qt.Checked)
+  #}
+#}
+
 class AboutDialog(QtGui.QDialog): #{
 
   def __init__(self, version, parent = None): #{
@@ -496,6 +1688,10 @@ def parseArgs(): #{
       dest='logLevel',
       choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
       help='Set the logging level.')
+  parser.add_argument(
+      '-m', '--maxdense',
+      type=int, default=1024,
+      help='Maximum size (MB) of objects for dense volume reslicing.')
   parser.add_argument('infile',
       help='Input Woolz file.')
   args = parser.parse_args()
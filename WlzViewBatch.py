@@ -0,0 +1,310 @@
+#!/usr/bin/python3
+##
+# \file         WlzViewBatch.py
+# \author       agent <agent@local>
+# \date         October 2026
+# \version      $Id$
+# \par
+# Address:
+#               MRC Human Genetics Unit,
+#               MRC Institute of Genetics and Molecular Medicine,
+#               University of Edinburgh,
+#               Western General Hospital,
+#               Edinburgh, EH4 2XU, UK.
+# \par
+# Copyright (C), [2026],
+# The University Court of the University of Edinburgh,
+# Old College, Edinburgh, UK.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be
+# useful but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public
+# License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+# \brief        Headless batch renderer of sections cut from a 3D Woolz
+#               object, using the WlzView sectioning code without Qt.
+##
+
+from __future__ import print_function
+import os
+import sys
+import zlib
+import struct
+import argparse
+import threading
+import ctypes as c
+import numpy as np
+import Wlz as w
+import WlzSection as ws
+from concurrent.futures import ThreadPoolExecutor
+
+libc = c.CDLL('libc.so.6')
+
+libc.fopen.restype = c.POINTER(w.FILE)
+
+prog = 'WlzViewBatch'
+args = None
+
+def ErrorMsg(msg): #{
+  print(prog + ': ' + msg, file=sys.stderr)
+  exit(1)
+#}
+
+def VerbMsg(msg): #{
+  if(args.verbose): #{
+    print(prog + ': ' + msg, file=sys.stderr)
+  #}
+#}
+
+def ParseArgs(): #{
+  parser = argparse.ArgumentParser(description = \
+      'Renders a stack of sections cut from a 3D Woolz object, without ' + \
+      'a display, writing either an 8 or 16 bit PNG file for each ' + \
+      'section or a single raw stack. All sections are placed in a ' + \
+      'common frame which covers the object for the given view angles.')
+  parser.add_argument('-b', '--bits', \
+      type=int, choices=[8, 16], default=8, \
+      help='output bits per pixel.')
+  parser.add_argument('-d', '--dist', \
+      type=str, default=None, \
+      help='range of distances as first:last[:step], default is all ' + \
+           'sections through the object with a step of 1.')
+  parser.add_argument('-D', '--dense', \
+      action='store_true', default=False, \
+      help='cut sections from a dense in memory copy of the object.')
+  parser.add_argument('-f', '--format', \
+      type=str, choices=['png', 'raw'], default='png', \
+      help='output format.')
+  parser.add_argument('-g', '--greyrange', \
+      type=str, default=None, \
+      help='grey value range min:max mapped to the output range, ' + \
+           'default is the range of the object\'s values.')
+  parser.add_argument('-i', '--interp', \
+      type=str, choices=['nearest', 'linear'], default='nearest', \
+      help='interpolation.')
+  parser.add_argument('-j', '--threads', \
+      type=int, default=os.cpu_count() or 4, \
+      help='number of threads used to cut and write sections.')
+  parser.add_argument('-o', '--output', \
+      type=str, required=True, \
+      help='output file prefix, PNG files are written to ' + \
+           '<prefix>NNNNN.png and raw stacks to <prefix>.raw with a ' + \
+           'description in <prefix>.txt.')
+  parser.add_argument('-p', '--pitch', \
+      type=float, default=0.0, \
+      help='pitch (degrees).')
+  parser.add_argument('-r', '--roll', \
+      type=float, default=0.0, \
+      help='roll (degrees).')
+  parser.add_argument('-y', '--yaw', \
+      type=float, default=0.0, \
+      help='yaw (degrees).')
+  parser.add_argument('-v', '--verbose', \
+      action='store_true', default=False, \
+      help='verbose output (mainly useful for debugging).')
+  parser.add_argument('infile', \
+      help='input 3D Woolz object.')
+  args = parser.parse_args()
+  return(args)
+#}
+
+def ReadWoolzFile(filename): #{
+  obj = None
+  errNum = w.enum__WlzErrorNum(w.WLZ_ERR_FILE_OPEN)
+  fp = libc.fopen(filename.encode('utf-8'), b'rb')
+  if(bool(fp)): #{
+    obj = w.WlzAssignObject(w.WlzReadObj(fp, c.byref(errNum)), None)
+    libc.fclose(fp)
+  #}
+  return(obj, errNum)
+#}
+
+# Writes a 2D uint8 or uint16 array as a grey scale PNG file.
+def WritePNG(filename, ary): #{
+  h, wd = ary.shape
+  if ary.dtype == np.uint8: #{
+    depth = 8
+    raw = ary
+  else: #}{
+    depth = 16
+    raw = ary.astype('>u2')
+  #}
+  # Each row is preceded by a zero (no filter) byte.
+  rows = np.zeros((h, 1 + wd * raw.itemsize), dtype=np.uint8)
+  rows[:, 1:] = np.ascontiguousarray(raw).view(np.uint8).reshape(h, -1)
+  def chunk(typ, dat): #{
+    return(struct.pack('>I', len(dat)) + typ + dat +
+           struct.pack('>I', zlib.crc32(typ + dat) & 0xffffffff))
+  #}
+  with open(filename, 'wb') as f: #{
+    f.write(b'\x89PNG\r\n\x1a\n')
+    f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', wd, h, depth, 0, 0, 0, 0)))
+    f.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)))
+    f.write(chunk(b'IEND', b''))
+  #}
+#}
+
+def ParseRange(s, what): #{
+  try: #{
+    r = [float(x) for x in s.split(':')]
+    if (len(r) < 2) or (len(r) > 3): #{
+      raise ValueError()
+    #}
+  except ValueError: #}{
+    ErrorMsg('Invalid ' + what + ' range ' + s + '.')
+  #}
+  return(r)
+#}
+
+def RenderSections(): #{
+  obj, errNum = ReadWoolzFile(args.infile)
+  if bool(errNum) or (not bool(obj)) or \
+     (not obj.contents.type == w.WLZ_3D_DOMAINOBJ): #{
+    ErrorMsg('Failed to read 3D object from ' + args.infile + '.')
+  #}
+  errNum = c.c_int(w.WLZ_ERR_NONE)
+  box = w.WlzBoundingBox3I(obj, c.byref(errNum))
+  geom = None
+  if not bool(errNum): #{
+    geom, errNum = ws.PlaneGeometry(obj, args.pitch, args.yaw, args.roll, 0.0)
+  #}
+  if bool(errNum): #{
+    ErrorMsg('Failed to compute section geometry (' +
+             w.WlzStringFromErrorNum(errNum, None) + ').')
+  #}
+  # Common frame covering the object's bounding box for all distances.
+  crn = ws.BoxCornersInSection(geom, [box.xMin, box.yMin, box.zMin],
+                               [box.zMax - box.zMin + 1,
+                                box.yMax - box.yMin + 1,
+                                box.xMax - box.xMin + 1])
+  u0, v0, d0 = np.floor(np.min(crn, axis=0)).astype(int)
+  u1, v1, d1 = np.ceil(np.max(crn, axis=0)).astype(int)
+  nu = u1 - u0 + 1
+  nv = v1 - v0 + 1
+  if args.dist is None: #{
+    dr = [d0, d1, 1.0]
+  else: #}{
+    dr = ParseRange(args.dist, 'distance')
+    if len(dr) == 2: #{
+      dr.append(1.0)
+    #}
+  #}
+  if dr[2] == 0.0: #{
+    ErrorMsg('Distance step must not be zero.')
+  #}
+  dists = np.arange(dr[0], dr[1] + 0.5 * dr[2], dr[2])
+  if args.greyrange is None: #{
+    gmin = w.WlzPixelV()
+    gmax = w.WlzPixelV()
+    errNum = w.WlzGreyRange(obj, c.byref(gmin), c.byref(gmax))
+    if bool(errNum): #{
+      ErrorMsg('Failed to compute grey range (' +
+               w.WlzStringFromErrorNum(errNum, None) + ').')
+    #}
+    gtype = w.WlzGreyTypeFromObj(obj, None)
+    grng = [ws.GreyValue(gmin, gtype), ws.GreyValue(gmax, gtype)]
+  else: #}{
+    grng = ParseRange(args.greyrange, 'grey')[0:2]
+  #}
+  otype = np.uint8 if args.bits == 8 else np.uint16
+  omax = float(np.iinfo(otype).max)
+  gscale = omax / max(float(grng[1] - grng[0]), sys.float_info.epsilon)
+  if args.interp == 'linear': #{
+    interp = w.WLZ_INTERPOLATION_LINEAR
+  else: #}{
+    interp = w.WLZ_INTERPOLATION_NEAREST
+  #}
+  VerbMsg('Rendering ' + str(len(dists)) + ' sections of ' + str(nu) +
+          'x' + str(nv) + ' pixels, distances ' + str(dr) +
+          ', grey range ' + str(grng) + '.')
+  dense = None
+  if args.dense: #{
+    VerbMsg('Making dense volume.')
+    dense = ws.VolumeSectioner(obj, 2)
+    if bool(dense.errnum): #{
+      ErrorMsg('Failed to make dense volume (' +
+               w.WlzStringFromErrorNum(dense.errnum, None) + ').')
+    #}
+  #}
+  raw_f = None
+  raw_lock = threading.Lock()
+  if args.format == 'raw': #{
+    raw_f = open(args.output + '.raw', 'wb')
+  #}
+  def render(k): #{
+    d = float(dists[k])
+    if bool(dense): #{
+      ary, org, gt, err = dense.cut(args.pitch, args.yaw, args.roll, d, interp)
+    else: #}{
+      ary, org, gt, err = ws.CutSection(obj, args.pitch, args.yaw, args.roll,
+                                        d, interp)
+    #}
+    img = np.zeros((nv, nu), dtype=otype)
+    if (not bool(err)) and (ary is not None): #{
+      # Clip the section to the common frame.
+      x0 = max(org[0], u0)
+      y0 = max(org[1], v0)
+      x1 = min(org[0] + ary.shape[1], u1 + 1)
+      y1 = min(org[1] + ary.shape[0], v1 + 1)
+      if (x1 > x0) and (y1 > y0): #{
+        a = ary[y0 - org[1]:y1 - org[1], x0 - org[0]:x1 - org[0]]
+        a = (a.astype(np.float64) - grng[0]) * gscale
+        img[y0 - v0:y1 - v0, x0 - u0:x1 - u0] = \
+            np.clip(np.rint(a), 0.0, omax).astype(otype)
+      #}
+    #}
+    if raw_f is None: #{
+      WritePNG(args.output + '%05d' % k + '.png', img)
+    else: #}{
+      with raw_lock: #{
+        raw_f.seek(k * img.nbytes)
+        raw_f.write(img.tobytes())
+      #}
+    #}
+    return(bool(err))
+  #}
+  with ThreadPoolExecutor(max_workers = args.threads) as pool: #{
+    n_err = sum(pool.map(render, range(0, len(dists))))
+  #}
+  if n_err > 0: #{
+    print(prog + ': WARNING - failed to cut ' + str(n_err) + ' sections.',
+          file=sys.stderr)
+  #}
+  if raw_f is not None: #{
+    raw_f.close()
+    with open(args.output + '.txt', 'w') as f: #{
+      print('file ' + os.path.basename(args.output) + '.raw', file=f)
+      print('size ' + str(nu) + ' ' + str(nv) + ' ' + str(len(dists)), file=f)
+      print('type ' + ('uint8' if args.bits == 8 else 'uint16') +
+            ' ' + sys.byteorder, file=f)
+      print('origin ' + str(u0) + ' ' + str(v0), file=f)
+      print('angles ' + str(args.pitch) + ' ' + str(args.yaw) + ' ' +
+            str(args.roll), file=f)
+      print('dist ' + str(dr[0]) + ' ' + str(dr[1]) + ' ' + str(dr[2]),
+            file=f)
+      print('greyrange ' + str(grng[0]) + ' ' + str(grng[1]), file=f)
+    #}
+  #}
+  if bool(dense): #{
+    dense.free()
+  #}
+  w.WlzFreeObj(obj)
+#}
+
+if __name__ == '__main__': #{
+  args = ParseArgs()
+  prog = sys.argv[0]
+  VerbMsg('args = ' + str(args))
+  RenderSections()
+  exit(0)
+#}
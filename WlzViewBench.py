@@ -0,0 +1,237 @@
+#!/usr/bin/python3
+##
+# \file         WlzViewBench.py
+# \author       agent <agent@local>
+# \date         October 2026
+# \version      $Id$
+# \par
+# Address:
+#               MRC Human Genetics Unit,
+#               MRC Institute of Genetics and Molecular Medicine,
+#               University of Edinburgh,
+#               Western General Hospital,
+#               Edinburgh, EH4 2XU, UK.
+# \par
+# Copyright (C), [2026],
+# The University Court of the University of Edinburgh,
+# Old College, Edinburgh, UK.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be
+# useful but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public
+# License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+# \brief        Latency benchmark for the interactive operations of
+#               WlzView, which is driven offscreen over synthetic 3D
+#               Woolz objects of increasing size.
+##
+
+from __future__ import print_function
+import os
+# The offscreen platform must be set before Qt is loaded.
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+import sys
+import json
+import time
+import argparse
+import tempfile
+import ctypes as c
+import numpy as np
+import Wlz as w
+import WlzView as wv
+from pyqtgraph.Qt import QtCore, QtGui
+
+libc = c.CDLL('libc.so.6')
+
+libc.fopen.restype = c.POINTER(w.FILE)
+
+prog = 'WlzViewBench'
+args = None
+
+class WlzError(Exception):
+  pass
+
+def ErrorMsg(msg): #{
+  print(prog + ': ' + msg, file=sys.stderr)
+  exit(1)
+#}
+
+def VerbMsg(msg): #{
+  if(args.verbose): #{
+    print(prog + ': ' + msg, file=sys.stderr)
+  #}
+#}
+
+def ParseArgs(): #{
+  parser = argparse.ArgumentParser(description = \
+      'Measures the latency of WlzView\'s interactive operations (open ' + \
+      'a file, recut on an angle change, step the distance slider, drag ' + \
+      'ROIs and update the histogram) with WlzView running offscreen ' + \
+      'on synthetic 3D objects of increasing size. The median and 95th ' + \
+      'percentile latencies of each operation are written as JSON.')
+  parser.add_argument('-d', '--dense', \
+      action='store_true', default=False, \
+      help='use dense volume reslicing.')
+  parser.add_argument('-n', '--repeats', \
+      type=int, default=20, \
+      help='number of times each operation is timed.')
+  parser.add_argument('-o', '--output', \
+      type=str, default='-', \
+      help='output JSON file.')
+  parser.add_argument('-s', '--sizes', \
+      type=str, default='64,128,256,384', \
+      help='comma separated edge lengths of the synthetic cubes.')
+  parser.add_argument('-t', '--tmpdir', \
+      type=str, default=tempfile.gettempdir(), \
+      help='directory for the synthetic object files.')
+  parser.add_argument('-v', '--verbose', \
+      action='store_true', default=False, \
+      help='verbose output (mainly useful for debugging).')
+  args = parser.parse_args()
+  return(args)
+#}
+
+# Makes a ubyte cuboid of the given edge length with a smooth pattern of
+# values, which are set a plane at a time through numpy.
+def MakeSyntheticObj(n): #{
+  errNum = w.enum__WlzErrorNum(w.WLZ_ERR_NONE)
+  obj = w.WlzMakeCuboidI(0, n - 1, 0, n - 1, 0, n - 1,
+                         w.WLZ_GREY_UBYTE, 0, None, None, c.byref(errNum))
+  if bool(errNum): #{
+    raise WlzError()
+  #}
+  obj = w.WlzAssignObject(obj, None)
+  y, x = np.mgrid[0:n, 0:n].astype(np.float64) / n
+  vvp = obj.contents.values.vox.contents.values
+  for z in range(0, n): #{
+    r = np.sqrt((x - 0.5) ** 2 + (y - 0.5) ** 2 + (z / n - 0.5) ** 2)
+    pln = 127.5 * (1.0 + np.cos(24.0 * r)) * (r < 0.5)
+    vp = vvp[z].r.contents.values.ubp
+    np.ctypeslib.as_array(vp, (n * n,))[:] = pln.astype(np.uint8).ravel()
+  #}
+  return(obj)
+#}
+
+def WriteWoolzFile(filename, obj): #{
+  errNum = w.enum__WlzErrorNum(w.WLZ_ERR_FILE_OPEN)
+  fp = libc.fopen(filename.encode('utf-8'), b'wb')
+  if(bool(fp)): #{
+    errNum = w.WlzWriteObj(fp, obj)
+    libc.fclose(fp)
+  #}
+  if bool(errNum): #{
+    raise WlzError()
+  #}
+#}
+
+def Stats(t): #{
+  t = 1000.0 * np.array(t)
+  return({'n': len(t),
+          'p50_ms': float(np.percentile(t, 50)),
+          'p95_ms': float(np.percentile(t, 95)),
+          'mean_ms': float(np.mean(t))})
+#}
+
+def Time(fn, app): #{
+  # Times fn() followed by processing of the events which it posted.
+  t0 = time.perf_counter()
+  fn()
+  app.processEvents()
+  return(time.perf_counter() - t0)
+#}
+
+def BenchView(app, view, filename): #{
+  t = {'open': [], 'recut_angle': [], 'slider_step': [], 'setObj2D': [],
+       'wlz2DToNP': [], 'roi_line_drag': [], 'roi_rect_drag': [],
+       'histogram': []}
+  rng = np.random.RandomState(0)
+  for i in range(0, args.repeats): #{
+    def openFile(): #{
+      view.addObjFromFile(filename)
+      while bool(view.read_worker): #{
+        app.processEvents(QtCore.QEventLoop.AllEvents, 10)
+      #}
+    #}
+    t['open'].append(Time(openFile, app))
+  #}
+  if args.dense: #{
+    view.setDense(True)
+  #}
+  for i in range(0, args.repeats): #{
+    a = float(rng.uniform(-90.0, 90.0))
+    t['recut_angle'].append(Time(lambda: view.pit_spn.setValue(a), app))
+  #}
+  view.pit_spn.setValue(0.0)
+  sld = view.dst_sld
+  d = sld.minimum()
+  for i in range(0, args.repeats): #{
+    d = d + 1 if d < sld.maximum() else sld.minimum()
+    t['slider_step'].append(Time(lambda: sld.setValue(d), app))
+  #}
+  if not args.dense: #{
+    for i in range(0, args.repeats): #{
+      t['setObj2D'].append(Time(view.setObj2D, app))
+      t['wlz2DToNP'].append(Time(view.wlz2DToNP, app))
+    #}
+  #}
+  for typ, key in [('L', 'roi_line_drag'), ('R', 'roi_rect_drag')]: #{
+    view.setROIType(typ)
+    for i in range(0, args.repeats): #{
+      p = rng.uniform(0, 0.5 * min(view.obj2d_sz), 2)
+      t[key].append(Time(lambda: view.roi.setPos(p), app))
+    #}
+  #}
+  for i in range(0, args.repeats): #{
+    t['histogram'].append(Time(lambda: view.setROIType('N'), app))
+  #}
+  return(dict((k, Stats(v)) for k, v in t.items() if len(v) > 0))
+#}
+
+def FailOnWlzError(msg): #{
+  # Replaces WlzView's modal error dialog which would block offscreen.
+  ErrorMsg(msg)
+#}
+
+if __name__ == '__main__': #{
+  args = ParseArgs()
+  prog = sys.argv[0]
+  app = QtGui.QApplication(sys.argv[0:1])
+  vargs = argparse.Namespace(infile=None, logLevel=None, maxdense=65536)
+  view = wv.WlzView(prog, vargs)
+  view.warnWlzError = FailOnWlzError
+  results = {'platform': os.environ['QT_QPA_PLATFORM'],
+             'dense': args.dense, 'repeats': args.repeats, 'sizes': {}}
+  for n in [int(s) for s in args.sizes.split(',')]: #{
+    filename = os.path.join(args.tmpdir, 'wlzviewbench' + str(n) + '.wlz')
+    try: #{
+      VerbMsg('Making synthetic object of size ' + str(n) + '^3.')
+      obj = MakeSyntheticObj(n)
+      WriteWoolzFile(filename, obj)
+      w.WlzFreeObj(obj)
+    except WlzError: #}{
+      ErrorMsg('Failed to make synthetic object of size ' + str(n) + '.')
+    #}
+    VerbMsg('Benchmarking size ' + str(n) + '^3.')
+    results['sizes'][str(n)] = BenchView(app, view, filename)
+    os.remove(filename)
+  #}
+  if args.output == '-': #{
+    json.dump(results, sys.stdout, indent=2)
+    print()
+  else: #}{
+    with open(args.output, 'w') as f: #{
+      json.dump(results, f, indent=2)
+    #}
+  #}
+  exit(0)
+#}